@@ -0,0 +1,123 @@
+"""
+/analyze Result Cache
+Content-addressed: the key is the SHA-256 of the uploaded bytes plus the
+detector version, so a forwarded photo that arrives again (byte-identical, as
+WhatsApp forwards are) is answered without re-running OpenCV, Azure or Google.
+
+Results are kept in an in-memory LRU with a TTL and, optionally, in a SQLite
+table that survives restarts and is shared by every worker using the same
+file. Entries are stored as JSON text, so callers always get their own copy.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_stored_at ON analysis_cache(stored_at);
+"""
+
+
+class AnalysisCache:
+    """
+    max_entries:  in-memory LRU capacity
+    ttl_s:        entries older than this are misses (and are dropped)
+    db_path:      optional SQLite file for the second tier
+    version:      detector version folded into every key
+    """
+
+    def __init__(self, max_entries=10_000, ttl_s=86400, db_path=None, version=""):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.version = version
+        self._memory = OrderedDict()     # key → (stored_at, json text)
+        self._lock = threading.Lock()
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+        self._stores = 0
+
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("DELETE FROM analysis_cache WHERE stored_at < ?", (time.time() - ttl_s,))
+
+    def key(self, contents):
+        return self.digest_key(hashlib.sha256(contents).hexdigest())
+
+    def digest_key(self, digest):
+        """Key for an upload whose SHA-256 hex digest is already known."""
+        return digest + ":" + self.version
+
+    def get(self, key, now=None):
+        """The cached value for `key`, or None. Disk hits are promoted to memory."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] > self.ttl_s:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                return json.loads(entry[1])
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT stored_at, value FROM analysis_cache WHERE key = ? AND stored_at >= ?",
+                    (key, now - self.ttl_s),
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self._hits["disk"] += 1
+                    return json.loads(row[1])
+
+            self._misses += 1
+            return None
+
+    def put(self, key, value, now=None):
+        now = time.time() if now is None else now
+        text = json.dumps(value)
+        with self._lock:
+            self._remember(key, now, text)
+            self._stores += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, text, now),
+                )
+
+    def _remember(self, key, stored_at, text):
+        self._memory[key] = (stored_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            hits = self._hits["memory"] + self._hits["disk"]
+            lookups = hits + self._misses
+            disk_entries = None
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+            return {
+                "version": self.version,
+                "lookups": lookups,
+                "hits": hits,
+                "memory_hits": self._hits["memory"],
+                "disk_hits": self._hits["disk"],
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "ttl_s": self.ttl_s,
+            }
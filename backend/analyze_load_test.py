@@ -0,0 +1,154 @@
+"""
+/analyze Load Test
+Starts the backend under uvicorn once per process-pool size, fires concurrent
+/analyze uploads of synthetic photos at it, and reports throughput and latency.
+A probe hits a cheap endpoint the whole time, so the table also shows whether
+other requests still get answered while uploads are being analyzed.
+
+Remote detectors are disabled (empty Azure/Google keys), so the numbers
+measure the local CPU stages. Each server gets its own temporary upload
+directory, report database and pHash snapshot, so the synthetic uploads never
+touch backend/static or the real duplicate index. Run from the repo root:
+
+    python backend/analyze_load_test.py --processes 1,2,4 --concurrency 8
+"""
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE_PATH = "/reports/heatmap"
+
+
+def synthetic_jpeg(megapixels, seed):
+    """A street-like test photo: sky gradient, grey road, muddy water patches and noise."""
+    rng = np.random.default_rng(seed)
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    h = int(w * 3 / 4)
+    rows = np.linspace(0, 1, h, dtype=np.float32)[:, None, None]
+    sky = np.array([135, 180, 230], dtype=np.float32)
+    road = np.array([110, 110, 105], dtype=np.float32)
+    img = np.where(rows < 0.45, sky, road) * np.ones((1, w, 1), dtype=np.float32)
+    for _ in range(8):
+        cy, cx = rng.integers(h // 2, h), rng.integers(0, w)
+        ry, rx = rng.integers(h // 20, h // 6), rng.integers(w // 20, w // 4)
+        y0, y1, x0, x1 = max(cy - ry, 0), min(cy + ry, h), max(cx - rx, 0), min(cx + rx, w)
+        img[y0:y1, x0:x1] = (120, 95, 60)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(processes, port, state_dir):
+    """uvicorn on `port` keeping all of its state (uploads, reports, pHashes) under `state_dir`."""
+    env = dict(os.environ, ANALYZE_PROCESSES=str(processes), AZURE_CV_KEY="", AZURE_CV_ENDPOINT="", GOOGLE_VISION_KEY="",
+               JALDRISHTI_REPORTS_DB=os.path.join(state_dir, "reports.db"),
+               JALDRISHTI_STATIC_DIR=os.path.join(state_dir, "static"),
+               PHASH_SNAPSHOT=os.path.join(state_dir, "phash_index.npz"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", "backend",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if requests.get(base + PROBE_PATH, timeout=1).status_code == 200:
+                return server, base
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("backend did not start")
+
+
+def run_load(base, images, total, concurrency):
+    """Returns (wall seconds, per-request latencies, probe latencies)."""
+    latencies = []
+    probe_latencies, stop = [], threading.Event()
+
+    def probe():
+        with requests.Session() as session:
+            while not stop.is_set():
+                start = time.perf_counter()
+                session.get(base + PROBE_PATH, timeout=60)
+                probe_latencies.append(time.perf_counter() - start)
+                time.sleep(0.05)
+
+    local = threading.local()
+
+    def upload(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        # Bytes after the JPEG end marker are ignored by decoders but make every
+        # upload distinct, so the result cache and upload dedup don't short-circuit
+        image = images[i % len(images)] + os.urandom(16)
+        start = time.perf_counter()
+        response = local.session.post(base + "/analyze", files={"file": (f"load_{i}.jpg", image, "image/jpeg")},
+                                      timeout=300)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(upload, range(total)))
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return wall, latencies, probe_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /analyze throughput vs process-pool size")
+    parser.add_argument("--processes", default="1,2,4", help="comma-separated ANALYZE_PROCESSES values")
+    parser.add_argument("--concurrency", type=int, default=8, help="uploads in flight")
+    parser.add_argument("--requests", type=int, default=48, help="uploads per run")
+    parser.add_argument("--megapixels", type=float, default=2.0, help="size of the synthetic photos")
+    args = parser.parse_args()
+
+    print("🔥 JalDrishti /analyze Load Test")
+    print("=" * 50)
+    print(f"   {os.cpu_count()} cores, {args.requests} uploads of {args.megapixels} MP, {args.concurrency} in flight")
+    images = [synthetic_jpeg(args.megapixels, seed) for seed in range(8)]
+
+    rows = []
+    for processes in [int(p) for p in args.processes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            server, base = start_server(processes, free_port(), tmp)
+            try:
+                run_load(base, images, processes, processes)  # spawn the pool workers
+                wall, latencies, probes = run_load(base, images, args.requests, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+        rows.append((processes, args.requests / wall, np.percentile(latencies, 50) * 1000,
+                     np.percentile(latencies, 95) * 1000, np.percentile(probes, 50) * 1000,
+                     np.percentile(probes, 99) * 1000))
+
+    print(f"\n{'processes':>9} {'req/s':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'probe p50':>10} {'probe p99':>10}")
+    for processes, rps, p50, p95, probe50, probe99 in rows:
+        print(f"{processes:>9} {rps:>8.2f} {rps / rows[0][1]:>7.2f}x {p50:>8.0f} {p95:>8.0f} {probe50:>10.1f} {probe99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Staged Water Detection Engine
+The local detectors as one pipeline over a shared preprocessed frame (any
+object with `rgb`, `gray`, `hsv` and `gray_at(size)`, e.g.
+image_pipeline.PreparedImage), so resizing and colour conversions happen once
+however many stages read them.
+
+Stages run cheapest first. Each returns its measurements, and its `decide`
+hook may return a verdict (True/False) to stop the pipeline early or None to
+pass on to the next stage. Every stage's wall time is reported.
+
+    hsv      muddy / grey-reflective colour coverage of the lower half (%);
+             the verdict is coverage > 10%, as in the original detector
+
+Evidence stages are registered separately and only run when an engine asks
+for them by name (DetectionEngine(evidence=["texture"])). They report
+measurements next to the verdict but never decide it, so the default
+pipeline doesn't pay for them:
+
+    texture  smooth, non-bright connected regions (the detector behind
+             image_detection.py)
+"""
+import time
+
+import cv2
+import numpy as np
+
+# HSV coverage (percent of the bottom half) above which a frame is waterlogged
+HSV_WATER_ABOVE = 10.0
+
+TEXTURE_SIZE = (640, 420)
+TEXTURE_MIN_COMPONENT_AREA = 5000   # pixels at TEXTURE_SIZE
+TEXTURE_WATER_RATIO = 0.18
+
+
+class Stage:
+    def __init__(self, name, run, decide=None):
+        self.name = name
+        self.run = run          # (frame, results so far) -> dict
+        self.decide = decide    # (own result, results so far) -> True / False / None
+
+
+STAGES = []
+EVIDENCE_STAGES = {}
+
+
+def register_stage(name, decide=None, before=None, evidence=False):
+    """
+    Decorator adding a stage to the default pipeline (at the end, or ahead of
+    `before`), or with evidence=True to the opt-in EVIDENCE_STAGES.
+    """
+    def wrap(run):
+        if evidence:
+            EVIDENCE_STAGES[name] = Stage(name, run)
+            return run
+        stage = Stage(name, run, decide)
+        names = [s.name for s in STAGES]
+        STAGES.insert(names.index(before) if before in names else len(STAGES), stage)
+        return run
+    return wrap
+
+
+def water_coverage(hsv):
+    """
+    Percentages of the bottom half of an HSV frame in the muddy or
+    grey/reflective water ranges: (either range, muddy range only).
+    """
+    # 1. Muddy/Brown Water Range (Hue 10-30 approx for brown)
+    lower_muddy = np.array([0, 40, 40])
+    upper_muddy = np.array([35, 255, 255])
+    mask_muddy = cv2.inRange(hsv, lower_muddy, upper_muddy)
+
+    # 2. Reflection/Clear Water Range (Blueish/Greyish - usually low Saturation)
+    lower_grey = np.array([0, 0, 50])  # Low saturation grey
+    upper_grey = np.array([180, 50, 200])
+    mask_grey = cv2.inRange(hsv, lower_grey, upper_grey)
+
+    # Combine masks to catch both types
+    mask = cv2.bitwise_or(mask_muddy, mask_grey)
+
+    h, w = mask.shape
+    bottom_half = mask[int(h*0.5):, :]
+    logging_pixels = cv2.countNonZero(bottom_half)
+    total_bottom_pixels = bottom_half.shape[0] * bottom_half.shape[1]
+    muddy_pixels = cv2.countNonZero(mask_muddy[int(h*0.5):, :])
+
+    return (logging_pixels / total_bottom_pixels) * 100, (muddy_pixels / total_bottom_pixels) * 100
+
+
+def texture_water_ratio(gray):
+    """Share of a TEXTURE_SIZE grayscale frame covered by large smooth, non-bright regions."""
+    texture = np.abs(cv2.Laplacian(gray, cv2.CV_64F))
+    texture_norm = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    # Smooth areas (low texture), excluding very bright ones (likely sky or reflections)
+    _, smooth_mask = cv2.threshold(texture_norm, 25, 255, cv2.THRESH_BINARY_INV)
+    _, bright_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
+    water_candidate = cv2.bitwise_and(smooth_mask, bright_mask)
+
+    kernel = np.ones((7, 7), np.uint8)
+    water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_CLOSE, kernel)
+    water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_OPEN, kernel)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(water_candidate, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    return int(areas[areas > TEXTURE_MIN_COMPONENT_AREA].sum()) / gray.size
+
+
+def decide_hsv(result, results):
+    return result["coverage"] > HSV_WATER_ABOVE
+
+
+@register_stage("hsv", decide=decide_hsv)
+def hsv_stage(frame, results):
+    coverage, muddy = water_coverage(frame.hsv)
+    return {"coverage": coverage, "muddy": muddy}
+
+
+@register_stage("texture", evidence=True)
+def texture_stage(frame, results):
+    ratio = texture_water_ratio(frame.gray_at(TEXTURE_SIZE))
+    return {"water_ratio": round(ratio, 4), "has_water": ratio > TEXTURE_WATER_RATIO}
+
+
+class DetectionEngine:
+    def __init__(self, stages=None, evidence=()):
+        unknown = set(evidence) - set(EVIDENCE_STAGES)
+        if unknown:
+            raise ValueError(f"unknown evidence stages: {sorted(unknown)}")
+        # Evidence goes first, so a deciding stage can't skip it
+        self.stages = [EVIDENCE_STAGES[name] for name in evidence] + list(STAGES if stages is None else stages)
+
+    def run(self, frame):
+        """
+        {"waterlogged", "decided_by", "stages": {name: result}, "timings_ms": {name: ms}}.
+        Stages after the deciding one are skipped. If no stage decides,
+        the verdict is False.
+        """
+        results, timings = {}, {}
+        waterlogged, decided_by = False, None
+        for stage in self.stages:
+            start = time.perf_counter()
+            result = stage.run(frame, results)
+            results[stage.name] = result
+            verdict = stage.decide(result, results) if stage.decide else None
+            timings[stage.name] = round((time.perf_counter() - start) * 1000, 2)
+            if verdict is not None:
+                waterlogged, decided_by = bool(verdict), stage.name
+                break
+        return {"waterlogged": waterlogged, "decided_by": decided_by, "stages": results, "timings_ms": timings}
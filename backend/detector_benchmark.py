@@ -0,0 +1,276 @@
+"""
+Image Detector Benchmark
+Offline speed and memory benchmark for the water detectors on procedurally
+generated street scenes (dry road, puddles, muddy flood) at several sizes, so
+it needs no network and no sample photos. Each (detector, size) case runs in
+a fresh interpreter so its peak memory is its own.
+
+    detect_water_logging        image_detection.py (texture detector, from a file path)
+    detect_waterlogging_local   backend local detector on the upload bytes
+    check_duplicate             ForensicAnalyzer.check_duplicate (pHash + index)
+    analyze                     the whole POST /analyze handler through TestClient
+
+Results (throughput, p50/p99 latency, peak RSS) are written as JSON; pass an
+earlier file with --compare to see what changed. Run from the repo root:
+
+    python backend/detector_benchmark.py --sizes 0.3,2,12,48 -o bench.json
+    python backend/detector_benchmark.py -o after.json --compare bench.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+DETECTORS = ["detect_water_logging", "detect_waterlogging_local", "check_duplicate", "analyze"]
+SCENES = ["dry_road", "puddles", "muddy_flood"]
+STRIP_ROWS = 512  # noise is added in strips so 48 MP scenes don't need float copies
+
+
+def scene_image(scene, megapixels, seed):
+    """A 4:3 RGB street scene: sky, road, and (depending on scene) grey puddles or brown flood water."""
+    rng = np.random.default_rng(seed)
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    h = int(w * 3 / 4)
+    # Lay the scene out on a small canvas and scale it up, then add full-resolution noise
+    ch, cw = max(h // 16, 24), max(w // 16, 32)
+    canvas = np.empty((ch, cw, 3), dtype=np.float32)
+    horizon = int(ch * rng.uniform(0.35, 0.5))
+    canvas[:horizon] = np.linspace((150, 190, 235), (200, 215, 235), horizon)[:, None, :]
+    canvas[horizon:] = (105, 105, 100)
+    if scene == "puddles":
+        for _ in range(rng.integers(3, 7)):
+            cy, cx = rng.integers(horizon, ch), rng.integers(0, cw)
+            ry, rx = rng.integers(1, max(2, ch // 10)), rng.integers(2, max(3, cw // 5))
+            canvas[max(cy - ry, horizon):cy + ry, max(cx - rx, 0):cx + rx] = (125, 128, 130)
+    elif scene == "muddy_flood":
+        level = int(horizon + (ch - horizon) * rng.uniform(0.1, 0.4))
+        canvas[level:] = (120, 92, 58)
+    image = cv2.resize(canvas, (w, h), interpolation=cv2.INTER_LINEAR).astype(np.uint8)
+    texture = 14 if scene == "dry_road" else 8
+    for top in range(0, h, STRIP_ROWS):
+        strip = image[top:top + STRIP_ROWS]
+        noise = rng.normal(0, texture, strip.shape).astype(np.float32)
+        strip[:] = np.clip(strip + noise, 0, 255).astype(np.uint8)
+    return image
+
+
+def scene_jpeg(scene, megapixels, seed):
+    buf = io.BytesIO()
+    Image.fromarray(scene_image(scene, megapixels, seed)).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def peak_rss_mb(pid="self"):
+    """
+    Peak resident memory of a process in MB. On Linux this is VmHWM, which
+    starts fresh at exec and can be reset (ru_maxrss would carry over the
+    parent's peak); elsewhere ru_maxrss of this process.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / 1e6
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def reset_peak_rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def case_runner(detector, tmp):
+    """Returns (call(path, contents, i), cleanup) for one detector, imported inside the case process."""
+    if detector == "detect_water_logging":
+        sys.path.insert(0, ROOT)
+        from image_detection import detect_water_logging
+        return (lambda path, contents, i: detect_water_logging(path)), (lambda: None)
+
+    # The backend, isolated from real data and remote services
+    os.environ.update(JALDRISHTI_REPORTS_DB=os.path.join(tmp, "reports.db"),
+                      PHASH_SNAPSHOT=os.path.join(tmp, "phash.npz"), ANALYZE_CACHE_DB="",
+                      JALDRISHTI_STATIC_DIR=os.path.join(tmp, "static"),
+                      AZURE_CV_KEY="", AZURE_CV_ENDPOINT="", GOOGLE_VISION_KEY="")
+    os.chdir(ROOT)
+    sys.path.insert(0, BACKEND)
+    import main
+
+    if detector == "detect_waterlogging_local":
+        return (lambda path, contents, i: main.detect_waterlogging_local(contents)), main.cpu_pool.shutdown
+    if detector == "check_duplicate":
+        return (lambda path, contents, i: main.ForensicAnalyzer.check_duplicate(Image.open(io.BytesIO(contents)))), main.cpu_pool.shutdown
+
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+
+    def analyze(path, contents, i):
+        # Trailing bytes after the JPEG end marker make each upload distinct for the cache and dedup
+        response = client.post("/analyze", files={"file": (f"bench_{i}.jpg", contents + i.to_bytes(8, "big"), "image/jpeg")})
+        response.raise_for_status()
+
+    return analyze, main.cpu_pool.shutdown
+
+
+def run_case(detector, megapixels, images, iterations, warmup):
+    """One (detector, size) measurement; runs in its own process (see --case)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        call, cleanup = case_runner(detector, tmp)
+        payloads = []
+        for path in images:
+            with open(path, "rb") as f:
+                payloads.append((path, f.read()))
+        try:
+            for i in range(warmup):
+                call(*payloads[i % len(payloads)], i)
+            # Peaks from here on belong to the timed calls (pool workers included)
+            workers = multiprocessing.active_children()
+            for pid in ["self"] + [worker.pid for worker in workers]:
+                reset_peak_rss(pid)
+            baseline = peak_rss_mb()
+            latencies = []
+            start = time.perf_counter()
+            for i in range(iterations):
+                path, contents = payloads[i % len(payloads)]
+                t = time.perf_counter()
+                call(path, contents, warmup + i)
+                latencies.append(time.perf_counter() - t)
+            wall = time.perf_counter() - start
+            peak = peak_rss_mb()
+            worker_peaks = [peak_rss_mb(worker.pid) for worker in workers]
+        finally:
+            cleanup()
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "detector": detector,
+        "megapixels": megapixels,
+        "iterations": iterations,
+        "throughput_per_s": round(iterations / wall, 3),
+        "megapixels_per_s": round(iterations * megapixels / wall, 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "peak_rss_mb": round(peak, 1),
+        "peak_rss_growth_mb": round(peak - baseline, 1),
+        # /analyze runs its CPU stages in pool workers; their own peak, largest worker
+        "worker_peak_rss_mb": round(max(worker_peaks), 1) if worker_peaks else None,
+    }
+
+
+def iterations_for(megapixels, base):
+    """Fewer repetitions for big images, but always enough for a p50."""
+    return max(5, int(base * min(1.0, 2.0 / megapixels)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["detector"], r["megapixels"]): r for r in json.load(f)["results"]}
+    print(f"\n📊 vs {baseline_path}")
+    print(f"{'detector':>26} {'MP':>5} {'p50 ms':>17} {'p99 ms':>17} {'peak MB':>15}")
+    for r in results:
+        old = baseline.get((r["detector"], r["megapixels"]))
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p99_ms", "peak_rss_mb"):
+            change = (r[key] / old[key] - 1) * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:.0f}→{r[key]:.0f} ({change:+.0f}%)")
+        print(f"{r['detector']:>26} {r['megapixels']:>5g} {cells[0]:>17} {cells[1]:>17} {cells[2]:>15}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the water detectors on synthetic scenes")
+    parser.add_argument("--sizes", default="0.3,2,12,48", help="comma-separated megapixel sizes")
+    parser.add_argument("--detectors", default=",".join(DETECTORS), help="comma-separated subset of " + ", ".join(DETECTORS))
+    parser.add_argument("--iterations", type=int, default=30, help="timed calls per case at <=2 MP (fewer for larger sizes)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed calls per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="detector_benchmark.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case and print JSON
+    args = parser.parse_args()
+
+    if args.case:
+        spec = json.loads(args.case)
+        print(json.dumps(run_case(**spec)))
+        return
+
+    sizes = [float(s) for s in args.sizes.split(",")]
+    detectors = args.detectors.split(",")
+    unknown = set(detectors) - set(DETECTORS)
+    if unknown:
+        parser.error(f"unknown detectors: {', '.join(sorted(unknown))}")
+
+    print("🧪 JalDrishti Detector Benchmark")
+    print("=" * 50)
+    print(f"   {os.cpu_count()} cores, sizes {sizes} MP, scenes {', '.join(SCENES)}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels in sizes:
+            images = []
+            for index, scene in enumerate(SCENES):
+                path = os.path.join(tmp, f"{scene}_{megapixels:g}mp.jpg")
+                with open(path, "wb") as f:
+                    f.write(scene_jpeg(scene, megapixels, args.seed + index))
+                images.append(path)
+            for detector in detectors:
+                spec = {"detector": detector, "megapixels": megapixels, "images": images,
+                        "iterations": iterations_for(megapixels, args.iterations), "warmup": args.warmup}
+                run = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(spec)],
+                                     capture_output=True, text=True)
+                if run.returncode != 0:
+                    print(f"❌ {detector} @ {megapixels:g} MP failed:\n{run.stderr[-2000:]}")
+                    continue
+                result = json.loads(run.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"   {detector:>26} {megapixels:>5g} MP  {result['throughput_per_s']:>8.2f}/s  "
+                      f"p50 {result['p50_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  peak {result['peak_rss_mb']:>7.1f} MB")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": sizes,
+            "scenes": SCENES,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
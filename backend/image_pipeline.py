@@ -0,0 +1,174 @@
+"""
+Image Analysis Pipeline (CPU stages)
+Decode, EXIF inspection, perceptual hash and the HSV water-coverage check used
+by /analyze. These are pure CPU work on the uploaded bytes, so main.py runs
+them in a process pool; this module deliberately imports nothing from main.py
+so pool workers start without the API, the Azure client or the report store.
+
+Each upload is decoded once, at a working resolution: EXIF is read from the
+file header before any pixels are decoded, JPEGs use draft mode so libjpeg
+scales by 1/2, 1/4 or 1/8 while decoding, and every detector reads the same
+RGB buffer. The water detectors themselves are the stages of
+detection_engine. The original bytes are never re-encoded.
+"""
+import io
+import os
+import tempfile
+import time
+
+import cv2
+import imagehash
+import numpy as np
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+from detection_engine import DetectionEngine
+
+DETECTOR_VERSION = "5"     # bump when detector output changes; part of the /analyze cache key
+WORKING_MAX_SIDE = 1024  # longest side detectors see; 12 MP photos decode at ~1/16 the pixels
+THUMBNAIL_SIDE = 320
+THUMBNAIL_FORMATS = {"webp": ("WEBP", {"quality": 75, "method": 4}), "jpg": ("JPEG", {"quality": 80, "optimize": True})}
+
+
+def exif_metadata(image):
+    """Checks for EXIF data presence as a proxy for original camera file."""
+    exif_data = image.getexif()
+    has_exif = False
+    camera_model = "Unknown"
+
+    if exif_data:
+        has_exif = True
+        for tag_id, value in exif_data.items():
+            tag = TAGS.get(tag_id, tag_id)
+            if tag == 'Model':
+                camera_model = str(value)
+
+    # Inference: No EXIF usually means stripped metadata (Web, WhatsApp, Screenshots)
+    source_inference = "Original Camera" if has_exif else "Likely Web/Digital Source"
+
+    return {
+        "has_exif": has_exif,
+        "camera_model": camera_model,
+        "inference": source_inference
+    }
+
+
+class PreparedImage:
+    """
+    One upload decoded once for every detector.
+
+    metadata:  EXIF summary, read from the header before the pixel decode
+    image:     RGB PIL image at working resolution (longest side within
+               about 2x max_side; JPEG draft scaling only goes down in powers of 2)
+    rgb, gray, hsv: NumPy views of that same decode, built on first use
+    gray_at(size):  grayscale resized to (width, height), cached per size
+    """
+
+    def __init__(self, contents, max_side=WORKING_MAX_SIDE):
+        image = Image.open(io.BytesIO(contents))
+        self.format = image.format
+        self.original_size = image.size
+        self.metadata = exif_metadata(image)
+
+        scale = max_side / max(image.size)
+        if scale < 1 and image.format == "JPEG":
+            # Decode straight to the smallest DCT scale still >= the working size
+            image.draft("RGB", (int(image.size[0] * scale), int(image.size[1] * scale)))
+        image.load()
+        image = image if image.mode == "RGB" else image.convert("RGB")
+        factor = max(image.size) // max_side
+        if factor >= 2:
+            # Formats without draft support (PNG, WebP): cheap integer box reduction
+            image = image.reduce(factor)
+        self.image = image
+        self._rgb = None
+        self._gray = None
+        self._hsv = None
+        self._gray_sizes = {}
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = np.asarray(self.image)
+        return self._rgb
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2HSV)
+        return self._hsv
+
+    def gray_at(self, size):
+        if size not in self._gray_sizes:
+            self._gray_sizes[size] = cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+        return self._gray_sizes[size]
+
+
+def classify_coverage(percentage, waterlogged=None):
+    """Water coverage (and the engine's verdict, if given) → the local detector's verdict fields."""
+    # Lowered threshold from 25% to 10% to catch smaller puddles
+    is_waterlogged = percentage > 10.0 if waterlogged is None else waterlogged
+
+    severity = "Low"
+    if percentage > 60: severity = "High"
+    elif percentage > 40: severity = "Moderate"
+
+    return {
+        "waterlogged": bool(is_waterlogged),
+        "confidence": round(percentage, 2),
+        "severity": severity,
+        "estimated_depth": f"{round(percentage / 20, 1)} ft" if is_waterlogged else "0 ft",
+    }
+
+
+# Opt-in evidence stages, e.g. DETECTION_EVIDENCE=texture; they add work to every upload
+DETECTION_EVIDENCE = [name.strip() for name in os.getenv("DETECTION_EVIDENCE", "").split(",") if name.strip()]
+ENGINE = DetectionEngine(evidence=DETECTION_EVIDENCE)
+
+
+def write_thumbnails(image, base_path):
+    """Save a THUMBNAIL_SIDE thumbnail of a PIL image as base_path.webp and base_path.jpg."""
+    thumb = image.copy()
+    thumb.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.Resampling.LANCZOS)
+    directory = os.path.dirname(base_path)
+    for ext, (fmt, options) in THUMBNAIL_FORMATS.items():
+        # Written aside and renamed, so a concurrent reader never sees half a file
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False) as tmp:
+            thumb.save(tmp, format=fmt, **options)
+        os.replace(tmp.name, f"{base_path}.{ext}")
+
+
+def make_thumbnails(contents, base_path):
+    """Thumbnails straight from upload bytes (JPEGs decode at 1/8 scale)."""
+    write_thumbnails(PreparedImage(contents, max_side=THUMBNAIL_SIDE).image, base_path)
+
+
+def inspect_image(contents, thumbnail_base=None):
+    """
+    Every CPU stage of /analyze for one upload, from a single decode.
+    Returns plain picklable values: EXIF metadata, the pHash as a hex string,
+    the HSV water coverage percentage and the detection engine's output
+    (verdict, per-stage results, and timings for decode, pHash and every
+    stage). With `thumbnail_base`, thumbnails are written from the same decode.
+    """
+    start = time.perf_counter()
+    prepared = PreparedImage(contents)
+    decoded = time.perf_counter()
+    phash = str(imagehash.phash(prepared.image))
+    hashed = time.perf_counter()
+    detection = ENGINE.run(prepared)
+    detection["timings_ms"] = {
+        "decode": round((decoded - start) * 1000, 2),
+        "phash": round((hashed - decoded) * 1000, 2),
+        **detection["timings_ms"],
+    }
+    if thumbnail_base:
+        write_thumbnails(prepared.image, thumbnail_base)
+    coverage = detection["stages"]["hsv"]["coverage"]
+    return {"metadata": prepared.metadata, "phash": phash, "coverage": coverage, "detection": detection}
@@ -1,14 +1,33 @@
-import cv2
-import numpy as np
+import os
+import sys
+
+if __name__ == "__main__":
+    # `python backend/main.py`: hand over to serve.py before any setup below runs.
+    # Spawned /analyze workers re-run the __main__ script, which must not be this one.
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py"), run_name="__main__")
+    sys.exit()
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import io
-from PIL import Image
-import os
+import time
 from dotenv import load_dotenv
 from azure.cognitiveservices.vision.computervision import ComputerVisionClient
 from azure.cognitiveservices.vision.computervision.models import VisualFeatureTypes
 from msrest.authentication import CognitiveServicesCredentials
+import json
+import zipfile
+from typing import List
+from fastapi.responses import Response, StreamingResponse
+from image_pipeline import DETECTION_EVIDENCE, DETECTOR_VERSION, classify_coverage, exif_metadata, inspect_image, make_thumbnails
+from analysis_cache import AnalysisCache
+from upload_store import UploadStore, UploadTooLarge
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Counter, Gauge, Histogram, MetricsMiddleware, render as render_metrics
+from profiling import ProfilingMiddleware, SamplingProfiler, profiler_router
 
 # Load environment variables
 load_dotenv()
@@ -23,20 +42,62 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# On-demand sampling profiler (see profiling.py), only with PROFILE_TOKEN set:
+# /debug/profile and single-request sampling both need the X-Profile-Token header
+PROFILER = SamplingProfiler(interval_s=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware, profiler=PROFILER, token=PROFILE_TOKEN)
+    app.include_router(profiler_router(PROFILER, PROFILE_TOKEN))
+# Outermost, so request timings include CORS handling
+app.add_middleware(MetricsMiddleware)
+
+# --- METRICS (served at /metrics) ---
+REMOTE_CALL_SECONDS = Histogram("jaldrishti_remote_call_seconds", "Azure / Google Vision call latency", ["service"])
+REMOTE_CALL_ERRORS = Counter("jaldrishti_remote_call_errors_total", "Remote detector calls that raised or reported a failure", ["service"])
+OPENCV_STAGE_SECONDS = Histogram("jaldrishti_opencv_stage_seconds", "Local detector time per stage, measured in the worker", ["stage"])
+DETECTOR_TIMEOUTS = Counter("jaldrishti_detector_timeouts_total", "Detectors still running at the /analyze deadline", ["detector"])
+CACHE_LOOKUPS = Counter("jaldrishti_cache_lookups_total", "Lookups in in-process response caches", ["cache", "result"])
+DUPLICATE_CHECKS = Counter("jaldrishti_duplicate_checks_total", "pHash near-duplicate index lookups", ["result"])
+
+ANALYSIS_CACHE_HIT = CACHE_LOOKUPS.labels("analysis", "hit")
+ANALYSIS_CACHE_MISS = CACHE_LOOKUPS.labels("analysis", "miss")
+DUPLICATE_FOUND = DUPLICATE_CHECKS.labels("duplicate")
+DUPLICATE_NEW = DUPLICATE_CHECKS.labels("new")
 
 # Azure Configuration
 AZURE_KEY = os.getenv("AZURE_CV_KEY")
 AZURE_ENDPOINT = os.getenv("AZURE_CV_ENDPOINT")
 
+REMOTE_TIMEOUT_S = 10  # per remote call, so a hung connection can't pin a remote-call thread
+
 # Initialize Client
 computervision_client = None
 if AZURE_KEY and AZURE_ENDPOINT:
     try:
         computervision_client = ComputerVisionClient(AZURE_ENDPOINT, CognitiveServicesCredentials(AZURE_KEY))
+        # One attempt per upload: msrest's default retries with backoff would outlast the /analyze deadline
+        computervision_client.config.connection.timeout = REMOTE_TIMEOUT_S
+        computervision_client.config.retry_policy.retries = 0
     except Exception as e:
         print(f"Failed to initialize Azure Client: {e}")
 
+# /analyze never blocks the event loop: decode/EXIF/pHash/HSV run in worker
+# processes, the blocking Azure SDK / Google Vision calls on their own bounded
+# thread pool, and disk work (upload storage, cache reads) on another, so
+# stalled remote services can't hold up ingest. Workers are spawned: each re-runs the launching script (serve.py
+# or uvicorn, never this module; see the __main__ hand-over above) and then
+# imports image_pipeline to unpickle its work.
+ANALYZE_PROCESSES = int(os.getenv("ANALYZE_PROCESSES", os.cpu_count() or 1))
+ANALYZE_IO_THREADS = int(os.getenv("ANALYZE_IO_THREADS", 16))
+ANALYZE_REMOTE_THREADS = int(os.getenv("ANALYZE_REMOTE_THREADS", 16))
+ANALYZE_DEADLINE_S = float(os.getenv("ANALYZE_DEADLINE_S", 8))  # /analyze answers with whatever finished by then
+cpu_pool = ProcessPoolExecutor(max_workers=ANALYZE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+io_pool = ThreadPoolExecutor(max_workers=ANALYZE_IO_THREADS, thread_name_prefix="analyze-io")
+remote_pool = ThreadPoolExecutor(max_workers=ANALYZE_REMOTE_THREADS, thread_name_prefix="analyze-remote")
+
 def detect_waterlogging_azure(image_data):
+    """Blocking Azure call plus tag interpretation; forensics are added by the caller."""
     if not computervision_client:
         return {"error": "Azure credentials not configured. Please set AZURE_CV_KEY and AZURE_CV_ENDPOINT."}
 
@@ -97,11 +158,6 @@ def detect_waterlogging_azure(image_data):
             else:
                 severity = "Moderate"
                 estimated_depth = "1.2 ft"
-                
-        # Forensic Check
-        image = Image.open(image_stream)
-        forensics = ForensicAnalyzer.check_metadata(image)
-        is_spam_duplicate = ForensicAnalyzer.check_duplicate(image)
 
         return {
             "waterlogged": is_waterlogged,
@@ -111,57 +167,62 @@ def detect_waterlogging_azure(image_data):
             "details": {
                 "tags": found_tags,
                 "caption": description
-            },
-            "forensics": {
-                "source": forensics["inference"],
-                "camera": forensics["camera_model"],
-                "is_duplicate": is_spam_duplicate
             }
         }
 
     except Exception as e:
         print(f"Azure API Error: {e}")
-        # Fallback to local OpenCV if Azure fails
-        return None
+        # merge_detections falls back to local OpenCV; is_complete keeps this verdict out of the cache
+        return {"error": f"Azure API Error: {e}"}
 
+import atexit
 import imagehash
-from PIL.ExifTags import TAGS
-
-# In-memory cache for duplicate detection (resets on restart)
-seen_hashes = set()
+from phash_index import PhashIndex
+
+# Near-duplicate detection: recent upload pHashes, snapshotted to disk so it survives restarts
+phash_index = PhashIndex(
+    radius=int(os.getenv("PHASH_RADIUS", 4)),
+    max_entries=int(os.getenv("PHASH_MAX_ENTRIES", 1_000_000)),
+    max_age_s=float(os.getenv("PHASH_MAX_AGE_DAYS", 30)) * 86400,
+    snapshot_path=os.getenv("PHASH_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "phash_index.npz")),
+)
+atexit.register(phash_index.save)
+# Lookups are quick, but an insert now and then re-sorts the band tables (up to
+# PHASH_MAX_ENTRIES hashes), so /analyze checks on this thread rather than the
+# event loop. The index serializes callers anyway, so one thread is enough.
+phash_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phash-index")
+Gauge("jaldrishti_phash_index_entries", "Upload pHashes in the near-duplicate index").set_function(lambda: len(phash_index))
+
+# Google Vision is only called (and timed) when a key is configured
+GOOGLE_ENABLED = bool(os.getenv("GOOGLE_VISION_KEY"))
+
+# --- /analyze result cache (SHA-256 of the upload + detector version) ---
+# The version also records which remote detectors and evidence stages are
+# configured, so adding an Azure key doesn't keep serving OpenCV-only verdicts.
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv("ANALYZE_CACHE_ENTRIES", 10_000)),
+    ttl_s=float(os.getenv("ANALYZE_CACHE_TTL_S", 86400)),
+    db_path=os.getenv("ANALYZE_CACHE_DB") or None,
+    version="+".join([DETECTOR_VERSION] + DETECTION_EVIDENCE + [name for name, enabled in (
+        ("azure", computervision_client), ("google", GOOGLE_ENABLED)) if enabled]),
+)
+Gauge("jaldrishti_analysis_cache_entries", "Verdicts held in memory by the /analyze cache").set_function(
+    lambda: analysis_cache.stats()["memory_entries"])
 
 class ForensicAnalyzer:
-    @staticmethod
-    def check_metadata(image):
-        """Checks for EXIF data presence as a proxy for original camera file."""
-        exif_data = image.getexif()
-        has_exif = False
-        camera_model = "Unknown"
-        
-        if exif_data:
-            has_exif = True
-            for tag_id, value in exif_data.items():
-                tag = TAGS.get(tag_id, tag_id)
-                if tag == 'Model':
-                    camera_model = str(value)
-        
-        # Inference: No EXIF usually means stripped metadata (Web, WhatsApp, Screenshots)
-        source_inference = "Original Camera" if has_exif else "Likely Web/Digital Source"
-
-        return {
-            "has_exif": has_exif,
-            "camera_model": camera_model,
-            "inference": source_inference
-        }
+    check_metadata = staticmethod(exif_metadata)
 
     @staticmethod
     def check_duplicate(image):
-        """Checks if image has been uploaded recently using perceptual hashing."""
-        phash = imagehash.phash(image)
-        if phash in seen_hashes:
-            return True
-        seen_hashes.add(phash)
-        return False
+        """Checks if a near-identical image has been uploaded recently using perceptual hashing."""
+        return ForensicAnalyzer.seen_before(str(imagehash.phash(image)))
+
+    @staticmethod
+    def seen_before(phash):
+        """Records a pHash (hex string); True if it is within PHASH_RADIUS of a recent upload."""
+        duplicate = phash_index.check_and_add(phash) is not None
+        (DUPLICATE_FOUND if duplicate else DUPLICATE_NEW).inc()
+        return duplicate
 
     @staticmethod
     def check_web_existence(image_path_or_bytes):
@@ -209,7 +270,7 @@ class ForensicAnalyzer:
                 ]
             }
             
-            response = requests.post(url, json=payload)
+            response = requests.post(url, json=payload, timeout=REMOTE_TIMEOUT_S)
             if response.status_code == 200:
                 data = response.json()
                 web_detection = data.get("responses", [{}])[0].get("webDetection", {})
@@ -229,135 +290,315 @@ class ForensicAnalyzer:
             print(f"Google Vision Error: {e}")
             return {"found_online": False, "source": "Google Vision Request Failed"}
 
-def detect_waterlogging_local(image):
-    # Forensic Check
-    forensics = ForensicAnalyzer.check_metadata(image)
-    is_spam_duplicate = ForensicAnalyzer.check_duplicate(image)
-    
-    # Check Bing (Simulated call)
-    # bing_check = ForensicAnalyzer.check_bing_web_search(image)
-    
-    # Check Google Vision (Real call if key exists)
-    import io
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG") # Ensure we have bytes
-    img_bytes = buf.getvalue()
-    
-    google_check = ForensicAnalyzer.check_google_vision_web_detection(img_bytes)
-    
+GOOGLE_UNAVAILABLE = {"found_online": False, "source": "Google Vision Unavailable"}
+GOOGLE_KEY_MISSING = {"found_online": False, "source": "Google Vision Key Missing"}
+
+def build_local_result(coverage, metadata, google_check, is_spam_duplicate, detection=None):
+    """Assemble the local detector's response from the CPU stages and the Google web check."""
+    forensics = dict(metadata)
     # Update inference if Google found it
     if google_check["found_online"]:
         forensics["inference"] = "Confirmed Web Cloud Source"
         forensics["camera_model"] = "Online Image Match"
 
-    # Convert PIL to OpenCV format (BGR)
-    img_array = np.array(image)
-    if len(img_array.shape) == 2:  # Grayscale
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
-    elif img_array.shape[2] == 4:  # RGBA
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
-    else:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+    result = classify_coverage(coverage, detection["waterlogged"] if detection else None)
+    result["method"] = "local_opencv"
+    if detection:
+        result["pipeline"] = detection
+    result["forensics"] = {
+        "source": forensics["inference"],
+        "camera": forensics["camera_model"],
+        "is_duplicate": is_spam_duplicate
+    }
+    return result
 
-    hsv = cv2.cvtColor(img_array, cv2.COLOR_BGR2HSV)
-    
-    # 1. Muddy/Brown Water Range (Hue 10-30 approx for brown)
-    lower_muddy = np.array([0, 40, 40])
-    upper_muddy = np.array([35, 255, 255])
-    mask_muddy = cv2.inRange(hsv, lower_muddy, upper_muddy)
-    
-    # 2. Reflection/Clear Water Range (Blueish/Greyish - usually low Saturation)
-    lower_grey = np.array([0, 0, 50]) # Low saturation grey
-    upper_grey = np.array([180, 50, 200])
-    mask_grey = cv2.inRange(hsv, lower_grey, upper_grey)
+def detect_waterlogging_local(image_data):
+    """Synchronous local detector on the uploaded bytes (/analyze uses the pooled path below)."""
+    inspection = inspect_image(image_data)
+    is_spam_duplicate = ForensicAnalyzer.seen_before(inspection["phash"])
 
-    # Combine masks to catch both types
-    mask = cv2.bitwise_or(mask_muddy, mask_grey)
-    
-    h, w = mask.shape
-    bottom_half = mask[int(h*0.5):, :]
-    logging_pixels = cv2.countNonZero(bottom_half)
-    total_bottom_pixels = bottom_half.shape[0] * bottom_half.shape[1]
-    
-    percentage = (logging_pixels / total_bottom_pixels) * 100
-    
-    # Lowered threshold from 25% to 10% to catch smaller puddles
-    is_waterlogged = percentage > 10.0
-    
-    severity = "Low"
-    if percentage > 60: severity = "High"
-    elif percentage > 40: severity = "Moderate"
-        
-    return {
-        "waterlogged": bool(is_waterlogged),
-        "confidence": round(percentage, 2),
-        "severity": severity,
-        "estimated_depth": f"{round(percentage / 20, 1)} ft" if is_waterlogged else "0 ft",
-        "method": "local_opencv",
-        "forensics": {
-            "source": forensics["inference"],
-            "camera": forensics["camera_model"],
-            "is_duplicate": is_spam_duplicate
-        }
-    }
+    # Check Google Vision (Real call if key exists) on the original bytes
+    google_check = ForensicAnalyzer.check_google_vision_web_detection(image_data)
+
+    return build_local_result(inspection["coverage"], inspection["metadata"], google_check, is_spam_duplicate,
+                              inspection["detection"])
 
 from fastapi.staticfiles import StaticFiles
 import shutil
 import uuid
 
-# Mount static directory for images
-os.makedirs("backend/static/uploads", exist_ok=True)
-app.mount("/static", StaticFiles(directory="backend/static"), name="static")
+# --- Upload storage (content-addressed, with thumbnails) ---
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-@app.post("/analyze")
-async def analyze_image(file: UploadFile = File(...)):
-    contents = await file.read()
-    
-    # Save Image Locally so we can view it later
-    file_ext = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = f"backend/static/uploads/{filename}"
-    
-    with open(file_path, "wb") as f:
-        f.write(contents)
-    
-    # URL for frontend to access
-    image_url = f"http://localhost:8000/static/uploads/{filename}"
+class ImmutableStaticFiles(StaticFiles):
+    """Uploads and thumbnails are named by content hash, so a URL never changes meaning."""
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
 
-    # Try Azure first
-    if computervision_client:
-        result = detect_waterlogging_azure(contents)
-        # Debugging: Print Azure result
-        if result:
-            print(f"[DEBUG] Azure Result: Waterlogged={result.get('waterlogged')}, Tags={result.get('details', {}).get('tags')}")
-        
-        if result and "error" not in result:
-            # HYBRID LOGIC: If Azure says "No", double check with OpenCV
-            if not result["waterlogged"]:
-                 print("[DEBUG] Azure missed it. Running Hybrid Fallback...")
-                 # Run Local Check
-                 image = Image.open(io.BytesIO(contents))
-                 local_result = detect_waterlogging_local(image)
-                 print(f"[DEBUG] Local Fallback Result: Waterlogged={local_result.get('waterlogged')}, Conf={local_result.get('confidence')}")
-                 
-                 if local_result["waterlogged"]:
-                     # Azure missed it, but Local found it -> Trust Local (Safety First)
-                     local_result["method"] = "Hybrid (Azure missed, OpenCV detected)"
-                     local_result["details"] = result.get("details", {})
-                     local_result["details"]["azure_miss"] = "Azure failed to detect water."
-                     local_result["image_url"] = image_url
-                     return local_result
-            
-            result["method"] = "azure_api"
-            result["image_url"] = image_url
-            return result
-            
-    # Fallback to Local (if Azure not configured or errored)
-    image = Image.open(io.BytesIO(contents))
-    local_result = detect_waterlogging_local(image)
-    local_result["image_url"] = image_url
+STATIC_DIR = os.getenv("JALDRISHTI_STATIC_DIR", "backend/static")
+upload_store = UploadStore(
+    STATIC_DIR, "http://localhost:8000/static",
+    max_bytes=int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024)),
+)
+app.mount("/static", ImmutableStaticFiles(directory=STATIC_DIR), name="static")
+
+def forensics_summary(metadata, is_spam_duplicate):
+    return {
+        "source": metadata["inference"],
+        "camera": metadata["camera_model"],
+        "is_duplicate": is_spam_duplicate
+    }
+
+def merge_detections(azure_result, inspection, google_check, is_spam_duplicate):
+    """
+    The hybrid rules over whichever detectors finished: Azure's verdict wins
+    unless it missed water that OpenCV found; without a usable Azure result,
+    OpenCV's verdict is used. Returns None if neither produced one.
+    """
+    local_result = None
+    if inspection is not None:
+        local_result = build_local_result(inspection["coverage"], inspection["metadata"], google_check, is_spam_duplicate,
+                                          inspection["detection"])
+
+    if azure_result and "error" not in azure_result:
+        if inspection is not None:
+            azure_result["forensics"] = forensics_summary(inspection["metadata"], is_spam_duplicate)
+            azure_result["pipeline"] = inspection["detection"]
+        # HYBRID LOGIC: If Azure says "No", double check with OpenCV
+        if not azure_result["waterlogged"] and local_result is not None and local_result["waterlogged"]:
+            # Azure missed it, but Local found it -> Trust Local (Safety First)
+            local_result["method"] = "Hybrid (Azure missed, OpenCV detected)"
+            local_result["details"] = azure_result.get("details", {})
+            local_result["details"]["azure_miss"] = "Azure failed to detect water."
+            return local_result
+        azure_result["method"] = "azure_api"
+        return azure_result
+
+    # Fallback to Local (if Azure not configured, errored or timed out)
     return local_result
 
+GOOGLE_FAILURES = ("Google API Error", "Google Vision Request Failed")
+
+def remote_failed(service, result):
+    """True if a remote detector's result reports a failed call rather than a verdict."""
+    if service == "azure":
+        return result is None or "error" in result
+    if service == "google":
+        return result["source"].startswith(GOOGLE_FAILURES)
+    return False
+
+def is_complete(detectors, finished):
+    """True if every launched detector finished and none reported a remote failure."""
+    if len(finished) != len(detectors):
+        return False
+    return not any(remote_failed(name, result) for name, result in finished.items())
+
+def timed_remote_call(service, call, contents):
+    """A blocking remote detector call (run on remote_pool) with its latency and failures recorded."""
+    start = time.perf_counter()
+    try:
+        result = call(contents)
+    except Exception:
+        REMOTE_CALL_ERRORS.labels(service).inc()
+        raise
+    finally:
+        REMOTE_CALL_SECONDS.labels(service).observe(time.perf_counter() - start)
+    if remote_failed(service, result):
+        REMOTE_CALL_ERRORS.labels(service).inc()
+    return result
+
+def stored_urls(stored):
+    return {"image_url": upload_store.image_url(stored), "thumbnails": upload_store.thumbnail_urls(stored)}
+
+async def ingest_upload(stream):
+    """Save an upload (chunked, size-capped, named by its SHA-256) so we can view it later."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(io_pool, upload_store.ingest, stream)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+async def analyze_stored(stored):
+    """
+    The full /analyze pipeline for one stored upload. Returns the verdict
+    dict, or raises HTTPException (504 if no detector finished in time, 422
+    if the image could not be analyzed).
+    """
+    loop = asyncio.get_running_loop()
+    contents = await loop.run_in_executor(io_pool, stored.read)
+    thumbnail_base = None if upload_store.has_thumbnails(stored) else upload_store.thumbnail_base(stored)
+
+    cache_key = analysis_cache.digest_key(stored.digest)
+    cached = await loop.run_in_executor(io_pool, analysis_cache.get, cache_key)
+    if cached is not None:
+        # Byte-identical re-upload: no detectors, no remote calls
+        ANALYSIS_CACHE_HIT.inc()
+        result = cached["result"]
+        await loop.run_in_executor(phash_pool, ForensicAnalyzer.seen_before, cached["phash"])
+        if "forensics" in result:
+            result["forensics"]["is_duplicate"] = True
+        if thumbnail_base:
+            await loop.run_in_executor(cpu_pool, make_thumbnails, contents, thumbnail_base)
+        result.update(stored_urls(stored))
+        result["timed_out"] = []
+        result["cached"] = True
+        return result
+    ANALYSIS_CACHE_MISS.inc()
+
+    # Launch every detector at once; whatever finishes within the deadline is merged
+    detectors = {
+        # Decode once in a worker process: EXIF, pHash, HSV coverage (+ thumbnails)
+        "opencv": loop.run_in_executor(cpu_pool, inspect_image, contents, thumbnail_base),
+    }
+    if GOOGLE_ENABLED:
+        # Vision accepts the uploaded bytes as-is, so it doesn't wait for the decode
+        detectors["google"] = loop.run_in_executor(remote_pool, timed_remote_call, "google",
+                                                   ForensicAnalyzer.check_google_vision_web_detection, contents)
+    if computervision_client:
+        detectors["azure"] = loop.run_in_executor(remote_pool, timed_remote_call, "azure", detect_waterlogging_azure, contents)
+    done, _ = await asyncio.wait(detectors.values(), timeout=ANALYZE_DEADLINE_S)
+
+    timed_out = [name for name, future in detectors.items() if future not in done]
+    for name in timed_out:
+        DETECTOR_TIMEOUTS.labels(name).inc()
+    finished = {}
+    for name, future in detectors.items():
+        if future in done:
+            if future.exception() is None:
+                finished[name] = future.result()
+            else:
+                print(f"[DEBUG] {name} detector failed: {future.exception()}")
+
+    inspection = finished.get("opencv")
+    if inspection is not None:
+        for stage, ms in inspection["detection"]["timings_ms"].items():
+            OPENCV_STAGE_SECONDS.labels(stage).observe(ms / 1000)
+        is_spam_duplicate = await loop.run_in_executor(phash_pool, ForensicAnalyzer.seen_before, inspection["phash"])
+    else:
+        is_spam_duplicate = False
+        if "opencv" in timed_out:
+            # Still remember the image once it's hashed, so a re-upload is caught
+            detectors["opencv"].add_done_callback(
+                lambda future: future.exception() is None
+                and phash_pool.submit(ForensicAnalyzer.seen_before, future.result()["phash"])
+            )
+
+    azure_result = finished.get("azure")
+    # Debugging: Print Azure result
+    if azure_result:
+        print(f"[DEBUG] Azure Result: Waterlogged={azure_result.get('waterlogged')}, Tags={azure_result.get('details', {}).get('tags')}")
+    google_check = finished.get("google") or (GOOGLE_UNAVAILABLE if GOOGLE_ENABLED else GOOGLE_KEY_MISSING)
+
+    result = merge_detections(azure_result, inspection, google_check, is_spam_duplicate)
+    if result is None:
+        if timed_out:
+            raise HTTPException(status_code=504, detail=f"No detector finished within {ANALYZE_DEADLINE_S:g}s")
+        raise HTTPException(status_code=422, detail="Image could not be analyzed")
+
+    if is_complete(detectors, finished):
+        # Only complete verdicts are cached; a partial one is retried next time
+        analysis_cache.put(cache_key, {"result": result, "phash": inspection["phash"]})
+    result.update(stored_urls(stored))
+    result["timed_out"] = timed_out
+    result["cached"] = False
+    return result
+
+@app.post("/analyze")
+async def analyze_image(file: UploadFile = File(...)):
+    # Starlette has already spooled the body to a temp file; copy it out in chunks
+    return await analyze_stored(await ingest_upload(file.file))
+
+# --- Batch analysis (many files or a zip, streamed as NDJSON) ---
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", 2 * ANALYZE_PROCESSES))
+ANALYZE_BATCH_MAX_FILES = int(os.getenv("ANALYZE_BATCH_MAX_FILES", 500))
+BATCH_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+def batch_items(uploads):
+    """
+    (name, open, lock) for every image in the request: plain files as-is and
+    the image members of any .zip. Each `open` returns a binary file object,
+    so zip members are only decompressed, chunk by chunk under the
+    UPLOAD_MAX_BYTES cap, when their turn comes. Members of one archive share
+    its file handle and its lock; plain files have no lock.
+    """
+    items = []
+    for upload in uploads:
+        if upload.filename.lower().endswith(".zip") or upload.content_type in ("application/zip", "application/x-zip-compressed"):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{upload.filename} is not a valid zip archive")
+            archive_lock = asyncio.Lock()
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or not name.lower().endswith(BATCH_IMAGE_EXTENSIONS) or "/__MACOSX/" in f"/{name}":
+                    continue
+                items.append((name, lambda archive=archive, member=member: archive.open(member), archive_lock))
+        else:
+            items.append((upload.filename, lambda upload=upload: upload.file, None))
+        if len(items) > ANALYZE_BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {ANALYZE_BATCH_MAX_FILES} images per batch")
+    return items
+
+@app.post("/analyze/batch")
+async def analyze_batch(files: List[UploadFile] = File(...)):
+    """
+    Analyze many images in one request. Streams one JSON line per image as it
+    completes (not in upload order; each line carries its `index` and
+    `filename`), then a summary line. A failing image yields an `error` line
+    instead of failing the batch. At most ANALYZE_BATCH_CONCURRENCY images are
+    in flight, so a large batch doesn't starve single /analyze requests.
+    """
+    items = batch_items(files)
+    limit = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+
+    async def ingest_item(open_item, archive_lock):
+        if archive_lock is None:
+            return await ingest_upload(open_item())
+        # Zip members of one archive share its file handle, so they are read one at a time
+        async with archive_lock:
+            with open_item() as stream:
+                return await ingest_upload(stream)
+
+    async def run(index, name, open_item, archive_lock):
+        async with limit:
+            line = {"index": index, "filename": name}
+            try:
+                stored = await ingest_item(open_item, archive_lock)
+                line["result"] = await analyze_stored(stored)
+            except HTTPException as e:
+                line.update(status=e.status_code, error=e.detail)
+            except Exception as e:
+                line.update(status=500, error=f"{type(e).__name__}: {e}")
+            return line
+
+    async def stream():
+        tasks = [asyncio.ensure_future(run(index, *item)) for index, item in enumerate(items)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                failed += "error" in line
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"summary": {"images": len(items), "analyzed": len(items) - failed, "failed": failed}}) + "\n"
+        finally:
+            # Client went away: don't keep analyzing for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/analyze/cache")
+def get_analysis_cache_stats():
+    """Hit rate and size of the /analyze result cache."""
+    return analysis_cache.stats()
+
+@app.get("/metrics")
+def metrics():
+    """Request latency per route, detector timings, and cache / duplicate-index hits (Prometheus text format)"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # ... existing code ...
 
 from pydantic import BaseModel
@@ -391,9 +632,22 @@ class Report(BaseModel):
     upvotes: int = 0 # "Agree"
     downvotes: int = 0 # "Disagree"
     reporter_id: str
+    ward_no: Optional[str] = None # assigned from lat/lng on submit
+
+# --- Report Store (SQLite, survives restarts) ---
+from report_store import ReportStore
+from ward_index import WardIndex, parse_bbox
+
+reports_db = ReportStore(os.getenv(
+    "JALDRISHTI_REPORTS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports.db")
+))
 
-# --- In-Memory Database ---
-reports_db: List[Report] = []
+# --- Ward Spatial Index (lat/lng → ward) ---
+WARDS_GEOJSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "data", "delhi-wards.geojson")
+ward_index = WardIndex.from_geojson(WARDS_GEOJSON) if os.path.exists(WARDS_GEOJSON) else None
+if ward_index is None:
+    print(f"Ward GeoJSON not found at {WARDS_GEOJSON}; reports will not be assigned to wards")
 
 # --- Endpoints ---
 
@@ -401,13 +655,27 @@ class Reaction(BaseModel):
     type: str # "agree" or "disagree"
 
 @app.get("/reports")
-def get_reports(status: str = None):
-    """Fetches reports. Optionally filter by status."""
+def get_reports(status: str = None, bbox: str = None, ward_no: str = None):
+    """Fetches reports. Optionally filter by status, bbox (min_lng,min_lat,max_lng,max_lat) or ward."""
+    try:
+        box = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     if status:
-        return [r for r in reports_db if r.admin_status == status]
+        return Response(content=reports_db.list_json(status=status, bbox=box, ward_no=ward_no), media_type="application/json")
     
     # By default, exclude "auto_rejected" so they don't clutter Admin
-    return [r for r in reports_db if r.admin_status != "auto_rejected"]
+    return Response(content=reports_db.list_json(exclude_status="auto_rejected", bbox=box, ward_no=ward_no), media_type="application/json")
+
+@app.get("/reports/heatmap")
+def get_report_heatmap(since: str = None, until: str = None, ward_no: str = None, resolution: str = "hour"):
+    """Per-ward, per-hour (or per-day) report totals from the running aggregates."""
+    try:
+        buckets = reports_db.heatmap(since=since, until=until, ward_no=ward_no, resolution=resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, "buckets": buckets}
 
 @app.post("/submit")
 def submit_report(submission: ReportSubmission):
@@ -449,28 +717,24 @@ def submit_report(submission: ReportSubmission):
         reporter_id=submission.user_id
     )
     
-    reports_db.append(new_report)
-    return {"status": "success", "report_id": new_report.id, "is_spam": is_spam}
+    ward = ward_index.locate(submission.lng, submission.lat) if ward_index else None
+    if ward:
+        new_report.ward_no = str(ward.get("Ward_No"))
+    
+    reports_db.add(new_report, lat=submission.lat, lng=submission.lng, ward_no=new_report.ward_no)
+    return {"status": "success", "report_id": new_report.id, "is_spam": is_spam, "ward_no": new_report.ward_no}
 
 @app.put("/reports/{report_id}/status")
 def update_status(report_id: str, status: str): # status: approved, rejected
-    for report in reports_db:
-        if report.id == report_id:
-            report.admin_status = status
-            return {"status": "updated", "new_status": status}
+    if reports_db.update_status(report_id, status):
+        return {"status": "updated", "new_status": status}
     raise HTTPException(status_code=404, detail="Report not found")
 
 @app.post("/reports/{report_id}/react")
 def react_to_report(report_id: str, reaction: Reaction):
-    for report in reports_db:
-        if report.id == report_id:
-            if reaction.type == "agree":
-                report.upvotes += 1
-            elif reaction.type == "disagree":
-                report.downvotes += 1
-            return {"status": "reaction_added", "upvotes": report.upvotes, "downvotes": report.downvotes}
+    votes = reports_db.react(report_id, reaction.type)
+    if votes:
+        upvotes, downvotes = votes
+        return {"status": "reaction_added", "upvotes": upvotes, "downvotes": downvotes}
     raise HTTPException(status_code=404, detail="Report not found")
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,243 @@
+"""
+Near-Duplicate Image Index
+Perceptual hashes of recent uploads, searchable by Hamming distance. The
+64-bit pHash is split into m bands (default 3, of 22/21/21 bits), each with
+its own lookup table (multi-index hashing): two hashes within distance r must
+agree to within r // m bits on at least one band, so a query only probes a
+few dozen table keys instead of scanning every stored hash.
+
+Storage is a handful of NumPy arrays (~40 bytes per hash): sorted band
+tables rebuilt in bulk, plus small dicts for hashes added since the last
+rebuild. Entries are evicted by age and, once the index is full, least
+recently seen first. The index is snapshotted to disk (.npz, written
+atomically) so duplicate detection survives restarts.
+"""
+import os
+import tempfile
+import threading
+import time
+from itertools import combinations
+
+import numpy as np
+
+HASH_BITS = 64
+EVICT_FRACTION = 0.01   # share of capacity dropped at once when the index is full
+EXPIRY_SLACK = 0.01     # expired entries may linger up to this share of max_age_s
+
+
+def _flip_masks(width, radius):
+    """XOR masks reaching every band value within `radius` bits (0 first)."""
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(width), flips):
+            masks.append(sum(1 << bit for bit in bits))
+    return np.array(masks, dtype=np.uint64)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values):
+        return np.bitwise_count(values)
+else:
+    def _popcount(values):
+        return np.unpackbits(values.view(np.uint8)).reshape(-1, HASH_BITS).sum(axis=1)
+
+
+class PhashIndex:
+    """
+    Bounded near-duplicate index over 64-bit pHashes (hex strings as
+    produced by str(imagehash.phash(...)), or ints).
+
+    radius:          max Hamming distance counted as a duplicate
+    max_entries:     capacity; when full, the least recently seen hashes go
+    max_age_s:       entries not seen for this long are dropped
+    snapshot_path:   .npz file loaded on start and rewritten (in a background
+                     thread) every `snapshot_every` insertions and on save()
+    """
+
+    def __init__(self, radius=4, max_entries=1_000_000, max_age_s=30 * 86400,
+                 snapshot_path=None, snapshot_every=500, bands=3):
+        self.radius = radius
+        self.max_entries = max_entries
+        self.max_age_s = max_age_s
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+
+        widths = [HASH_BITS // bands + (i < HASH_BITS % bands) for i in range(bands)]
+        self._shifts = [sum(widths[:i]) for i in range(bands)]
+        self._masks = [(1 << width) - 1 for width in widths]
+        self._probes = [_flip_masks(width, radius // bands) for width in widths]
+        self._probe_lists = [probes.tolist() for probes in self._probes]
+
+        # Slot arrays (grown by doubling); dead slots are compacted away on rebuild
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._seen_at = np.zeros(1024, dtype=np.float64)
+        self._live = np.zeros(1024, dtype=bool)
+        self._size = 0
+        self._count = 0
+        # Per band: sorted band values and their slots, plus recent inserts (value → slots)
+        self._band_values = [np.zeros(0, dtype=np.uint64) for _ in range(bands)]
+        self._band_slots = [np.zeros(0, dtype=np.int64) for _ in range(bands)]
+        self._recent = [{} for _ in range(bands)]
+        self._recent_count = 0
+        self._next_expiry = 0.0
+
+        self._unsaved = 0
+        self._saving = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # one snapshot written at a time, newest last
+        if snapshot_path and os.path.exists(snapshot_path):
+            self._load(snapshot_path)
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def _as_int(phash):
+        return int(phash, 16) if isinstance(phash, str) else int(phash)
+
+    def _band_keys(self, h):
+        return [(h >> shift) & mask for shift, mask in zip(self._shifts, self._masks)]
+
+    def _rebuild(self):
+        """Compact live slots and re-sort every band table."""
+        live = np.flatnonzero(self._live[:self._size])
+        n = len(live)
+        capacity = max(1024, 2 * n)
+        hashes, seen_at = self._hashes[live], self._seen_at[live]
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._seen_at = np.zeros(capacity, dtype=np.float64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._hashes[:n], self._seen_at[:n], self._live[:n] = hashes, seen_at, True
+        self._size = self._count = n
+
+        for band, (shift, mask) in enumerate(zip(self._shifts, self._masks)):
+            values = (hashes >> np.uint64(shift)) & np.uint64(mask)
+            order = np.argsort(values, kind="stable")
+            self._band_values[band] = values[order]
+            self._band_slots[band] = order.astype(np.int64)
+        self._recent = [{} for _ in self._recent]
+        self._recent_count = 0
+
+    def _append(self, h, seen_at):
+        if self._size == len(self._hashes):
+            grow = len(self._hashes)
+            self._hashes = np.concatenate([self._hashes, np.zeros(grow, dtype=np.uint64)])
+            self._seen_at = np.concatenate([self._seen_at, np.zeros(grow, dtype=np.float64)])
+            self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+        slot = self._size
+        self._hashes[slot], self._seen_at[slot], self._live[slot] = h, seen_at, True
+        self._size += 1
+        self._count += 1
+        for table, key in zip(self._recent, self._band_keys(h)):
+            table.setdefault(key, []).append(slot)
+        self._recent_count += 1
+        if self._recent_count > max(4096, self._count // 8) or self._size > 2 * self._count + 4096:
+            self._rebuild()
+
+    def _evict(self, now):
+        live = self._live[:self._size]
+        if now >= self._next_expiry:
+            live &= self._seen_at[:self._size] >= now - self.max_age_s
+            self._count = int(np.count_nonzero(live))
+            self._next_expiry = now + self.max_age_s * EXPIRY_SLACK
+        if self._count > self.max_entries:
+            # Least recently seen first, in one batch
+            excess = self._count - self.max_entries + max(1, int(self.max_entries * EVICT_FRACTION))
+            seen_at = np.where(live, self._seen_at[:self._size], np.inf)
+            live[np.argpartition(seen_at, excess - 1)[:excess]] = False
+            self._count = int(np.count_nonzero(live))
+
+    def _nearest(self, h):
+        """Closest live slot within radius, as (slot, distance), or None."""
+        slots, recent_slots = [], []
+        for band, key in enumerate(self._band_keys(h)):
+            keys = self._probes[band] ^ np.uint64(key)
+            # Bucket bounds for every probe key in one search: [key, key + 1)
+            lo, hi = np.searchsorted(self._band_values[band], np.stack([keys, keys + np.uint64(1)])).tolist()
+            band_slots = self._band_slots[band]
+            for start, end in zip(lo, hi):
+                if end > start:
+                    slots.append(band_slots[start:end])
+            recent = self._recent[band]
+            if recent:
+                for hit in map(recent.get, [key ^ mask for mask in self._probe_lists[band]]):
+                    if hit:
+                        recent_slots.extend(hit)
+        if recent_slots:
+            slots.append(np.array(recent_slots, dtype=np.int64))
+        if not slots:
+            return None
+        slots = np.concatenate(slots)
+        slots = slots[self._live[slots]]
+        if not len(slots):
+            return None
+        distances = _popcount(self._hashes[slots] ^ np.uint64(h))
+        best = int(np.argmin(distances))
+        if distances[best] > self.radius:
+            return None
+        return int(slots[best]), int(distances[best])
+
+    def find(self, phash):
+        """(matched hex hash, distance) for the closest stored hash within radius, or None."""
+        with self._lock:
+            match = self._nearest(self._as_int(phash))
+            return (f"{int(self._hashes[match[0]]):016x}", match[1]) if match else None
+
+    def check_and_add(self, phash, now=None):
+        """
+        Record an upload's hash. Returns the distance to the closest earlier
+        hash within radius, or None if it's new. A near-duplicate refreshes
+        the matched entry rather than adding a second one.
+        """
+        now = time.time() if now is None else now
+        h = self._as_int(phash)
+        with self._lock:
+            self._evict(now)
+            match = self._nearest(h)
+            if match:
+                self._seen_at[match[0]] = now
+                return match[1]
+            self._append(h, now)
+            self._evict(now)
+            self._unsaved += 1
+            snapshot = self.snapshot_path and self._unsaved >= self.snapshot_every and not self._saving
+            if snapshot:
+                self._saving = True
+        if snapshot:
+            # Written off the caller's thread; the arrays are copied under the lock
+            threading.Thread(target=self.save, daemon=True).start()
+        return None
+
+    def save(self, path=None):
+        """
+        Write the live hashes to `path` (default: snapshot_path) atomically,
+        through a temp file of its own in the same directory.
+        """
+        path = path or self.snapshot_path
+        try:
+            with self._save_lock:
+                with self._lock:
+                    live = self._live[:self._size]
+                    hashes, seen_at = self._hashes[:self._size][live], self._seen_at[:self._size][live]
+                    self._unsaved = 0
+                fd, tmp = tempfile.mkstemp(suffix=".tmp.npz", prefix=os.path.basename(path) + ".",
+                                           dir=os.path.dirname(os.path.abspath(path)))
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        np.savez(f, hashes=hashes, seen_at=seen_at, radius=self.radius)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+        finally:
+            self._saving = False
+
+    def _load(self, path):
+        with np.load(path) as data:
+            hashes, seen_at = data["hashes"], data["seen_at"]
+        n = len(hashes)
+        self._hashes, self._seen_at = hashes.astype(np.uint64), seen_at.astype(np.float64)
+        self._live = np.ones(n, dtype=bool)
+        self._size = self._count = n
+        self._evict(time.time())
+        self._rebuild()
@@ -0,0 +1,244 @@
+"""
+On-demand Request Profiler
+A statistical profiler switched on for the next N requests or a time window
+(POST /debug/profile), or for one request carrying a valid X-Profile-Token
+header. Every /debug/profile call needs that header, and services only mount
+any of this when PROFILE_TOKEN is configured. While a sampled request is in flight, a background thread records
+the Python stack of every thread each interval; the stacks are aggregated
+under the request's route as flamegraph-compatible collapsed ("folded")
+lines, downloadable from GET /debug/profile/collapsed:
+
+    curl -X POST -H "X-Profile-Token: $PROFILE_TOKEN" 'localhost:8000/debug/profile?requests=50'
+    curl -H "X-Profile-Token: $PROFILE_TOKEN" localhost:8000/debug/profile/collapsed -o analyze.folded
+    flamegraph.pl analyze.folded > analyze.svg     # or drop it on speedscope.app
+
+Disarmed, the middleware costs a header lookup per request and no thread
+runs. Shared by the brain and the backend
+(keep both copies identical; backend/tests/test_shared_modules.py checks).
+
+One request is sampled at a time. Every thread is sampled, so thread-pool
+work (sync endpoints, remote calls) is included, and so is work for any
+concurrent request. Time in worker processes (the backend's OpenCV pool)
+shows up as the event loop waiting; /metrics has those stage timings.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+
+PROFILE_PATH = "/debug/profile"
+TOKEN_HEADER = b"x-profile-token"
+DEFAULT_REQUESTS = 20
+MAX_STACK_DEPTH = 128
+MAX_STACKS = 20_000  # distinct collapsed stacks kept; the rest are folded into "[other]"
+
+# Pool / process-pool housekeeping threads parked waiting for work: the first
+# frame outside the blocking primitives' modules
+WAIT_MODULES = {"threading.py", "selectors.py", "connection.py"}
+IDLE_FRAMES = {("thread.py", "_worker"), ("queue.py", "get"), ("queues.py", "_feed"),
+               ("process.py", "wait_result_broken_or_wakeup")}
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    while frame is not None and os.path.basename(frame.f_code.co_filename) in WAIT_MODULES:
+        frame = frame.f_back
+    return frame is not None and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    def __init__(self, interval_s=0.005):
+        self.interval_s = interval_s
+        self.armed = False
+        self._lock = threading.Lock()
+        self._remaining = None   # sampled requests left, or None for no count limit
+        self._until = None       # time.monotonic() deadline, or None for no window
+        self._busy = False
+        self.stacks = collections.Counter()
+        self.requests = 0
+        self.samples = 0
+
+    def arm(self, requests=None, seconds=None):
+        """Sample the next `requests` requests and/or those in the next `seconds`, whichever ends first."""
+        with self._lock:
+            self._remaining = requests
+            self._until = time.monotonic() + seconds if seconds else None
+            self.armed = bool(requests or seconds)
+
+    def disarm(self):
+        with self._lock:
+            self._remaining = self._until = None
+            self.armed = False
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.requests = self.samples = 0
+
+    def _take(self):
+        if self._until is not None and time.monotonic() >= self._until:
+            self.armed = False
+        if not self.armed:
+            return False
+        if self._remaining is not None:
+            self._remaining -= 1
+            self.armed = self._remaining > 0
+        return True
+
+    def start(self, forced=False):
+        """
+        A sampling session for the current request, or None if it isn't
+        sampled (not armed, or another request is being sampled).
+        """
+        with self._lock:
+            if self._busy or not (forced or self._take()):
+                return None
+            self._busy = True
+        return _Session(self)
+
+    def _finish(self, label, counts):
+        with self._lock:
+            for stack, count in counts.items():
+                key = f"{label};{stack}"
+                if key not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                    key = f"{label};[other]"
+                self.stacks[key] += count
+            self.samples += sum(counts.values())
+            self.requests += 1
+            self._busy = False
+
+    def status(self):
+        with self._lock:
+            remaining_s = None if self._until is None else round(max(0.0, self._until - time.monotonic()), 1)
+            return {
+                "armed": self.armed,
+                "requests_remaining": self._remaining,
+                "seconds_remaining": remaining_s,
+                "interval_ms": self.interval_s * 1000,
+                "sampled_requests": self.requests,
+                "samples": self.samples,
+                "distinct_stacks": len(self.stacks),
+            }
+
+    def collapsed(self):
+        """Folded stacks, one "frame;frame;... count" line each (flamegraph.pl, speedscope, inferno)."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class _Session:
+    """Samples every thread's stack on a background thread until stop()."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.counts = collections.Counter()
+        self.label = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self._sample(own)
+            if self._stop.wait(self.profiler.interval_s):
+                break
+        self.profiler._finish(self.label, self.counts)
+
+    def _sample(self, own):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self, label):
+        """Signal the sampler; it records the stacks under `label` as it exits (no join on the caller)."""
+        self.label = label
+        self._stop.set()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware sampling the requests SamplingProfiler.start() accepts."""
+
+    def __init__(self, app, profiler, token):
+        if not token:
+            raise ValueError("the profiler needs a token")
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        forced = dict(scope["headers"]).get(TOKEN_HEADER) == self.token
+        if not (forced or self.profiler.armed):
+            await self.app(scope, receive, send)
+            return
+        session = None if scope["path"].startswith(PROFILE_PATH) else self.profiler.start(forced)
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or ("mounted" if scope.get("endpoint") else "unmatched")
+            session.stop(f"{scope['method']} {path}")
+
+
+def profiler_router(profiler, token):
+    """Admin endpoints under /debug/profile; every one needs the X-Profile-Token header."""
+    if not token:
+        raise ValueError("the profiler needs a token")
+    router = APIRouter(prefix=PROFILE_PATH)
+
+    def authorize(x_profile_token):
+        if x_profile_token != token:
+            raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required")
+
+    @router.post("")
+    def start_profiling(requests: Optional[int] = Query(None, ge=1), seconds: Optional[float] = Query(None, gt=0, le=3600),
+                        x_profile_token: Optional[str] = Header(None)):
+        """Sample the next `requests` requests and/or those in the next `seconds` (default: the next 20)."""
+        authorize(x_profile_token)
+        if requests is None and seconds is None:
+            requests = DEFAULT_REQUESTS
+        profiler.arm(requests, seconds)
+        return profiler.status()
+
+    @router.get("")
+    def get_profiling_status(x_profile_token: Optional[str] = Header(None)):
+        authorize(x_profile_token)
+        return profiler.status()
+
+    @router.get("/collapsed")
+    def download_collapsed_stacks(x_profile_token: Optional[str] = Header(None)):
+        authorize(x_profile_token)
+        return Response(content=profiler.collapsed(), media_type="text/plain; charset=utf-8",
+                        headers={"Content-Disposition": 'attachment; filename="profile.folded"'})
+
+    @router.delete("")
+    def stop_profiling(x_profile_token: Optional[str] = Header(None)):
+        """Disarm and discard the collected stacks."""
+        authorize(x_profile_token)
+        profiler.disarm()
+        profiler.reset()
+        return profiler.status()
+
+    return router
@@ -0,0 +1,274 @@
+"""
+Citizen Report Store
+SQLite-backed storage for citizen reports, replacing the in-memory lists.
+Each report is kept as its JSON document plus indexed columns for the fields
+we query on (id, admin_status, timestamp, location, ward), so lookups by id
+and filtered listings stay fast at 100k+ reports and everything survives a
+restart. Per-ward, per-hour aggregates are maintained alongside the reports,
+so heatmaps never scan the report table.
+
+Uses only the standard library; the same module is shipped with both the
+brain and the backend service (backend/tests/test_shared_modules.py fails
+if the copies differ).
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    admin_status TEXT NOT NULL,
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+"""
+
+# Columns added after the first release; existing databases are migrated on open
+ADDED_COLUMNS = {
+    "lat": "REAL",
+    "lng": "REAL",
+    "ward_no": "TEXT",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_reports_status ON reports (admin_status);
+CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports (timestamp);
+CREATE INDEX IF NOT EXISTS idx_reports_location ON reports (lat, lng);
+CREATE INDEX IF NOT EXISTS idx_reports_ward ON reports (ward_no);
+"""
+
+# Running totals per (ward, hour); ward_no is '' for reports outside every ward
+AGGREGATES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_aggregates (
+    ward_no TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    reports INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, ward_no)
+);
+"""
+
+# Folds the selected reports into their aggregate rows (used on insert and for the one-off backfill)
+AGGREGATE_REPORTS = """
+INSERT INTO report_aggregates
+    (ward_no, hour, reports, approved, confidence_sum, confidence_count, upvotes, downvotes)
+SELECT COALESCE(ward_no, ''), substr(timestamp, 1, 13), COUNT(*),
+       SUM(admin_status = 'approved'),
+       COALESCE(SUM(json_extract(data, '$.ai_analysis.confidence')), 0),
+       COUNT(json_extract(data, '$.ai_analysis.confidence')),
+       SUM(upvotes), SUM(downvotes)
+FROM reports WHERE {where}
+GROUP BY 1, 2
+ON CONFLICT (hour, ward_no) DO UPDATE SET
+    reports = reports + excluded.reports,
+    approved = approved + excluded.approved,
+    confidence_sum = confidence_sum + excluded.confidence_sum,
+    confidence_count = confidence_count + excluded.confidence_count,
+    upvotes = upvotes + excluded.upvotes,
+    downvotes = downvotes + excluded.downvotes
+"""
+
+AGGREGATE_KEY = "(SELECT COALESCE(ward_no, ''), substr(timestamp, 1, 13) FROM reports WHERE id = ?)"
+
+# Heatmap bucket → length of the ISO timestamp prefix that identifies it
+RESOLUTIONS = {"hour": 13, "day": 10}
+
+REACTION_COLUMNS = {"agree": "upvotes", "disagree": "downvotes"}
+
+
+class ReportStore:
+    """
+    Durable report storage. Writes are committed before returning (WAL
+    journal, so readers never block on a writer). Safe to share between the
+    event loop and FastAPI's threadpool; a lock serializes access to the
+    single connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL in WAL mode: committed reports survive a process crash
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(reports)")}
+        for column, kind in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE reports ADD COLUMN {column} {kind}")
+        self._conn.executescript(INDEXES)
+        backfill = not self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_aggregates'"
+        ).fetchone()
+        self._conn.executescript(AGGREGATES_SCHEMA)
+        if backfill:
+            # Databases from before aggregates existed
+            self._conn.execute(AGGREGATE_REPORTS.format(where="1"))
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        """Serialize on the lock and commit the enclosed statements atomically."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, report, lat=None, lng=None, ward_no=None):
+        """
+        Insert a pydantic report (must have id, timestamp and admin_status set).
+        lat/lng/ward_no are indexed for bounding-box and per-ward queries.
+        """
+        data = report.model_dump_json()
+        timestamp = report.timestamp.isoformat() if hasattr(report.timestamp, "isoformat") else report.timestamp
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO reports (id, timestamp, admin_status, upvotes, downvotes, lat, lng, ward_no, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report.id, timestamp, report.admin_status,
+                 getattr(report, "upvotes", 0), getattr(report, "downvotes", 0), lat, lng, ward_no, data),
+            )
+            conn.execute(AGGREGATE_REPORTS.format(where="id = ?"), (report.id,))
+
+    def get(self, report_id):
+        """Report document as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def list_json(self, status=None, exclude_status=None, since=None, limit=None, bbox=None, ward_no=None):
+        """
+        Matching reports as one JSON array string, in submission order.
+        Documents are concatenated as stored, so nothing is re-parsed.
+        bbox is (min_lng, min_lat, max_lng, max_lat).
+        """
+        clauses, params = [], []
+        if bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            clauses.append("lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?")
+            params.extend([min_lat, max_lat, min_lng, max_lng])
+        if ward_no is not None:
+            clauses.append("ward_no = ?")
+            params.append(ward_no)
+        if status is not None:
+            clauses.append("admin_status = ?")
+            params.append(status)
+        if exclude_status is not None:
+            clauses.append("admin_status != ?")
+            params.append(exclude_status)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        query = "SELECT data FROM reports"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY rowid"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return "[" + ",".join(row[0] for row in rows) + "]"
+
+    def update_status(self, report_id, status):
+        """Set admin_status; returns False if the report does not exist."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT admin_status FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return False
+            approved = (status == "approved") - (row[0] == "approved")
+            if approved:
+                conn.execute(
+                    f"UPDATE report_aggregates SET approved = approved + ? WHERE (ward_no, hour) = {AGGREGATE_KEY}",
+                    (approved, report_id),
+                )
+            conn.execute(
+                "UPDATE reports SET admin_status = ?, data = json_set(data, '$.admin_status', ?) WHERE id = ?",
+                (status, status, report_id),
+            )
+        return True
+
+    def react(self, report_id, reaction):
+        """
+        Count an "agree"/"disagree" reaction. Returns (upvotes, downvotes),
+        or None if the report does not exist. Other reaction types are ignored.
+        """
+        column = REACTION_COLUMNS.get(reaction)
+        with self._transaction() as conn:
+            if column:
+                conn.execute(
+                    f"UPDATE reports SET {column} = {column} + 1, "
+                    f"data = json_set(data, '$.{column}', {column} + 1) WHERE id = ?",
+                    (report_id,),
+                )
+                conn.execute(
+                    f"UPDATE report_aggregates SET {column} = {column} + 1 WHERE (ward_no, hour) = {AGGREGATE_KEY}",
+                    (report_id,),
+                )
+            row = conn.execute(
+                "SELECT upvotes, downvotes FROM reports WHERE id = ?", (report_id,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def heatmap(self, since=None, until=None, ward_no=None, resolution="hour"):
+        """
+        Report totals per ward and time bucket, read from the running
+        aggregates (cost depends on wards × buckets, not on report count).
+        since/until are ISO timestamps (inclusive, compared at the bucket's
+        precision); resolution is "hour" or "day".
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        width = RESOLUTIONS[resolution]
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("hour >= ?")
+            params.append(since[:13])
+        if until is not None:
+            clauses.append("substr(hour, 1, ?) <= ?")
+            params.extend([width, until[:width]])
+        if ward_no is not None:
+            clauses.append("ward_no = ?")
+            params.append(ward_no)
+        query = (
+            "SELECT NULLIF(ward_no, ''), substr(hour, 1, ?) AS bucket, SUM(reports), SUM(approved), "
+            "SUM(confidence_sum), SUM(confidence_count), SUM(upvotes), SUM(downvotes) "
+            "FROM report_aggregates"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " GROUP BY ward_no, bucket ORDER BY bucket, ward_no"
+
+        with self._lock:
+            rows = self._conn.execute(query, [width] + params).fetchall()
+        return [
+            {
+                "ward_no": ward, "bucket": bucket, "reports": reports, "approved": approved,
+                "avg_confidence": round(confidence_sum / confidence_count, 2) if confidence_count else None,
+                "upvotes": upvotes, "downvotes": downvotes,
+            }
+            for ward, bucket, reports, approved, confidence_sum, confidence_count, upvotes, downvotes in rows
+        ]
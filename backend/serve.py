@@ -0,0 +1,21 @@
+"""
+Backend Launcher
+Runs uvicorn on main:app (from the repo root, like the relative static
+mount expects):
+
+    python backend/serve.py        # `python backend/main.py` hands over to this
+
+/analyze's worker processes are spawned, and a spawned process re-runs the
+script that started the server before it unpickles any work. This script
+does nothing unless it is __main__, so the workers only import what the
+work needs (image_pipeline), not main.py's report DB, pHash index, ward
+index and remote clients.
+"""
+import os
+import sys
+
+if __name__ == "__main__":
+    import uvicorn
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    uvicorn.run("main:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,87 @@
+import atexit
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add parent dir to path so we can import the backend modules
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Everything main.py persists goes to a throwaway directory, and remote detectors are off
+STATE_DIR = tempfile.mkdtemp(prefix="jaldrishti-backend-tests-")
+# Registered before main.py's snapshot hook, so it runs after it
+atexit.register(shutil.rmtree, STATE_DIR, ignore_errors=True)
+os.environ.update(
+    JALDRISHTI_REPORTS_DB=os.path.join(STATE_DIR, "reports.db"),
+    JALDRISHTI_STATIC_DIR=os.path.join(STATE_DIR, "static"),
+    PHASH_SNAPSHOT=os.path.join(STATE_DIR, "phash_index.npz"),
+    ANALYZE_CACHE_DB="",
+    ANALYZE_PROCESSES="1",
+    AZURE_CV_KEY="",
+    AZURE_CV_ENDPOINT="",
+    GOOGLE_VISION_KEY="",
+)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    main = sys.modules.get("main")
+    if main is not None:
+        main.cpu_pool.shutdown()
+
+
+@pytest.fixture
+def make_jpeg():
+    """Noise JPEGs; each seed gives different bytes (and a different pHash)."""
+    def make(seed, size=(320, 240)):
+        rng = np.random.default_rng(seed)
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(buf, format="JPEG")
+        return buf.getvalue()
+    return make
+
+
+class FailingAzureClient:
+    def analyze_image_in_stream(self, *args, **kwargs):
+        raise RuntimeError("service unavailable")
+
+
+@pytest.fixture
+def azure_outage(monkeypatch):
+    """Azure configured, but every call raises."""
+    import main
+    monkeypatch.setattr(main, "computervision_client", FailingAzureClient())
+
+
+class StalledAzureClient:
+    def __init__(self, release):
+        self.release = release
+
+    def analyze_image_in_stream(self, *args, **kwargs):
+        self.release.wait(5)
+        raise RuntimeError("read timed out")
+
+
+@pytest.fixture
+def azure_stall(monkeypatch):
+    """
+    Azure configured, but every call hangs until the test ends (or 5 s);
+    the /analyze deadline is 0.5 s. OpenCV runs on threads so worker
+    start-up doesn't count against the deadline. Yields the release event.
+    """
+    import main
+    release = threading.Event()
+    cpu_pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(main, "computervision_client", StalledAzureClient(release))
+    monkeypatch.setattr(main, "ANALYZE_DEADLINE_S", 0.5)
+    monkeypatch.setattr(main, "cpu_pool", cpu_pool)
+    yield release
+    release.set()
+    cpu_pool.shutdown()
@@ -0,0 +1,54 @@
+import time
+
+from analysis_cache import AnalysisCache
+
+
+def test_key_is_content_hash_and_version():
+    v1, v2 = AnalysisCache(version="3+azure"), AnalysisCache(version="4+azure")
+    assert v1.key(b"photo") == v1.key(b"photo")
+    assert v1.key(b"photo") != v1.key(b"other photo")
+    assert v1.key(b"photo") != v2.key(b"photo")
+
+
+def test_entries_expire_after_ttl():
+    cache = AnalysisCache(ttl_s=60)
+    cache.put("a", {"waterlogged": True}, now=0)
+    assert cache.get("a", now=60) == {"waterlogged": True}
+    assert cache.get("a", now=61) is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_lru_keeps_recently_used_entries():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", 1, now=0)
+    cache.put("b", 2, now=0)
+    assert cache.get("a", now=1) == 1     # "b" is now the least recently used
+    cache.put("c", 3, now=2)
+    assert cache.get("b", now=3) is None
+    assert cache.get("a", now=3) == 1
+    assert cache.get("c", now=3) == 3
+
+
+def test_callers_get_their_own_copy():
+    cache = AnalysisCache()
+    cache.put("a", {"stages": {"hsv": 12.5}})
+    cache.get("a")["stages"]["hsv"] = 0
+    assert cache.get("a") == {"stages": {"hsv": 12.5}}
+
+
+def test_disk_tier_survives_restart_and_honours_ttl(tmp_path):
+    path = str(tmp_path / "analysis_cache.db")
+    now = time.time()
+    AnalysisCache(max_entries=1, ttl_s=60, db_path=path).put("a", {"waterlogged": False}, now=now)
+
+    cache = AnalysisCache(max_entries=1, ttl_s=60, db_path=path)
+    assert cache.get("a", now=now + 30) == {"waterlogged": False}
+    assert cache.get("a", now=now + 31) == {"waterlogged": False}
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    assert cache.get("a", now=now + 61) is None
+
+    # Evicted from memory, still answered from disk
+    cache.put("b", 1, now=now)
+    assert cache.get("a", now=now + 1) == {"waterlogged": False}
+    assert cache.stats()["disk_hits"] == 2
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def test_azure_exception_reports_an_error(azure_outage, make_jpeg):
+    assert "error" in main.detect_waterlogging_azure(make_jpeg(0))
+
+
+def test_azure_outage_falls_back_to_opencv_without_caching(azure_outage, make_jpeg):
+    contents = make_jpeg(1)
+
+    for _ in range(2):
+        response = client.post("/analyze", files={"file": ("street.jpg", contents, "image/jpeg")})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["method"] == "local_opencv"
+        assert body["timed_out"] == []
+        # The OpenCV-only verdict is partial, so the re-upload must try Azure again
+        assert body["cached"] is False
+
+    assert main.analysis_cache.get(main.analysis_cache.key(contents)) is None
+
+
+def test_complete_verdict_is_cached(make_jpeg):
+    contents = make_jpeg(2)
+    first = client.post("/analyze", files={"file": ("street.jpg", contents, "image/jpeg")}).json()
+    second = client.post("/analyze", files={"file": ("again.jpg", contents, "image/jpeg")}).json()
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["forensics"]["is_duplicate"] is True
+
+
+def test_is_complete_treats_missing_azure_result_as_failed():
+    detectors = {"opencv": None, "google": None, "azure": None}
+    google = {"found_online": False, "source": "No Direct Matches Found on Google"}
+    finished = {"opencv": {}, "google": google, "azure": None}
+    assert not main.is_complete(detectors, finished)
+    finished["azure"] = {"waterlogged": False}
+    assert main.is_complete(detectors, finished)
+
+
+def test_deadline_merges_the_detectors_that_finished(azure_stall, make_jpeg):
+    contents = make_jpeg(30)
+    body = client.post("/analyze", files={"file": ("street.jpg", contents, "image/jpeg")}).json()
+    assert body["method"] == "local_opencv"
+    assert body["timed_out"] == ["azure"]
+    assert body["cached"] is False
+    # Partial verdicts are not cached
+    assert main.analysis_cache.get(main.analysis_cache.key(contents)) is None
+
+
+def test_stalled_remote_calls_dont_hold_up_ingest(azure_stall, make_jpeg, monkeypatch):
+    # A single disk thread: if Azure calls ran on it, the second upload would wait for the first call
+    io_pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(main, "io_pool", io_pool)
+    try:
+        for seed in (31, 32):
+            start = time.perf_counter()
+            response = client.post("/analyze", files={"file": ("street.jpg", make_jpeg(seed), "image/jpeg")})
+            assert response.status_code == 200
+            assert response.json()["timed_out"] == ["azure"]
+            assert time.perf_counter() - start < 2
+    finally:
+        azure_stall.set()
+        io_pool.shutdown()
+
+
+def test_no_detector_within_the_deadline_is_a_504(azure_stall, make_jpeg, monkeypatch):
+    def stalled_inspect_image(contents, thumbnail_base=None):
+        azure_stall.wait(5)
+        raise RuntimeError("decode never finished")
+
+    monkeypatch.setattr(main, "inspect_image", stalled_inspect_image)
+    response = client.post("/analyze", files={"file": ("street.jpg", make_jpeg(33), "image/jpeg")})
+    assert response.status_code == 504
+    assert "0.5s" in response.json()["detail"]
+
+
+def test_duplicate_check_runs_off_the_event_loop(make_jpeg, monkeypatch):
+    threads, check_and_add = [], main.phash_index.check_and_add
+
+    def recording_check(phash, now=None):
+        threads.append(threading.current_thread().name)
+        return check_and_add(phash, now)
+
+    monkeypatch.setattr(main.phash_index, "check_and_add", recording_check)
+    contents = make_jpeg(40)
+    for name in ("street.jpg", "again.jpg"):  # inspected, then a cache hit
+        assert client.post("/analyze", files={"file": (name, contents, "image/jpeg")}).status_code == 200
+    assert len(threads) == 2
+    assert all(name.startswith("phash-index") for name in threads)
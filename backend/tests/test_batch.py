@@ -0,0 +1,52 @@
+import io
+import json
+import zipfile
+
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def zip_of(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, contents in members.items():
+            archive.writestr(name, contents)
+    return buf.getvalue()
+
+
+def test_batch_mixes_plain_files_and_zip_members(make_jpeg):
+    archive = zip_of({"a.jpg": make_jpeg(20), "b.png": make_jpeg(21), "notes.txt": b"skip me",
+                      "__MACOSX/._a.jpg": b"resource fork"})
+    files = [
+        ("files", ("one.jpg", make_jpeg(22), "image/jpeg")),
+        ("files", ("photos.zip", archive, "application/zip")),
+        ("files", ("two.jpg", make_jpeg(23), "image/jpeg")),
+    ]
+    response = client.post("/analyze/batch", files=files)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1] == {"summary": {"images": 4, "analyzed": 4, "failed": 0}}
+    assert sorted(line["filename"] for line in lines[:-1]) == ["a.jpg", "b.png", "one.jpg", "two.jpg"]
+    assert all("result" in line for line in lines[:-1])
+
+
+def test_only_members_of_one_archive_share_a_lock(make_jpeg):
+    uploads = [
+        UploadFile(io.BytesIO(make_jpeg(24)), filename="one.jpg"),
+        UploadFile(io.BytesIO(zip_of({"a.jpg": b"x", "b.jpg": b"y"})), filename="first.zip"),
+        UploadFile(io.BytesIO(zip_of({"c.jpg": b"z"})), filename="second.zip"),
+        UploadFile(io.BytesIO(make_jpeg(25)), filename="two.jpg"),
+    ]
+    locks = {name: lock for name, _, lock in main.batch_items(uploads)}
+    assert locks["one.jpg"] is None and locks["two.jpg"] is None
+    assert locks["a.jpg"] is locks["b.jpg"]
+    assert locks["c.jpg"] is not None and locks["c.jpg"] is not locks["a.jpg"]
+
+
+def test_bad_zip_is_rejected():
+    response = client.post("/analyze/batch", files=[("files", ("broken.zip", b"not a zip", "application/zip"))])
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+import ast
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import detection_engine
+from detection_engine import HSV_WATER_ABOVE, TEXTURE_SIZE, DetectionEngine
+from image_pipeline import PreparedImage
+
+# The root-level CLI detector, which should reuse the engine's texture stage
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+import image_detection  # noqa: E402
+
+engine = DetectionEngine()
+with_texture = DetectionEngine(evidence=["texture"])
+
+
+def street(seed, fill=None, noise=0, size=(640, 480)):
+    """RGB frame: random top half, bottom half `fill` (or random) plus noise."""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 255, (size[1], size[0], 3)).astype(np.int16)
+    if fill is not None:
+        img[size[1] // 2:] = fill
+    img += rng.integers(-noise, noise + 1, img.shape, dtype=np.int16)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def grey(checker=None):
+    """TEXTURE_SIZE grey frame, flat or a checkerboard of `checker`-pixel cells (rough, not water-smooth)."""
+    width, height = TEXTURE_SIZE
+    if checker is None:
+        return np.full((height, width, 3), (110, 110, 115), np.uint8)
+    yy, xx = np.mgrid[:height, :width]
+    dark = ((yy // checker + xx // checker) % 2).astype(bool)[..., None]
+    return np.where(dark, (80, 80, 85), (150, 150, 155)).astype(np.uint8)
+
+
+def encode(rgb, fmt="JPEG"):
+    buf = io.BytesIO()
+    Image.fromarray(rgb).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+FRAMES = [
+    encode(street(0)),                                # noise everywhere
+    encode(street(1, fill=(110, 110, 115))),          # flat grey road / standing water
+    encode(street(2, fill=(110, 110, 115), noise=80)),
+    encode(street(3, fill=(140, 95, 50))),            # muddy water
+    encode(street(4, fill=(20, 120, 30), noise=10)),  # grass
+    encode(street(5, fill=(240, 240, 240))),          # bright, outside the grey range
+    encode(grey(checker=2), "PNG"),
+]
+
+
+@pytest.mark.parametrize("contents", FRAMES)
+def test_verdict_is_the_coverage_rule(contents):
+    detection = engine.run(PreparedImage(contents))
+    coverage = detection["stages"]["hsv"]["coverage"]
+    assert detection["waterlogged"] == (coverage > HSV_WATER_ABOVE)
+    assert detection["decided_by"] == "hsv"
+    assert list(detection["stages"]) == ["hsv"]
+
+    # Evidence stages report alongside the same verdict
+    with_evidence = with_texture.run(PreparedImage(contents))
+    assert set(with_evidence["stages"]) == {"hsv", "texture"}
+    assert set(with_evidence["timings_ms"]) == {"hsv", "texture"}
+    assert with_evidence["waterlogged"] == detection["waterlogged"]
+    assert with_evidence["decided_by"] == "hsv"
+
+
+def test_texture_is_evidence_not_a_veto():
+    # Grey coverage without a water-smooth surface is still waterlogged, as before the engine
+    detection = with_texture.run(PreparedImage(encode(grey(checker=2), "PNG")))
+    assert detection["stages"]["texture"]["has_water"] is False
+    assert detection["waterlogged"] is True
+
+
+def test_unknown_evidence_stages_are_rejected():
+    with pytest.raises(ValueError):
+        DetectionEngine(evidence=["sonar"])
+
+
+def test_image_detection_uses_the_engine_texture_stage():
+    assert image_detection.texture_water_ratio is detection_engine.texture_water_ratio
+
+    for rgb, expected in ((grey(checker=2), False), (grey(), True)):
+        texture = with_texture.run(PreparedImage(encode(rgb, "PNG")))["stages"]["texture"]
+        result = image_detection.detect_water_logging_array(rgb[:, :, ::-1].copy())
+        assert texture["has_water"] is result["has_water"] is expected
+        assert result["water_ratio"] == round(texture["water_ratio"], 2)
+        assert result["result"] == ("WATER LOGGING DETECTED" if expected else "NO WATER LOGGING")
+
+
+def test_public_download_is_self_contained():
+    # Served as a static file, so it can't reach into backend/ once downloaded
+    with open(os.path.join(ROOT, "public", "image detection", "image_detection.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imported = {alias.name.split(".")[0] for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names}
+    imported |= {node.module.split(".")[0] for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)}
+    assert imported <= {"cv2", "numpy", "os", "tkinter"}
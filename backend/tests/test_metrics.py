@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def sample(name, **labels):
+    """Current value of one sample on /metrics (0 if it hasn't been recorded)."""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f"{name}{{{label_text}}} " if labels else f"{name} "
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def test_metrics_is_prometheus_text():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+
+
+def test_requests_are_labelled_by_route_template():
+    client.put("/reports/no-such-report/status", params={"status": "approved"})
+    assert sample("http_request_duration_seconds_count",
+                  method="PUT", route="/reports/{report_id}/status", status="404") >= 1
+
+
+def test_azure_outage_counts_remote_errors(azure_outage, make_jpeg):
+    before = sample("jaldrishti_remote_call_errors_total", service="azure")
+    response = client.post("/analyze", files={"file": ("street.jpg", make_jpeg(10), "image/jpeg")})
+    assert response.status_code == 200
+    assert sample("jaldrishti_remote_call_errors_total", service="azure") == before + 1
+
+
+def test_missing_azure_result_counts_as_error():
+    before = sample("jaldrishti_remote_call_errors_total", service="azure")
+    assert main.timed_remote_call("azure", lambda contents: None, b"") is None
+    assert sample("jaldrishti_remote_call_errors_total", service="azure") == before + 1
+
+
+def test_google_is_not_called_without_a_key(make_jpeg):
+    client.post("/analyze", files={"file": ("street.jpg", make_jpeg(11), "image/jpeg")})
+    assert sample("jaldrishti_remote_call_seconds_count", service="google") == 0
+
+
+def test_cache_and_duplicate_index_hits(make_jpeg):
+    hits = sample("jaldrishti_cache_lookups_total", cache="analysis", result="hit")
+    duplicates = sample("jaldrishti_duplicate_checks_total", result="duplicate")
+    contents = make_jpeg(12)
+    for name in ("first.jpg", "second.jpg"):
+        client.post("/analyze", files={"file": (name, contents, "image/jpeg")})
+    assert sample("jaldrishti_cache_lookups_total", cache="analysis", result="hit") == hits + 1
+    assert sample("jaldrishti_duplicate_checks_total", result="duplicate") == duplicates + 1
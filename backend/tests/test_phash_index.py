@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from phash_index import PhashIndex, _popcount
+
+RADIUS = 4
+
+
+def random_hashes(n, seed=0):
+    return [int(h) for h in np.random.default_rng(seed).integers(0, 2 ** 64, n, dtype=np.uint64)]
+
+
+def flip(h, bits):
+    for bit in bits:
+        h ^= 1 << int(bit)
+    return h
+
+
+def brute_force(stored, h):
+    return int(_popcount(np.asarray(stored, dtype=np.uint64) ^ np.uint64(h)).min())
+
+
+@pytest.fixture(scope="module")
+def filled():
+    # Enough hashes to go through several table rebuilds and leave some in the recent dicts
+    stored = random_hashes(10_000)
+    index = PhashIndex(radius=RADIUS)
+    for t, h in enumerate(stored):
+        assert index.check_and_add(h, now=t) is None
+    return index, stored
+
+
+def test_radius_lookups_match_a_brute_force_scan(filled):
+    index, stored = filled
+    rng = np.random.default_rng(1)
+    for distance in range(RADIUS + 3):
+        for h in rng.choice(stored, 200):
+            query = flip(int(h), rng.choice(64, distance, replace=False))
+            expected = brute_force(stored, query)
+            match = index.find(f"{query:016x}")
+            if expected <= RADIUS:
+                assert match is not None and match[1] == expected
+            else:
+                assert match is None
+
+
+def test_near_duplicate_refreshes_instead_of_adding():
+    index = PhashIndex(radius=RADIUS)
+    h = random_hashes(1)[0]
+    assert index.check_and_add(f"{h:016x}", now=0) is None
+    assert index.check_and_add(flip(h, [0, 9, 40]), now=1) == 3
+    assert len(index) == 1
+    assert index.find(h) == (f"{h:016x}", 0)
+
+
+def test_entries_expire_by_age():
+    index = PhashIndex(radius=RADIUS, max_age_s=100)
+    old, recent, new = random_hashes(3)
+    index.check_and_add(old, now=0)
+    index.check_and_add(recent, now=150)
+    index.check_and_add(new, now=200)
+    assert index.find(old) is None
+    assert index.find(recent) is not None
+    assert len(index) == 2
+
+
+def test_full_index_evicts_least_recently_seen():
+    index = PhashIndex(radius=RADIUS, max_entries=100)
+    stored = random_hashes(101)
+    for t, h in enumerate(stored[:100]):
+        index.check_and_add(h, now=t)
+    # Seeing the oldest hash again makes it the most recent
+    assert index.check_and_add(stored[0], now=100) == 0
+
+    index.check_and_add(stored[100], now=101)
+    assert len(index) < 100
+    assert index.find(stored[0]) is not None
+    assert index.find(stored[100]) is not None
+    assert index.find(stored[1]) is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "phash_index.npz")
+    stored = random_hashes(50)
+    index = PhashIndex(radius=RADIUS, snapshot_path=path)
+    for h in stored:
+        index.check_and_add(h)
+    index.save()
+
+    reloaded = PhashIndex(radius=RADIUS, snapshot_path=path)
+    assert len(reloaded) == 50
+    assert all(reloaded.find(h) == (f"{h:016x}", 0) for h in stored)
+
+
+def test_concurrent_saves_dont_share_a_temp_file(tmp_path, monkeypatch):
+    # The background snapshot thread and the atexit hook can save at the same time
+    path = str(tmp_path / "phash_index.npz")
+    stored = random_hashes(2_000, seed=1)
+    index = PhashIndex(radius=RADIUS, snapshot_path=path)
+    for h in stored:
+        index.check_and_add(h)
+
+    temp_files, savez, replace = [], np.savez, os.replace
+
+    def slow_savez(file, **arrays):
+        time.sleep(0.05)
+        savez(file, **arrays)
+
+    def recording_replace(src, dst):
+        temp_files.append(src)
+        replace(src, dst)
+
+    monkeypatch.setattr(np, "savez", slow_savez)
+    monkeypatch.setattr(os, "replace", recording_replace)
+    savers = [threading.Thread(target=index.save) for _ in range(4)]
+    for saver in savers:
+        saver.start()
+    for saver in savers:
+        saver.join()
+
+    assert len(temp_files) >= len(savers)
+    assert len(set(temp_files)) == len(temp_files)
+    assert os.listdir(tmp_path) == ["phash_index.npz"]
+    assert len(PhashIndex(radius=RADIUS, snapshot_path=path)) == len(stored)
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from profiling import ProfilingMiddleware, SamplingProfiler, profiler_router
+
+TOKEN = "s3cret"
+AUTH = {"X-Profile-Token": TOKEN}
+
+
+@pytest.fixture
+def profiled():
+    profiler = SamplingProfiler(interval_s=0.001)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, token=TOKEN)
+    app.include_router(profiler_router(profiler, TOKEN))
+
+    @app.get("/work")
+    def work():
+        time.sleep(0.05)
+        return {}
+
+    return profiler, TestClient(app)
+
+
+def wait_for_sampled(client, requests):
+    # Sessions record their stacks as their sampler thread exits, just after the response
+    for _ in range(100):
+        status = client.get("/debug/profile", headers=AUTH).json()
+        if status["sampled_requests"] >= requests:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"expected {requests} sampled requests, got {status}")
+
+
+def test_not_mounted_without_a_token():
+    assert main.PROFILE_TOKEN is None
+    client = TestClient(main.app)
+    assert client.post("/debug/profile").status_code == 404
+    assert client.get("/debug/profile/collapsed").status_code == 404
+
+
+def test_a_token_is_required():
+    with pytest.raises(ValueError):
+        profiler_router(SamplingProfiler(), None)
+    with pytest.raises(ValueError):
+        ProfilingMiddleware(FastAPI(), SamplingProfiler(), "")
+
+
+def test_every_endpoint_needs_the_token(profiled):
+    _, client = profiled
+    for method, path in [("post", "/debug/profile"), ("get", "/debug/profile"),
+                         ("get", "/debug/profile/collapsed"), ("delete", "/debug/profile")]:
+        assert getattr(client, method)(path).status_code == 403
+        assert getattr(client, method)(path, headers={"X-Profile-Token": "wrong"}).status_code == 403
+
+
+def test_armed_requests_are_sampled_under_their_route(profiled):
+    profiler, client = profiled
+    assert client.post("/debug/profile?requests=2", headers=AUTH).json()["armed"] is True
+    for _ in range(3):
+        client.get("/work")
+
+    status = wait_for_sampled(client, 2)
+    assert status["sampled_requests"] == 2
+    assert status["armed"] is False
+    collapsed = client.get("/debug/profile/collapsed", headers=AUTH).text
+    assert collapsed.startswith("GET /work;")
+
+    client.delete("/debug/profile", headers=AUTH)
+    assert profiler.status()["samples"] == 0
+
+
+def test_token_header_samples_a_single_request(profiled):
+    _, client = profiled
+    client.get("/work")
+    client.get("/work", headers=AUTH)
+    assert wait_for_sampled(client, 1)["sampled_requests"] == 1
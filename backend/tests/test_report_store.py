@@ -0,0 +1,156 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from report_store import ReportStore
+
+START = datetime(2026, 7, 14, 6, 0)
+
+
+class Report(BaseModel):
+    id: str
+    timestamp: datetime
+    admin_status: str = "pending"
+    upvotes: int = 0
+    downvotes: int = 0
+    ai_analysis: dict = {}
+
+
+def report(i, minutes=0, status="pending", confidence=None):
+    analysis = {} if confidence is None else {"confidence": confidence}
+    return Report(id=f"r{i}", timestamp=START + timedelta(minutes=minutes), admin_status=status, ai_analysis=analysis)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReportStore(str(tmp_path / "reports.db"))
+    yield store
+    store.close()
+
+
+def ids(store, **filters):
+    return [r["id"] for r in json.loads(store.list_json(**filters))]
+
+
+def test_reports_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "reports.db")
+    store = ReportStore(path)
+    store.add(report(1), lat=28.6, lng=77.2, ward_no="12")
+    store.update_status("r1", "approved")
+    store.react("r1", "agree")
+    store.close()
+
+    reopened = ReportStore(path)
+    try:
+        assert reopened.count() == 1
+        doc = reopened.get("r1")
+        assert doc["admin_status"] == "approved"
+        assert doc["upvotes"] == 1
+    finally:
+        reopened.close()
+
+
+def test_list_filters(store):
+    store.add(report(1, 0), lat=28.60, lng=77.20, ward_no="1")
+    store.add(report(2, 90, status="approved"), lat=28.70, lng=77.10, ward_no="2")
+    store.add(report(3, 180, status="auto_rejected"))
+
+    assert ids(store) == ["r1", "r2", "r3"]
+    assert ids(store, status="approved") == ["r2"]
+    assert ids(store, exclude_status="auto_rejected") == ["r1", "r2"]
+    assert ids(store, since=(START + timedelta(minutes=60)).isoformat()) == ["r2", "r3"]
+    assert ids(store, bbox=(77.15, 28.55, 77.25, 28.65)) == ["r1"]
+    assert ids(store, ward_no="2") == ["r2"]
+    assert ids(store, limit=2) == ["r1", "r2"]
+
+
+def test_update_status_and_react(store):
+    store.add(report(1))
+    assert store.update_status("r1", "rejected") is True
+    assert store.update_status("missing", "approved") is False
+    assert store.get("r1")["admin_status"] == "rejected"
+
+    assert store.react("r1", "agree") == (1, 0)
+    assert store.react("r1", "disagree") == (1, 1)
+    assert store.react("r1", "shrug") == (1, 1)
+    assert store.react("missing", "agree") is None
+    doc = store.get("r1")
+    assert (doc["upvotes"], doc["downvotes"]) == (1, 1)
+    assert store.get("missing") is None
+
+
+def recount(store, wards, resolution="hour"):
+    """Heatmap rows computed from scratch from the stored documents."""
+    width = {"hour": 13, "day": 10}[resolution]
+    totals = {}
+    for doc in json.loads(store.list_json()):
+        key = (doc["timestamp"][:width], wards[doc["id"]])
+        row = totals.setdefault(key, {"reports": 0, "approved": 0, "confidence": [], "upvotes": 0, "downvotes": 0})
+        row["reports"] += 1
+        row["approved"] += doc["admin_status"] == "approved"
+        if "confidence" in doc["ai_analysis"]:
+            row["confidence"].append(doc["ai_analysis"]["confidence"])
+        row["upvotes"] += doc["upvotes"]
+        row["downvotes"] += doc["downvotes"]
+    return [
+        {"ward_no": ward, "bucket": bucket, "reports": row["reports"], "approved": row["approved"],
+         "avg_confidence": round(sum(row["confidence"]) / len(row["confidence"]), 2) if row["confidence"] else None,
+         "upvotes": row["upvotes"], "downvotes": row["downvotes"]}
+        for (bucket, ward), row in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+    ]
+
+
+@pytest.fixture
+def busy_store(store):
+    """Reports over several wards and hours, then random status changes and reactions."""
+    rng = np.random.default_rng(0)
+    wards = {}
+    for i in range(300):
+        ward_no = [None, "1", "2", "3"][rng.integers(4)]
+        confidence = None if rng.random() < 0.2 else float(rng.integers(0, 100))
+        store.add(report(i, int(rng.integers(0, 3 * 24 * 60)), confidence=confidence), ward_no=ward_no)
+        wards[f"r{i}"] = ward_no
+    for _ in range(600):
+        report_id = f"r{rng.integers(300)}"
+        if rng.random() < 0.5:
+            store.update_status(report_id, ["pending", "approved", "rejected"][rng.integers(3)])
+        else:
+            store.react(report_id, ["agree", "disagree"][rng.integers(2)])
+    return store, wards
+
+
+@pytest.mark.parametrize("resolution", ["hour", "day"])
+def test_aggregates_match_a_full_recount(busy_store, resolution):
+    store, wards = busy_store
+    assert store.heatmap(resolution=resolution) == recount(store, wards, resolution)
+
+
+def test_aggregates_backfill_matches_the_running_totals(busy_store, tmp_path):
+    store, wards = busy_store
+    running = store.heatmap()
+    with store._transaction() as conn:
+        conn.execute("DROP TABLE report_aggregates")
+    store.close()
+
+    rebuilt = ReportStore(str(tmp_path / "reports.db"))
+    try:
+        assert rebuilt.heatmap() == running
+    finally:
+        rebuilt.close()
+
+
+def test_heatmap_filters(busy_store):
+    store, wards = busy_store
+    since, until = "2026-07-15T03", "2026-07-15T09:59:00"
+    rows = store.heatmap(since=since, until=until, ward_no="2")
+    expected = [row for row in recount(store, wards)
+                if row["ward_no"] == "2" and since <= row["bucket"] <= until[:13]]
+    assert rows == expected and rows
+
+    days = store.heatmap(since="2026-07-15T00:00:00", until="2026-07-15", resolution="day")
+    assert {row["bucket"] for row in days} == {"2026-07-15"}
+    with pytest.raises(ValueError):
+        store.heatmap(resolution="week")
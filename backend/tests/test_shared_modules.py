@@ -0,0 +1,33 @@
+"""
+The brain and the backend are built from separate directories (the brain's
+Docker context is brain/ alone), so shared modules and data are copied into
+each. These tests fail as soon as a copy drifts.
+"""
+import filecmp
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SHARED_MODULES = ["report_store.py", "ward_index.py", "metrics.py", "profiling.py"]
+DRAINS = os.path.join("public", "data", "delhi_drains")
+
+
+def differs(a, b):
+    return not filecmp.cmp(os.path.join(ROOT, a), os.path.join(ROOT, b), shallow=False)
+
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_shared_module_copies_are_identical(name):
+    assert not differs(os.path.join("brain", name), os.path.join("backend", name)), \
+        f"brain/{name} and backend/{name} have drifted; apply the change to both"
+
+
+def test_brain_ward_boundaries_match_the_frontend():
+    assert not differs(os.path.join("brain", "delhi-wards.geojson"),
+                       os.path.join("public", "data", "delhi-wards.geojson"))
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(os.path.join(ROOT, DRAINS))))
+def test_brain_drain_basins_match_the_frontend(name):
+    assert not differs(os.path.join("brain", "delhi_drains", name), os.path.join(DRAINS, name))
@@ -0,0 +1,82 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+import upload_store
+from upload_store import UploadStore, UploadTooLarge
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Small chunks so the size limit is crossed part way through a stream
+    monkeypatch.setattr(upload_store, "CHUNK_BYTES", 64)
+    return UploadStore(str(tmp_path), "http://localhost:8000/static/", max_bytes=1000)
+
+
+def leftovers(store):
+    return sorted(os.listdir(store.uploads_dir))
+
+
+def test_upload_at_the_limit_is_stored(store):
+    contents = b"\xff\xd8\xff" + os.urandom(997)
+    stored = store.ingest(io.BytesIO(contents))
+    assert stored.size == 1000
+    assert stored.digest == hashlib.sha256(contents).hexdigest()
+    assert stored.filename == f"{stored.digest}.jpg"
+    assert stored.read() == contents
+    assert leftovers(store) == [stored.filename]
+
+
+def test_oversized_upload_is_rejected_without_leftovers(store):
+    with pytest.raises(UploadTooLarge):
+        store.ingest(io.BytesIO(os.urandom(1001)))
+    assert leftovers(store) == []
+
+
+def test_identical_bytes_are_stored_once(store):
+    contents = os.urandom(500)
+    first = store.ingest(io.BytesIO(contents))
+    second = store.ingest(io.BytesIO(contents))
+    assert not first.duplicate and second.duplicate
+    assert second.path == first.path
+    assert leftovers(store) == [first.filename]
+
+
+@pytest.mark.parametrize("fmt, ext", [("JPEG", "jpg"), ("PNG", "png"), ("WEBP", "webp"), ("BMP", "bmp")])
+def test_extension_comes_from_the_bytes(store, fmt, ext):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (90, 90, 95)).save(buf, format=fmt)
+    assert store.ingest(io.BytesIO(buf.getvalue())).filename.endswith(f".{ext}")
+
+
+def test_unknown_bytes_are_stored_as_jpg(store):
+    assert store.ingest(io.BytesIO(b"x")).filename.endswith(".jpg")
+    assert store.ingest(io.BytesIO(b"")).filename.endswith(".jpg")
+
+
+def test_same_bytes_under_different_names_are_stored_once(make_jpeg):
+    contents = make_jpeg(41)
+    first = client.post("/analyze", files={"file": ("street.jpg", contents, "image/jpeg")}).json()
+    second = client.post("/analyze", files={"file": ("street.png", contents, "image/png")}).json()
+    assert first["image_url"] == second["image_url"]
+    assert first["image_url"].endswith(".jpg")
+
+
+def test_urls(store):
+    stored = store.ingest(io.BytesIO(b"RIFF\0\0\0\0WEBPVP8 "))
+    assert store.image_url(stored) == f"http://localhost:8000/static/uploads/{stored.digest}.webp"
+    assert store.thumbnail_urls(stored)["jpg"] == f"http://localhost:8000/static/thumbs/{stored.digest}.jpg"
+    assert not store.has_thumbnails(stored)
+
+
+def test_analyze_rejects_oversized_upload(monkeypatch):
+    monkeypatch.setattr(main.upload_store, "max_bytes", 100)
+    response = client.post("/analyze", files={"file": ("street.jpg", os.urandom(101), "image/jpeg")})
+    assert response.status_code == 413
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from ward_index import WardIndex, parse_bbox
+
+WARDS_GEOJSON = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "public", "data", "delhi-wards.geojson")
+
+
+def square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def feature(ward_no, geometry_type, coordinates):
+    return {"type": "Feature", "properties": {"ward_no": ward_no},
+            "geometry": {"type": geometry_type, "coordinates": coordinates}}
+
+
+@pytest.fixture
+def index():
+    return WardIndex([
+        # Ward A with a hole, and ward B filling that hole
+        feature("A", "Polygon", [square(0, 0, 10, 10), square(4, 4, 6, 6)]),
+        feature("B", "Polygon", [square(4, 4, 6, 6)]),
+        # Ward C in two parts, one of them with its own hole
+        feature("C", "MultiPolygon", [[square(20, 0, 25, 5)], [square(30, 0, 40, 10), square(33, 3, 37, 7)]]),
+        # Features without polygon geometry are skipped
+        feature("D", "Point", [50, 50]),
+    ], cells=8)
+
+
+def ward(index, lng, lat):
+    found = index.locate(lng, lat)
+    return found and found["ward_no"]
+
+
+def test_holes(index):
+    assert ward(index, 1, 1) == "A"
+    assert ward(index, 5, 5) == "B"        # inside A's hole
+    assert ward(index, 3.9, 5) == "A"
+
+
+def test_multipolygons(index):
+    assert ward(index, 22, 2) == "C"
+    assert ward(index, 31, 1) == "C"
+    assert ward(index, 35, 5) is None      # hole of C's second part
+    assert ward(index, 27, 2) is None      # between the parts, inside C's bounding box
+    assert 2 in index.candidates(27, 2)
+
+
+def test_outside_every_ward(index):
+    assert len(index) == 3
+    assert ward(index, -1, 5) is None
+    assert ward(index, 50, 50) is None
+    assert index.candidates(100, 100) == []
+
+
+def test_grid_matches_a_scan_of_every_ward():
+    index = WardIndex.from_geojson(WARDS_GEOJSON)
+    min_x, min_y, max_x, max_y = index.extent
+    rng = np.random.default_rng(0)
+    for lng, lat in zip(rng.uniform(min_x, max_x, 500), rng.uniform(min_y, max_y, 500)):
+        expected = next((index.properties[w] for w in range(len(index)) if index._contains(w, lng, lat)), None)
+        assert index.locate(lng, lat) == expected
+
+
+def test_parse_bbox():
+    assert parse_bbox("77.1,28.5,77.3,28.7") == (77.1, 28.5, 77.3, 28.7)
+    for text in ("77.3,28.5,77.1,28.7", "1,2,3", "a,b,c,d"):
+        with pytest.raises(ValueError):
+            parse_bbox(text)
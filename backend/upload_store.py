@@ -0,0 +1,104 @@
+"""
+Upload Storage
+Uploads are streamed to disk in chunks, so they are never held whole in memory
+here, and are capped at a maximum size. Each one is stored under the SHA-256
+of its bytes, with the extension of the format its leading bytes show (never
+the client's filename), so a photo uploaded twice is kept once. Thumbnails for
+list views sit under thumbs/ and are named after the same hash. Since a name always refers
+to the same bytes, everything here can be served with immutable cache headers.
+"""
+import hashlib
+import os
+import tempfile
+
+from image_pipeline import THUMBNAIL_FORMATS
+
+CHUNK_BYTES = 1 << 20
+HEADER_BYTES = 12   # enough to tell the formats below apart
+
+
+def detect_extension(header):
+    """Storage extension for an upload from its first HEADER_BYTES; unrecognised bytes are stored as jpg."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith(b"BM"):
+        return "bmp"
+    return "jpg"
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class StoredUpload:
+    def __init__(self, digest, filename, path, size, duplicate):
+        self.digest = digest
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.duplicate = duplicate   # the same bytes were already stored
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class UploadStore:
+    """
+    root:       static directory; files go to root/uploads and root/thumbs
+    base_url:   URL the static mount serves root under
+    max_bytes:  uploads larger than this raise UploadTooLarge (nothing is kept)
+    """
+
+    def __init__(self, root, base_url, max_bytes=20 * 1024 * 1024):
+        self.uploads_dir = os.path.join(root, "uploads")
+        self.thumbs_dir = os.path.join(root, "thumbs")
+        self.base_url = base_url.rstrip("/")
+        self.max_bytes = max_bytes
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+
+    def ingest(self, stream):
+        """Copy a binary file object to content-addressed storage, hashing as it goes."""
+        digest = hashlib.sha256()
+        size = 0
+        header = b""
+        tmp = tempfile.NamedTemporaryFile(dir=self.uploads_dir, suffix=".part", delete=False)
+        try:
+            with tmp:
+                while chunk := stream.read(CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                    if len(header) < HEADER_BYTES:
+                        header += chunk[:HEADER_BYTES - len(header)]
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            filename = f"{digest.hexdigest()}.{detect_extension(header)}"
+            path = os.path.join(self.uploads_dir, filename)
+            duplicate = os.path.exists(path)
+            if duplicate:
+                os.remove(tmp.name)
+            else:
+                os.replace(tmp.name, path)
+        except BaseException:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        return StoredUpload(digest.hexdigest(), filename, path, size, duplicate)
+
+    def image_url(self, stored):
+        return f"{self.base_url}/uploads/{stored.filename}"
+
+    def thumbnail_base(self, stored):
+        """Path prefix thumbnails are written to (one file per THUMBNAIL_FORMATS extension)."""
+        return os.path.join(self.thumbs_dir, stored.digest)
+
+    def has_thumbnails(self, stored):
+        base = self.thumbnail_base(stored)
+        return all(os.path.exists(f"{base}.{ext}") for ext in THUMBNAIL_FORMATS)
+
+    def thumbnail_urls(self, stored):
+        return {ext: f"{self.base_url}/thumbs/{stored.digest}.{ext}" for ext in THUMBNAIL_FORMATS}
@@ -0,0 +1,405 @@
+"""
+Multi-Resolution Map Geometry for JalDrishti
+Builds simplified, coordinate-quantized versions of the ward polygons and the
+drain basin layers for several zoom levels, as GeoJSON and as TopoJSON
+(shared-arc encoding). Shared ward borders become one arc that is simplified
+once, so neighbouring wards never open gaps or overlaps at low zoom.
+
+Run `python build_geometry.py` to write geometry/; main.py serves the result
+(building it in memory on startup if the directory is missing).
+"""
+import glob
+import gzip
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+ZOOM_LEVELS = [9, 11, 13]
+PIXEL_TOLERANCE = 0.5   # simplification tolerance, in screen pixels at each zoom
+BASE_PRECISION = 1e7    # vertices are matched on a 1e-7 degree grid when building topology
+
+
+def default_sources(script_dir):
+    """
+    Layer name → GeoJSON path: the wards plus the drain basin layers, both
+    kept inside brain/ (copies of the frontend's public/data files) so the
+    Docker build context has them. Raises FileNotFoundError if any is missing
+    rather than serving a map without them.
+    """
+    wards = os.path.join(script_dir, "delhi-wards.geojson")
+    drains_dir = os.path.join(script_dir, "delhi_drains")
+    if not os.path.exists(wards):
+        raise FileNotFoundError(f"Ward polygons not found: {wards}")
+    sources = {"wards": wards}
+    for path in sorted(glob.glob(os.path.join(drains_dir, "*.json"))):
+        sources[os.path.splitext(os.path.basename(path))[0]] = path
+    if len(sources) == 1:
+        raise FileNotFoundError(f"No drain basin layers in {drains_dir}")
+    return sources
+
+
+def pixel_degrees(zoom):
+    """Degrees of longitude covered by one 256px-tile pixel at this zoom."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Indices kept by Douglas-Peucker. Endpoints are always kept, and so is
+    the farthest interior point, so an arc never collapses to a bare chord
+    and closed rings keep at least a triangle.
+    """
+    n = len(points)
+    if n <= 2:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    first = True
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[start + 1:end]
+        a, b = points[start], points[end]
+        chord = b - a
+        length = math.hypot(chord[0], chord[1])
+        if length == 0:
+            distances = np.hypot(*(segment - a).T)
+        else:
+            distances = np.abs(chord[0] * (segment[:, 1] - a[1]) - chord[1] * (segment[:, 0] - a[0])) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance or first:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+        first = False
+    return np.flatnonzero(keep)
+
+
+class Topology:
+    """
+    Shared-arc representation of one or more layers. Rings and lines are cut
+    at junctions (vertices where more than two distinct edges meet), and
+    every arc is stored once; geometries reference arcs by index, with ~i
+    meaning arc i reversed (as in TopoJSON).
+    """
+
+    def __init__(self, layers):
+        self.points = {}        # (qx, qy) → point id
+        self.coords = []        # point id → (qx, qy)
+        self.arcs = []          # arc id → list of point ids
+        self.arc_index = {}     # tuple(point ids) → arc id
+        self.layers = {}        # layer → list of (geometry type, arc refs / point, properties)
+
+        parsed = {name: [self._parse(feature) for feature in features] for name, features in layers.items()}
+        neighbours = self._neighbours(parsed)
+        for name, geometries in parsed.items():
+            self.layers[name] = [self._cut(kind, parts, props, neighbours) for kind, parts, props in geometries]
+
+    def _point_id(self, coord):
+        key = (int(round(coord[0] * BASE_PRECISION)), int(round(coord[1] * BASE_PRECISION)))
+        if key not in self.points:
+            self.points[key] = len(self.coords)
+            self.coords.append(key)
+        return self.points[key]
+
+    def _path(self, coords, closed):
+        ids = [self._point_id(c) for c in coords]
+        path = [p for i, p in enumerate(ids) if i == 0 or p != ids[i - 1]]
+        if closed and len(path) > 1 and path[0] == path[-1]:
+            path = path[:-1]
+        return path
+
+    def _parse(self, feature):
+        """Feature → (type, nested paths of point ids, properties). Rings drop their closing vertex."""
+        geometry = feature.get('geometry') or {}
+        kind, coords = geometry.get('type'), geometry.get('coordinates')
+        props = feature.get('properties', {})
+        if kind == 'Point':
+            return kind, self._point_id(coords), props
+        if kind == 'MultiPoint':
+            return kind, [self._point_id(c) for c in coords], props
+        if kind == 'LineString':
+            return kind, self._path(coords, False), props
+        if kind == 'MultiLineString':
+            return kind, [self._path(line, False) for line in coords], props
+        if kind == 'Polygon':
+            return kind, [self._path(ring, True) for ring in coords], props
+        if kind == 'MultiPolygon':
+            return kind, [[self._path(ring, True) for ring in polygon] for polygon in coords], props
+        return None, None, props
+
+    @staticmethod
+    def _paths(kind, parts):
+        """Yield (path, closed) for every line/ring in a parsed geometry."""
+        if kind == 'LineString':
+            yield parts, False
+        elif kind == 'MultiLineString':
+            for line in parts:
+                yield line, False
+        elif kind == 'Polygon':
+            for ring in parts:
+                yield ring, True
+        elif kind == 'MultiPolygon':
+            for polygon in parts:
+                for ring in polygon:
+                    yield ring, True
+
+    def _neighbours(self, parsed):
+        neighbours = {}
+        for geometries in parsed.values():
+            for kind, parts, _ in geometries:
+                for path, closed in self._paths(kind, parts):
+                    n = len(path)
+                    for i, p in enumerate(path):
+                        links = neighbours.setdefault(p, set())
+                        if closed or i > 0:
+                            links.add(path[i - 1])
+                        if closed or i < n - 1:
+                            links.add(path[(i + 1) % n])
+                        if not closed and i in (0, n - 1):
+                            links.add(None)  # line endpoints always end an arc
+        return neighbours
+
+    def _arc_ref(self, path):
+        key = tuple(path)
+        if key in self.arc_index:
+            return self.arc_index[key]
+        reverse = key[::-1]
+        if reverse in self.arc_index:
+            return ~self.arc_index[reverse]
+        self.arc_index[key] = len(self.arcs)
+        self.arcs.append(list(path))
+        return self.arc_index[key]
+
+    def _split(self, path, closed, neighbours):
+        """Cut one ring/line into arc references at its junctions."""
+        junctions = [i for i, p in enumerate(path) if len(neighbours[p]) > 2]
+        if closed:
+            if not junctions:
+                return [self._arc_ref(path + [path[0]])]
+            start = junctions[0]
+            path = path[start:] + path[:start] + [path[start]]
+            junctions = [j - start for j in junctions] + [len(path) - 1]
+        refs = []
+        for a, b in zip(junctions, junctions[1:]):
+            if b > a:
+                refs.append(self._arc_ref(path[a:b + 1]))
+        return refs
+
+    def _cut(self, kind, parts, props, neighbours):
+        if kind in ('Point', 'MultiPoint', None):
+            return kind, parts, props
+        if kind == 'LineString':
+            return kind, self._split(parts, False, neighbours), props
+        if kind == 'MultiLineString':
+            return kind, [self._split(line, False, neighbours) for line in parts], props
+        if kind == 'Polygon':
+            return kind, [self._split(ring, True, neighbours) for ring in parts], props
+        return kind, [[self._split(ring, True, neighbours) for ring in polygon] for polygon in parts], props
+
+    def bbox(self):
+        coords = np.asarray(self.coords, dtype=np.float64) / BASE_PRECISION
+        return (*coords.min(axis=0), *coords.max(axis=0))
+
+    def encode(self, zoom):
+        """
+        Simplify and quantize every arc for one zoom level. Returns
+        {layer: (topojson_dict, geojson_dict)}; all layers share one arc table
+        per level, but each layer is emitted as its own file.
+        """
+        tolerance = pixel_degrees(zoom) * PIXEL_TOLERANCE
+        step = tolerance / 2  # quantization error stays under the simplification error
+        min_x, min_y, _, _ = self.bbox()
+        coords = np.asarray(self.coords, dtype=np.float64) / BASE_PRECISION
+
+        def quantize(points):
+            return np.round((points - (min_x, min_y)) / step).astype(np.int64)
+
+        quantized_arcs = []
+        for arc in self.arcs:
+            points = coords[arc]
+            q = quantize(points[douglas_peucker(points, tolerance)])
+            # Drop points that collapsed onto their predecessor, but never the endpoints
+            moved = np.any(q[1:] != q[:-1], axis=1)
+            keep = np.concatenate(([True], moved))
+            keep[-1] = True
+            quantized_arcs.append(q[keep])
+
+        decimals = max(0, math.ceil(-math.log10(step)))
+        transform = {"scale": [step, step], "translate": [min_x, min_y]}
+
+        def unquantize(q):
+            return [[round(min_x + x * step, decimals), round(min_y + y * step, decimals)] for x, y in q]
+
+        def ring_coords(refs):
+            out = []
+            for ref in refs:
+                q = quantized_arcs[ref] if ref >= 0 else quantized_arcs[~ref][::-1]
+                out.extend(q if not out else q[1:])
+            return out
+
+        outputs = {}
+        for name, geometries in self.layers.items():
+            used = sorted({ref if ref >= 0 else ~ref for kind, refs, _ in geometries
+                           if kind not in ('Point', 'MultiPoint') for ref in _flatten(refs)})
+            remap = {old: new for new, old in enumerate(used)}
+
+            def remap_refs(refs):
+                if isinstance(refs, list):
+                    return [remap_refs(r) for r in refs]
+                return remap[refs] if refs >= 0 else ~remap[~refs]
+
+            topo_geoms, features = [], []
+            for kind, parts, props in geometries:
+                if kind in ('Point', 'MultiPoint'):
+                    points = quantize(coords[np.atleast_1d(parts)])
+                    topo_coords = points[0].tolist() if kind == 'Point' else points.tolist()
+                    geo_coords = unquantize(points)[0] if kind == 'Point' else unquantize(points)
+                    topo_geoms.append({"type": kind, "coordinates": topo_coords, "properties": props})
+                    features.append(_feature(kind, geo_coords, props))
+                    continue
+                if kind is None:
+                    topo_geoms.append({"type": None, "properties": props})
+                    features.append({"type": "Feature", "geometry": None, "properties": props})
+                    continue
+
+                topo_geoms.append({"type": kind, "arcs": remap_refs(parts), "properties": props})
+                if kind == 'LineString':
+                    geo = unquantize(ring_coords(parts))
+                elif kind == 'MultiLineString':
+                    geo = [unquantize(ring_coords(line)) for line in parts]
+                elif kind == 'Polygon':
+                    geo = [unquantize(ring_coords(ring)) for ring in parts]
+                else:
+                    geo = [[unquantize(ring_coords(ring)) for ring in polygon] for polygon in parts]
+                features.append(_feature(kind, geo, props))
+
+            arcs = []
+            for old in used:
+                q = quantized_arcs[old]
+                arcs.append(np.concatenate([q[:1], np.diff(q, axis=0)]).tolist())  # delta-encoded
+            topology = {
+                "type": "Topology",
+                "transform": transform,
+                "objects": {name: {"type": "GeometryCollection", "geometries": topo_geoms}},
+                "arcs": arcs,
+            }
+            outputs[name] = (topology, {"type": "FeatureCollection", "features": features})
+        return outputs
+
+
+def _flatten(refs):
+    if isinstance(refs, list):
+        for r in refs:
+            yield from _flatten(r)
+    elif isinstance(refs, int):
+        yield refs
+
+
+def _feature(kind, coordinates, props):
+    return {"type": "Feature", "geometry": {"type": kind, "coordinates": coordinates}, "properties": props}
+
+
+def build(sources, zooms=ZOOM_LEVELS):
+    """
+    Build every layer at every zoom. Returns {(layer, zoom, format): bytes}
+    with format "topojson" or "geojson" (compact JSON, UTF-8).
+    """
+    layers = {}
+    for name, path in sources.items():
+        with open(path, 'r') as f:
+            layers[name] = json.load(f).get('features', [])
+    topology = Topology(layers)
+
+    built = {}
+    for zoom in zooms:
+        for name, (topo, geo) in topology.encode(zoom).items():
+            for fmt, doc in (("topojson", topo), ("geojson", geo)):
+                built[(name, zoom, fmt)] = json.dumps(doc, separators=(",", ":")).encode("utf-8")
+    return built
+
+
+class GeometryAssets:
+    """
+    In-memory geometry files for the API: raw and gzipped bytes plus a
+    content hash per file, used as ETag and as the cache-busting version.
+    """
+
+    def __init__(self, built):
+        self.files = {}
+        for key, content in built.items():
+            self.files[key] = {
+                "content": content,
+                "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+                "etag": hashlib.sha256(content).hexdigest()[:16],
+            }
+        self.zooms = sorted({zoom for _, zoom, _ in self.files})
+        self.layers = sorted({layer for layer, _, _ in self.files})
+
+    @classmethod
+    def load(cls, directory):
+        built = {}
+        for path in glob.glob(os.path.join(directory, "*_z*.*json")):
+            stem, fmt = os.path.splitext(os.path.basename(path))
+            layer, _, zoom = stem.rpartition("_z")
+            with open(path, 'rb') as f:
+                built[(layer, int(zoom), fmt[1:])] = f.read()
+        return cls(built)
+
+    def pick_zoom(self, zoom):
+        """Coarsest built level that is at least as detailed as `zoom` (else the finest)."""
+        for level in self.zooms:
+            if level >= zoom:
+                return level
+        return self.zooms[-1]
+
+    def manifest(self):
+        return {
+            layer: {
+                str(zoom): {
+                    fmt: {
+                        "bytes": len(self.files[(layer, zoom, fmt)]["content"]),
+                        "gzip_bytes": len(self.files[(layer, zoom, fmt)]["gzip"]),
+                        "version": self.files[(layer, zoom, fmt)]["etag"],
+                    }
+                    for fmt in ("topojson", "geojson") if (layer, zoom, fmt) in self.files
+                }
+                for zoom in self.zooms
+            }
+            for layer in self.layers
+        }
+
+
+def write(built, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    for (layer, zoom, fmt), content in built.items():
+        with open(os.path.join(output_dir, f"{layer}_z{zoom}.{fmt}"), 'wb') as f:
+            f.write(content)
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sources = default_sources(script_dir)
+    output_dir = os.path.join(script_dir, "geometry")
+
+    print("🗺️  JalDrishti Geometry Builder")
+    print("=" * 50)
+    built = build(sources)
+    write(built, output_dir)
+
+    assets = GeometryAssets(built)
+    print(f"\n{'layer':<24}{'source KB':>10}" + "".join(f"{'z' + str(z) + ' topo/geo KB (gz)':>30}" for z in assets.zooms))
+    for layer, path in sources.items():
+        row = f"{layer:<24}{os.path.getsize(path) / 1024:>10.1f}"
+        for zoom in assets.zooms:
+            topo, geo = assets.files[(layer, zoom, "topojson")], assets.files[(layer, zoom, "geojson")]
+            row += (f"{len(topo['content']) / 1024:>9.1f}/{len(geo['content']) / 1024:.1f}"
+                    f" ({len(topo['gzip']) / 1024:.1f}/{len(geo['gzip']) / 1024:.1f})").rjust(30)
+        print(row)
+    print(f"\n✅ Geometry written to {output_dir}")
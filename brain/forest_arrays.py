@@ -0,0 +1,261 @@
+"""
+Flat-Array Forest for the JalDrishti Brain
+Exports the trained RandomForest into compact NumPy arrays (int32 feature and
+child indices, float32 thresholds, float64 leaf values or optionally
+quantized ones) and provides a vectorized NumPy predictor, so the API can
+serve predictions without loading the pickle or importing scikit-learn.
+
+The leaf values are kept exact: the API compiles its PSI curves from them and
+promises model.predict's output bit for bit. A quantized export is only for
+FlatForest.predict; psi_curves refuses it.
+
+Run `python forest_arrays.py` to export jaldrishti_brain.pkl and compare it
+against the original model.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+LEAF = -1
+FORMAT_VERSION = 2  # 2: leaf values stored as float64 (1 rounded them to float32)
+
+
+def _floor_float32(values):
+    """
+    Largest float32 <= each float64 value. sklearn compares float32 inputs
+    against float64 thresholds, and for a float32 x, x <= t exactly when
+    x <= floor32(t), so rounding down keeps every split decision unchanged.
+    """
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def _quantize(values, bits):
+    """Linear quantization of leaf values to uint8/uint16 codes."""
+    dtype = {8: np.uint8, 16: np.uint16}[bits]
+    low, high = float(values.min()), float(values.max())
+    scale = (high - low) / (2 ** bits - 1) or 1.0
+    codes = np.round((values - low) / scale).astype(dtype)
+    return codes, low, scale
+
+
+def export_forest(model, output_path, quantize_bits=None):
+    """
+    Flatten every tree of a fitted RandomForestRegressor into shared arrays
+    and save them as an .npz file. Child indices are global (already offset
+    by each tree's root), leaves have children == -1.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    roots = np.cumsum([0] + [tree.node_count for tree in trees[:-1]]).astype(np.int32)
+
+    def stacked(get, dtype):
+        return np.concatenate([get(tree) for tree in trees]).astype(dtype)
+
+    left = np.concatenate([
+        np.where(t.children_left == LEAF, LEAF, t.children_left + root)
+        for t, root in zip(trees, roots)
+    ]).astype(np.int32)
+    right = np.concatenate([
+        np.where(t.children_right == LEAF, LEAF, t.children_right + root)
+        for t, root in zip(trees, roots)
+    ]).astype(np.int32)
+    feature = stacked(lambda t: np.maximum(t.feature, 0), np.int32)
+    threshold = _floor_float32(stacked(lambda t: t.threshold, np.float64))
+    value = stacked(lambda t: t.value[:, 0, 0], np.float64)
+
+    arrays = {
+        'format_version': np.int32(FORMAT_VERSION),
+        'feature_names': np.asarray(model.feature_names_in_, dtype=str),
+        'roots': roots,
+        'left': left,
+        'right': right,
+        'feature': feature,
+        'threshold': threshold,
+        'max_depth': np.int32(max(tree.max_depth for tree in trees)),
+    }
+    if quantize_bits:
+        arrays['value_codes'], low, scale = _quantize(value, quantize_bits)
+        arrays['value_low'], arrays['value_scale'] = np.float64(low), np.float64(scale)
+    else:
+        arrays['value'] = value
+
+    np.savez(output_path, **arrays)
+    return output_path
+
+
+class FlatForest:
+    """Vectorized NumPy predictor over the arrays written by `export_forest`."""
+
+    def __init__(self, feature_names, roots, left, right, feature, threshold, value, max_depth, exact=True):
+        self.feature_names = list(feature_names)
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.max_depth = int(max_depth)
+        self.exact = exact  # leaf values identical to the fitted model's
+
+        # Leaves loop back to themselves so every sample can keep stepping
+        # without masking: x <= +inf always "goes left" to the same node.
+        # Children are interleaved so one gather at 2 * node + went_right moves a step.
+        is_leaf = left == LEAF
+        nodes = np.arange(len(left), dtype=np.int32)
+        self._children = np.stack([
+            np.where(is_leaf, nodes, left),
+            np.where(is_leaf, nodes, right),
+        ], axis=1).ravel()
+        self._threshold = np.where(is_leaf, np.float32(np.inf), threshold)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if 'value_codes' in data:
+                value = (data['value_low'] + data['value_codes'] * data['value_scale']).astype(np.float32)
+            else:
+                value = data['value']
+            return cls(
+                data['feature_names'], data['roots'], data['left'], data['right'],
+                data['feature'], data['threshold'], value, data['max_depth'],
+                exact=value.dtype == np.float64,
+            )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def trees(self):
+        """
+        Per-tree (left, right, feature, threshold, value) with local indices
+        (see psi_curves). Raises ValueError if the leaf values are rounded.
+        """
+        if not self.exact:
+            raise ValueError("leaf values are quantized or float32; re-export without --quantize for exact trees")
+        return self._trees()
+
+    def _trees(self):
+        ends = list(self.roots[1:]) + [len(self.left)]
+        for root, end in zip(self.roots, ends):
+            left, right = self.left[root:end], self.right[root:end]
+            yield (
+                np.where(left == LEAF, LEAF, left - root),
+                np.where(right == LEAF, LEAF, right - root),
+                self.feature[root:end],
+                self.threshold[root:end].astype(np.float64),
+                self.value[root:end].astype(np.float64),
+            )
+
+    def predict(self, X, chunk_size=4096):
+        """Mean leaf value over all trees; X is a 2-D array or DataFrame in feature_names order."""
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].to_numpy()
+        X = np.asarray(X, dtype=np.float32)
+
+        n_features = X.shape[1]
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            rows = X[start:start + chunk_size]
+            row_base = (np.arange(len(rows), dtype=np.int64) * n_features)[:, None]
+            flat_rows = rows.ravel()
+            nodes = np.broadcast_to(self.roots, (len(rows), self.n_trees)).astype(np.int64)
+            for _ in range(self.max_depth):
+                went_right = flat_rows[row_base + self.feature[nodes]] > self._threshold[nodes]
+                next_nodes = self._children[2 * nodes + went_right]
+                if np.array_equal(next_nodes, nodes):
+                    break  # every path is already at a leaf
+                nodes = next_nodes
+            out[start:start + len(rows)] = self.value[nodes].sum(axis=1, dtype=np.float64) / self.n_trees
+        return out
+
+
+def compare(model, model_path, forest_path, X, y=None, repeats=20):
+    """
+    Size / load time / latency / accuracy of the flat forest against the
+    original model. Returns a list of result rows (dicts) for printing.
+    """
+    import joblib
+
+    # A /predict-sized batch (one row per ward) and a single-ward request
+    all_wards = X.iloc[:256] if hasattr(X, 'iloc') else X[:256]
+    single = all_wards.iloc[:1] if hasattr(all_wards, 'iloc') else all_wards[:1]
+
+    def timed(fn, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - start) / n * 1000
+
+    start = time.perf_counter()
+    joblib.load(model_path)
+    sk_load = time.perf_counter() - start
+    start = time.perf_counter()
+    forest = FlatForest.load(forest_path)
+    flat_load = time.perf_counter() - start
+
+    verbose = model.verbose
+    model.verbose = 0
+    try:
+        sk_pred = model.predict(X)
+        rows = [{
+            'model': 'sklearn (pickle)',
+            'size_mb': os.path.getsize(model_path) / 1e6,
+            'load_s': sk_load,
+            'single_ms': timed(lambda: model.predict(single), repeats),
+            'all_wards_ms': timed(lambda: model.predict(all_wards), repeats),
+            'max_abs_diff': 0.0,
+            'mae': float(np.mean(np.abs(sk_pred - y))) if y is not None else None,
+        }]
+    finally:
+        model.verbose = verbose
+
+    flat_pred = forest.predict(X)
+    rows.append({
+        'model': f'flat ({os.path.basename(forest_path)})',
+        'size_mb': os.path.getsize(forest_path) / 1e6,
+        'load_s': flat_load,
+        'single_ms': timed(lambda: forest.predict(single), repeats),
+        'all_wards_ms': timed(lambda: forest.predict(all_wards), repeats),
+        'max_abs_diff': float(np.max(np.abs(flat_pred - sk_pred))),
+        'mae': float(np.mean(np.abs(flat_pred - y))) if y is not None else None,
+    })
+    return rows
+
+
+def print_comparison(rows):
+    print(f"   {'model':<32}{'size MB':>9}{'load s':>8}{'1 row ms':>10}{'wards ms':>10}{'max |Δ|':>10}{'MAE':>8}")
+    for row in rows:
+        mae = f"{row['mae']:.4f}" if row['mae'] is not None else "-"
+        print(f"   {row['model']:<32}{row['size_mb']:>9.1f}{row['load_s']:>8.2f}{row['single_ms']:>10.2f}"
+              f"{row['all_wards_ms']:>10.2f}{row['max_abs_diff']:>10.2e}{mae:>8}")
+
+
+if __name__ == "__main__":
+    import joblib
+    import pandas as pd
+    from training_shards import read_shards
+
+    parser = argparse.ArgumentParser(description="Export jaldrishti_brain.pkl to flat NumPy arrays")
+    parser.add_argument("--quantize", type=int, choices=[8, 16], help="quantize leaf values to N bits (the API then compiles its curves from the pickle)")
+    parser.add_argument("--samples", type=int, default=20000, help="rows of training data to compare on")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.join(script_dir, "jaldrishti_brain.pkl")
+    forest_path = os.path.join(script_dir, "jaldrishti_brain.npz")
+
+    model = joblib.load(model_path)
+    print(f"📦 Exporting {len(model.estimators_)} trees → {forest_path}")
+    export_forest(model, forest_path, quantize_bits=args.quantize)
+
+    shard_dir = os.path.join(script_dir, "training_shards")
+    if os.path.isdir(shard_dir):
+        df = read_shards(shard_dir, nrows=args.samples)
+    else:
+        df = pd.read_csv(os.path.join(script_dir, "flood_training_data.csv"), nrows=args.samples)
+    print("\n📊 Flat forest vs original model:")
+    print_comparison(compare(model, model_path, forest_path, df[list(model.feature_names_in_)], df['psi_label']))
@@ -8,6 +8,8 @@ import numpy as np
 import json
 import os
 
+from training_shards import ShardWriter
+
 # Path to GeoJSON (try local first, then relative)
 GEOJSON_PATH = "delhi-wards.geojson"
 if not os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), GEOJSON_PATH)):
@@ -89,60 +91,124 @@ def generate_ward_metadata(wards):
     return ward_metadata
 
 # 3. Generate Training Data using Capacity Utilization Method
-def generate_training_data(ward_metadata, num_events=10000):
+ELEVATION_FACTORS = {
+    "Sink": 1.3, "Low": 1.15, "Moderate": 1.0, "High-Density": 0.95
+}
+TRAINING_COLUMNS = ['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness',
+                    'area', 'elevation', 'psi_label']
+
+
+def _ward_arrays(ward_metadata):
+    """Per-ward columns as NumPy arrays, so a whole event block is one broadcast."""
+    return {
+        'ward_id': np.array([w['ward_id'] for w in ward_metadata]),
+        'drain_capacity': np.array([w['drain_capacity'] for w in ward_metadata]),
+        'imperviousness': np.array([w['imperviousness'] for w in ward_metadata]),
+        'area': np.array([w['area'] for w in ward_metadata]),
+        'elevation': np.array([w['elevation'] for w in ward_metadata], dtype=object),
+        'elev_factor': np.array([ELEVATION_FACTORS.get(w['elevation'], 1.0) for w in ward_metadata]),
+    }
+
+
+def generate_event_block(wards, num_events, rng):
     """
-    Simulate rainfall events and calculate flood severity (PSI).
-    New Method: Capacity Utilization Ratio = Runoff / Capacity
+    Simulate `num_events` rainfall events for every ward at once.
+    Capacity Utilization Ratio = Runoff / Capacity, mapped to PSI 0-10.
+    Rows are event-major (all wards of event 0, then event 1, ...).
     """
-    np.random.seed(42)
-    data = []
-    
-    for event_idx in range(num_events):
-        for ward in ward_metadata:
-            # Broader rainfall distribution (0 to 180mm)
-            rainfall = np.random.beta(2, 4) * 180
-            noise = np.random.normal(1.0, 0.1)
-            
-            # Runoff (Q) - Normalize area to keep values reasonable (divide by 10000 to get per-unit area)
-            normalized_area = ward['area'] / 10000.0  # Convert to reasonable scale
-            runoff_q = (ward['imperviousness'] * rainfall * normalized_area * noise)
-            
-            # Elevation multiplier
-            elevation_factors = {
-                "Sink": 1.3, "Low": 1.15, "Moderate": 1.0, "High-Density": 0.95
-            }
-            elev_factor = elevation_factors.get(ward['elevation'], 1.0)
-            
-            # Capacity Utilization Ratio
-            utilization_ratio = (runoff_q / ward['drain_capacity']) * elev_factor
-            
-            # Non-linear spread for PSI 1-10
-            if utilization_ratio < 0.3:
-                # 0-30% load -> PSI 0-2 (Safe)
-                psi = utilization_ratio * 6.6 
-            elif utilization_ratio < 0.7:
-                # 30-70% load -> PSI 2-5 (Moderate)
-                psi = 2 + (utilization_ratio - 0.3) * 7.5
-            elif utilization_ratio < 1.0:
-                # 70-100% load -> PSI 5-8 (High)
-                psi = 5 + (utilization_ratio - 0.7) * 10
-            else:
-                # >100% load -> PSI 8-10 (Overflow)
-                psi = 8 + (utilization_ratio - 1.0) * 1.5
-            
-            psi = np.clip(psi + np.random.normal(0, 0.2), 0, 10)
-            
-            data.append({
-                'ward_id': ward['ward_id'],
-                'rainfall_intensity': round(rainfall, 2),
-                'drain_capacity': ward['drain_capacity'],
-                'imperviousness': ward['imperviousness'],
-                'area': ward['area'],
-                'elevation': ward['elevation'],
-                'psi_label': round(psi, 2)
-            })
-    
-    return pd.DataFrame(data)
+    shape = (num_events, len(wards['ward_id']))
+
+    # Broader rainfall distribution (0 to 180mm)
+    rainfall = rng.beta(2, 4, size=shape) * 180
+    noise = rng.normal(1.0, 0.1, size=shape)
+
+    # Runoff (Q) - Normalize area to keep values reasonable (per-unit area)
+    normalized_area = wards['area'] / 10000.0
+    runoff_q = wards['imperviousness'] * rainfall * normalized_area * noise
+
+    # Capacity Utilization Ratio with elevation multiplier
+    utilization_ratio = (runoff_q / wards['drain_capacity']) * wards['elev_factor']
+
+    # Non-linear spread for PSI 1-10
+    psi = np.select(
+        [utilization_ratio < 0.3, utilization_ratio < 0.7, utilization_ratio < 1.0],
+        [
+            utilization_ratio * 6.6,                   # 0-30% load -> PSI 0-2 (Safe)
+            2 + (utilization_ratio - 0.3) * 7.5,       # 30-70% load -> PSI 2-5 (Moderate)
+            5 + (utilization_ratio - 0.7) * 10,        # 70-100% load -> PSI 5-8 (High)
+        ],
+        default=8 + (utilization_ratio - 1.0) * 1.5,   # >100% load -> PSI 8-10 (Overflow)
+    )
+    psi = np.clip(psi + rng.normal(0, 0.2, size=shape), 0, 10)
+
+    return pd.DataFrame({
+        'ward_id': np.tile(wards['ward_id'], num_events),
+        'rainfall_intensity': np.round(rainfall, 2).ravel(),
+        'drain_capacity': np.tile(wards['drain_capacity'], num_events),
+        'imperviousness': np.tile(wards['imperviousness'], num_events),
+        'area': np.tile(wards['area'], num_events),
+        'elevation': np.tile(wards['elevation'], num_events),
+        'psi_label': np.round(psi, 2).ravel(),
+    }, columns=TRAINING_COLUMNS)
+
+
+def iter_training_chunks(ward_metadata, num_events=10000, events_per_chunk=1000, seed=42):
+    """Yield training data as DataFrames of at most `events_per_chunk` events each."""
+    rng = np.random.default_rng(seed)
+    wards = _ward_arrays(ward_metadata)
+    for start in range(0, num_events, events_per_chunk):
+        yield generate_event_block(wards, min(events_per_chunk, num_events - start), rng)
+
+
+def generate_training_data(ward_metadata, num_events=10000, seed=42):
+    """Simulate rainfall events and calculate flood severity (PSI) as one DataFrame."""
+    return pd.concat(list(iter_training_chunks(ward_metadata, num_events, seed=seed)), ignore_index=True)
+
+
+def write_training_data(ward_metadata, output_path, num_events=10000, events_per_chunk=1000, seed=42,
+                        output_format="npy"):
+    """
+    Stream training data to disk chunk by chunk, so peak memory depends on
+    `events_per_chunk` rather than `num_events`. "npy" writes one shard per
+    chunk into the `output_path` directory (see training_shards), "csv" appends
+    to a single file. Returns (rows, psi_counts), where psi_counts[i] is how
+    many labels equal i / 100.
+    """
+    writer = ShardWriter(output_path) if output_format == "npy" else None
+    rows = 0
+    psi_counts = np.zeros(1001, dtype=np.int64)
+    for i, chunk in enumerate(iter_training_chunks(ward_metadata, num_events, events_per_chunk, seed)):
+        if writer:
+            writer.write(chunk)
+        else:
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(chunk)
+        psi_counts += np.bincount(np.rint(chunk['psi_label'].to_numpy() * 100).astype(np.int64), minlength=1001)
+    if writer:
+        writer.close()
+    return rows, psi_counts
+
+
+def describe_psi(psi_counts):
+    """df['psi_label'].describe() computed from label counts (labels are 0.00-10.00)."""
+    values = np.arange(len(psi_counts)) / 100
+    count = psi_counts.sum()
+    mean = (values * psi_counts).sum() / count
+    std = np.sqrt(((values - mean) ** 2 * psi_counts).sum() / max(count - 1, 1))
+    cumulative = np.cumsum(psi_counts)
+    nonzero = np.flatnonzero(psi_counts)
+
+    def quantile(q):
+        # Linear interpolation between order statistics, like pandas
+        position = q * (count - 1)
+        lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        return lower + (upper - lower) * (position - np.floor(position))
+
+    return pd.Series({
+        'count': float(count), 'mean': mean, 'std': std, 'min': values[nonzero[0]],
+        '25%': quantile(0.25), '50%': quantile(0.5), '75%': quantile(0.75), 'max': values[nonzero[-1]],
+    }, name='psi_label')
 
 # 4. Save Ward Metadata
 def save_ward_metadata(ward_metadata, output_path="ward_metadata.json"):
@@ -162,6 +228,14 @@ def save_ward_metadata(ward_metadata, output_path="ward_metadata.json"):
 
 # Main
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate JalDrishti ward metadata and training data")
+    parser.add_argument("--events", type=int, default=10000, help="rainfall events to simulate")
+    parser.add_argument("--chunk-events", type=int, default=1000, help="events generated and written per chunk")
+    parser.add_argument("--format", choices=["npy", "csv"], default="npy",
+                        help="npy: shards in training_shards/ (default), csv: flood_training_data.csv")
+    args = parser.parse_args()
+
     print("🌧️  JalDrishti Enhanced Data Generator")
     print("=" * 50)
     
@@ -174,13 +248,13 @@ if __name__ == "__main__":
     save_ward_metadata(ward_metadata)
     
     print("\n🌊 Generating training data...")
-    df = generate_training_data(ward_metadata, num_events=10000)
-    
-    df.to_csv("flood_training_data.csv", index=False)
-    print(f"\n✅ Training data saved: flood_training_data.csv")
-    print(f"   Total samples: {len(df):,}")
+    output_path = "training_shards" if args.format == "npy" else "flood_training_data.csv"
+    rows, psi_counts = write_training_data(ward_metadata, output_path, num_events=args.events,
+                                           events_per_chunk=args.chunk_events, output_format=args.format)
+    print(f"\n✅ Training data saved: {output_path}")
+    print(f"   Total samples: {rows:,}")
     
     print("\n📊 PSI Distribution Summary:")
-    print(df['psi_label'].describe())
+    print(describe_psi(psi_counts))
     
     print("\n🎉 Data generation complete!")
\ No newline at end of file
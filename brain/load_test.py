@@ -0,0 +1,268 @@
+"""
+Brain API Load Test
+Closed-loop virtual users drive the prediction API the way the map does:
+each one drags the rainfall slider (0-120 mm/hr, mostly small steps, now and
+then a jump) and calls /predict for every position, looks up single wards,
+reloads /wards, lists reports and submits new ones concurrently. For every
+(uvicorn workers, concurrency) pair it reports throughput and a latency
+histogram per endpoint.
+
+The app runs either in-process (ASGI transport, no sockets; one worker) or as
+a local uvicorn per worker count. Reports go to a temporary database. Needs
+httpx (installed with FastAPI's test client). Run from brain/:
+
+    python load_test.py --mode inprocess --concurrency 1,8,32
+    python load_test.py --mode uvicorn --workers 1,2,4 --concurrency 8,32,64 -o baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("❌ load_test.py needs httpx: pip install httpx")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SLIDER_MAX = 120
+DELHI_BBOX = (76.84, 28.40, 77.35, 28.88)  # min_lng, min_lat, max_lng, max_lat
+HISTOGRAM_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# Share of requests per endpoint; the slider dominates during a storm
+MIX = {
+    "POST /predict": 0.55,
+    "GET /predict/{ward_id}": 0.15,
+    "GET /wards": 0.05,
+    "GET /reports": 0.13,
+    "POST /reports": 0.12,
+}
+
+
+class Slider:
+    """A user's rainfall slider: drags of a few mm/hr, occasionally a jump across the range."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.value = int(rng.integers(0, SLIDER_MAX + 1))
+
+    def next(self):
+        if self.rng.random() < 0.05:
+            self.value = int(self.rng.integers(0, SLIDER_MAX + 1))
+        else:
+            self.value = int(np.clip(self.value + self.rng.integers(-3, 4), 0, SLIDER_MAX))
+        return self.value
+
+
+def report_payload(rng):
+    lng = rng.uniform(DELHI_BBOX[0], DELHI_BBOX[2])
+    lat = rng.uniform(DELHI_BBOX[1], DELHI_BBOX[3])
+    confidence = float(rng.uniform(30, 99))
+    return {
+        "location": f"Load test {lat:.4f},{lng:.4f}",
+        "coordinates": {"lat": lat, "lng": lng},
+        "type": "waterlogging",
+        "description": "Synthetic load-test report",
+        "ai_analysis": {"verified": confidence > 60, "confidence": confidence,
+                        "tags": ["water", "road"], "description": "synthetic"},
+    }
+
+
+def next_request(endpoint, rng, slider, ward_ids):
+    """(method, url, json body) for one call to `endpoint`."""
+    if endpoint == "POST /predict":
+        return "POST", "/predict", {"rainfall_intensity": slider.next()}
+    if endpoint == "GET /predict/{ward_id}":
+        return "GET", f"/predict/{rng.choice(ward_ids)}?rainfall={slider.value}", None
+    if endpoint == "GET /wards":
+        return "GET", "/wards", None
+    if endpoint == "GET /reports":
+        if rng.random() < 0.5:
+            # A map viewport around a random point
+            lng, lat = rng.uniform(DELHI_BBOX[0], DELHI_BBOX[2]), rng.uniform(DELHI_BBOX[1], DELHI_BBOX[3])
+            return "GET", f"/reports?bbox={lng - 0.05:.4f},{lat - 0.04:.4f},{lng + 0.05:.4f},{lat + 0.04:.4f}", None
+        return "GET", "/reports", None
+    return "POST", "/reports", report_payload(rng)
+
+
+async def virtual_user(client, seed, ward_ids, deadline, latencies, errors):
+    rng = np.random.default_rng(seed)
+    slider = Slider(rng)
+    endpoints, weights = list(MIX), np.array(list(MIX.values()))
+    weights = weights / weights.sum()
+    while time.perf_counter() < deadline:
+        endpoint = endpoints[rng.choice(len(endpoints), p=weights)]
+        method, url, body = next_request(endpoint, rng, slider, ward_ids)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, json=body)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        latencies[endpoint].append(time.perf_counter() - start)
+        errors[endpoint] += failed
+
+
+async def run_scenario(client, concurrency, duration, ward_ids, seed):
+    """Returns (wall seconds, per-endpoint latencies in seconds, per-endpoint error counts)."""
+    latencies = {endpoint: [] for endpoint in MIX}
+    errors = {endpoint: 0 for endpoint in MIX}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        virtual_user(client, seed * 1000 + user, ward_ids, deadline, latencies, errors)
+        for user in range(concurrency)
+    ])
+    return time.perf_counter() - start, latencies, errors
+
+
+def summarize(wall, latencies, errors):
+    rows = {}
+    for endpoint, samples in latencies.items():
+        if not samples:
+            continue
+        ms = np.array(samples) * 1000
+        counts, _ = np.histogram(ms, bins=[0] + HISTOGRAM_MS + [np.inf])
+        rows[endpoint] = {
+            "requests": len(ms),
+            "errors": errors[endpoint],
+            "req_per_s": round(len(ms) / wall, 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "max_ms": round(float(ms.max()), 2),
+            "histogram": {f"<={bound}ms" if bound != np.inf else f">{HISTOGRAM_MS[-1]}ms": int(count)
+                          for bound, count in zip(HISTOGRAM_MS + [np.inf], counts)},
+        }
+    total = sum(len(samples) for samples in latencies.values())
+    return {"total_req_per_s": round(total / wall, 2), "endpoints": rows}
+
+
+def print_summary(workers, concurrency, summary):
+    print(f"\n⚙️  workers={workers} concurrency={concurrency}: {summary['total_req_per_s']:.1f} req/s total")
+    print(f"   {'endpoint':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  histogram "
+          + " ".join(f"{b:g}" for b in HISTOGRAM_MS) + " ms")
+    for endpoint, row in summary["endpoints"].items():
+        counts = np.array(list(row["histogram"].values()))
+        # One character per bucket, scaled to the fullest bucket
+        bars = "".join(" ▁▂▃▄▅▆▇█"[int(np.ceil(8 * c / counts.max()))] for c in counts)
+        print(f"   {endpoint:<24} {row['req_per_s']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['errors']:>7}  |{bars}|")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, port, db_path):
+    env = dict(os.environ, JALDRISHTI_REPORTS_DB=db_path)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=SCRIPT_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            if httpx.get(base + "/", timeout=1).status_code == 200:
+                return server, base
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("brain did not start")
+
+
+async def run_all(args, concurrencies, ward_ids_for, client_for):
+    results = []
+    for workers in ([1] if args.mode == "inprocess" else [int(w) for w in args.workers.split(",")]):
+        async with client_for(workers) as client:
+            ward_ids = await ward_ids_for(client)
+            await run_scenario(client, 1, min(1.0, args.duration), ward_ids, seed=0)  # warm-up
+            for concurrency in concurrencies:
+                wall, latencies, errors = await run_scenario(client, concurrency, args.duration, ward_ids, seed=concurrency)
+                summary = summarize(wall, latencies, errors)
+                print_summary(workers, concurrency, summary)
+                results.append({"workers": workers, "concurrency": concurrency, "duration_s": round(wall, 2), **summary})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the brain prediction API")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", default="1,2", help="comma-separated uvicorn --workers values (uvicorn mode)")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated virtual user counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    args = parser.parse_args()
+    concurrencies = [int(c) for c in args.concurrency.split(",")]
+
+    print("🔥 JalDrishti Brain Load Test")
+    print("=" * 50)
+    print(f"   {os.cpu_count()} cores, mode={args.mode}, {args.duration:g}s per scenario, mix: "
+          + ", ".join(f"{endpoint} {share:.0%}" for endpoint, share in MIX.items()))
+
+    async def ward_ids_for(client):
+        # /wards is the ward metadata keyed by ward_id
+        return list((await client.get("/wards")).json())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "reports.db")
+        if args.mode == "inprocess":
+            os.environ["JALDRISHTI_REPORTS_DB"] = db_path
+            sys.path.insert(0, SCRIPT_DIR)
+            from main import app
+
+            def client_for(workers):
+                transport = httpx.ASGITransport(app=app)
+                return httpx.AsyncClient(transport=transport, base_url="http://brain", timeout=60)
+
+            results = asyncio.run(run_all(args, concurrencies, ward_ids_for, client_for))
+        else:
+            servers = []
+
+            class ServerClient:
+                """A fresh uvicorn (and its own report DB) per worker count."""
+                def __init__(self, workers):
+                    self.workers = workers
+
+                async def __aenter__(self):
+                    self.server, base = start_server(self.workers, free_port(),
+                                                     os.path.join(tmp, f"reports_{self.workers}.db"))
+                    servers.append(self.server)
+                    limits = httpx.Limits(max_connections=max(concurrencies), max_keepalive_connections=max(concurrencies))
+                    self.client = httpx.AsyncClient(base_url=base, timeout=60, limits=limits)
+                    return self.client
+
+                async def __aexit__(self, *exc):
+                    await self.client.aclose()
+                    self.server.terminate()
+                    self.server.wait()
+
+            try:
+                results = asyncio.run(run_all(args, concurrencies, ward_ids_for, ServerClient))
+            finally:
+                for server in servers:
+                    if server.poll() is None:
+                        server.terminate()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"mode": args.mode, "cpu_count": os.cpu_count(), "duration_s": args.duration,
+                       "mix": MIX, "histogram_ms": HISTOGRAM_MS, "scenarios": results}, f, indent=2)
+        print(f"\n💾 Saved {len(results)} scenarios to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,29 @@ FastAPI backend that uses the trained RandomForest model to predict flood severi
 for all Delhi wards based on rainfall intensity.
 Also handles citizen reporting.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-import joblib
-import pandas as pd
+import numpy as np
+import gzip
+import hashlib
 import json
+import math
 import os
+import time
 import uuid
 import datetime
+from collections import OrderedDict
 from typing import List, Optional
 
+from psi_curves import PsiCurves, load_trees
+from report_store import ReportStore
+from ward_index import WardIndex, parse_bbox
+from build_geometry import GeometryAssets, build, default_sources
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Counter, Gauge, Histogram, MetricsMiddleware, render as render_metrics
+from profiling import ProfilingMiddleware, SamplingProfiler, profiler_router
+
 app = FastAPI(
     title="JalDrishti Flood Prediction API",
     description="Predicts Pre-emptive Severity Index (PSI) for Delhi wards based on rainfall",
@@ -28,25 +40,173 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# On-demand sampling profiler (see profiling.py), only with PROFILE_TOKEN set:
+# /debug/profile and single-request sampling both need the X-Profile-Token header
+PROFILER = SamplingProfiler(interval_s=float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware, profiler=PROFILER, token=PROFILE_TOKEN)
+    app.include_router(profiler_router(PROFILER, PROFILE_TOKEN))
+# Outermost, so request timings include CORS handling
+app.add_middleware(MetricsMiddleware)
+
+# --- METRICS (served at /metrics) ---
+STARTUP_SECONDS = Gauge("jaldrishti_startup_step_seconds", "Time each startup step took", ["step"])
+PREDICT_SECONDS = Histogram("jaldrishti_predict_seconds", "PSI curve lookup time (replaces model.predict)", ["kind"])
+RESPONSE_BUILD_SECONDS = Histogram("jaldrishti_predict_response_build_seconds", "Building the /predict response body", ["format"])
+CACHE_LOOKUPS = Counter("jaldrishti_cache_lookups_total", "Lookups in in-process response caches", ["cache", "result"])
+CHOROPLETH_RENDER_SECONDS = Histogram("jaldrishti_choropleth_render_seconds", "Rendering and gzipping one choropleth document")
+
+PREDICT_ALL_WARDS = PREDICT_SECONDS.labels("all_wards")
+PREDICT_WARD = PREDICT_SECONDS.labels("ward")
+PREDICT_BATCH_BLOCK = PREDICT_SECONDS.labels("batch_block")
+CHOROPLETH_HIT = CACHE_LOOKUPS.labels("choropleth", "hit")
+CHOROPLETH_MISS = CACHE_LOOKUPS.labels("choropleth", "miss")
+_step_started = [time.perf_counter()]
+
+
+def startup_step_done(step: str):
+    now = time.perf_counter()
+    STARTUP_SECONDS.labels(step).set(round(now - _step_started[0], 4))
+    _step_started[0] = now
 
-# --- IN-MEMORY STORAGE ---
-# For a hackathon/MVP, in-memory is fine. In prod, use PostGIS/PostgreSQL.
-REPORTS_DB = []
 
 # 1. Load the Brain (Trained Model)
 script_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(script_dir, "jaldrishti_brain.pkl")
+forest_path = os.path.join(script_dir, "jaldrishti_brain.npz")
 metadata_path = os.path.join(script_dir, "ward_metadata.json")
 
-print(f"📂 Loading model from: {model_path}")
-model = joblib.load(model_path)
-print("✅ Model loaded!")
+# Prefer the flat-array export (no scikit-learn import); fall back to the pickle
+model_trees, model_features, model_source = load_trees(model_path, forest_path)
+print(f"✅ Model loaded from: {model_source}")
+startup_step_done("model_load")
 
 # 2. Load Ward Metadata (Generated from GeoJSON)
 print(f"📂 Loading ward metadata from: {metadata_path}")
 with open(metadata_path, 'r') as f:
     WARD_META = json.load(f)
 print(f"✅ Loaded metadata for {len(WARD_META)} wards")
+startup_step_done("ward_metadata")
+
+# 3. Compile the forest into per-ward PSI curves (rainfall is the only varying input)
+print("📈 Compiling per-ward PSI curves...")
+PSI_CURVES = PsiCurves.from_trees(model_trees, WARD_META, model_features)
+print(f"✅ Compiled {PSI_CURVES.breakpoint_count:,} rainfall breakpoints")
+startup_step_done("psi_curves")
+
+# 4. Open the Report Store (SQLite, survives restarts)
+reports_path = os.getenv("JALDRISHTI_REPORTS_DB", os.path.join(script_dir, "reports.db"))
+REPORTS_DB = ReportStore(reports_path)
+print(f"✅ Report store ready: {reports_path} ({REPORTS_DB.count():,} reports)")
+startup_step_done("report_store")
+Gauge("jaldrishti_reports", "Citizen reports in the store").set_function(REPORTS_DB.count)
+
+# 5. Build the Ward Spatial Index (report coordinates → ward)
+WARD_INDEX = WardIndex.from_geojson(os.path.join(script_dir, "delhi-wards.geojson"))
+WARD_IDS_BY_NO = {str(meta.get('ward_no')): ward_id for ward_id, meta in WARD_META.items()}
+print(f"✅ Indexed {len(WARD_INDEX)} ward polygons")
+startup_step_done("ward_index")
+
+# 6. Load the precomputed map geometry (built in memory if build_geometry.py wasn't run)
+geometry_dir = os.path.join(script_dir, "geometry")
+if os.path.isdir(geometry_dir):
+    GEOMETRY = GeometryAssets.load(geometry_dir)
+else:
+    print("⚠️  geometry/ not found, simplifying map layers in memory...")
+    GEOMETRY = GeometryAssets(build(default_sources(script_dir)))
+print(f"✅ Map geometry ready: {len(GEOMETRY.layers)} layers at zooms {GEOMETRY.zooms}")
+startup_step_done("geometry")
+
+
+def locate_ward(lat: float, lng: float) -> Optional[dict]:
+    """Ward containing the point, or None if it falls outside every ward."""
+    props = WARD_INDEX.locate(lng, lat)
+    if props is None:
+        return None
+    ward_no = str(props.get('Ward_No'))
+    return {
+        "ward_no": ward_no,
+        "ward_name": props.get('Ward_Name'),
+        "ward_id": WARD_IDS_BY_NO.get(ward_no)
+    }
+
+
+# --- RESPONSE FORMATS ---
+# /predict and /wards negotiate on the Accept header. The columnar formats skip
+# per-ward object construction; everything that never changes is serialized once.
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.jaldrishti.columnar+json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+STATUS_LEVELS = ["SAFE", "MODERATE", "HIGH", "CRITICAL"]
+STATUS_THRESHOLDS = np.array([3, 5, 7])  # PSI at which each next level starts
+
+WARD_IDS = [str(int(ward_id)) for ward_id in WARD_META]
+WARD_NOS = [str(meta.get('ward_no', ward_id)) for ward_id, meta in WARD_META.items()]
+
+# Columnar JSON: everything but the psi/status columns is constant
+PREDICT_COLUMNAR_PREFIX = json.dumps(
+    {"ward_id": WARD_IDS, "ward_no": WARD_NOS, "status_levels": STATUS_LEVELS},
+    separators=(",", ":")
+)[:-1]
+
+# Binary (little-endian): uint32 count | int32 ward_id[count] | float32 psi[count] | uint8 status[count]
+PREDICT_BINARY_PREFIX = (
+    np.array([len(WARD_IDS)], dtype='<u4').tobytes()
+    + np.array([int(w) for w in WARD_IDS], dtype='<i4').tobytes()
+)
+
+WARDS_JSON = json.dumps(WARD_META, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+WARDS_COLUMNAR = json.dumps({
+    "ward_id": list(WARD_META.keys()),
+    "ward_no": [meta.get('ward_no') for meta in WARD_META.values()],
+    "drain_capacity": [meta['drain_capacity'] for meta in WARD_META.values()],
+    "imperviousness": [meta['imperviousness'] for meta in WARD_META.values()],
+    "area": [meta['area'] for meta in WARD_META.values()],
+    "elevation": [meta['elevation'] for meta in WARD_META.values()],
+}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate(accept: Optional[str], offered: List[str]) -> str:
+    """
+    The offered media type with the highest q in the Accept header. No header,
+    */* or application/* get JSON; anything else raises 406.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        media_type = media_type.strip()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON_MEDIA_TYPE
+        if media_type in offered and q > best_q:
+            best, best_q = media_type, q
+    if best is None:
+        raise HTTPException(status_code=406, detail=f"Acceptable types: {', '.join(offered)}")
+    return best
+
+
+def status_codes(psi: np.ndarray) -> np.ndarray:
+    """Index into STATUS_LEVELS for each PSI value."""
+    return np.searchsorted(STATUS_THRESHOLDS, psi, side='right').astype(np.uint8)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists this ETag (or *)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 
 # --- DATA MODELS ---
@@ -55,6 +215,14 @@ class PredictionRequest(BaseModel):
     rainfall_intensity: float  # mm/hr from the frontend slider
 
 
+class BatchPredictionRequest(BaseModel):
+    """Either an explicit list of rainfall intensities or a start/stop/step sweep."""
+    rainfall_intensities: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None  # inclusive
+    step: Optional[float] = None
+
+
 class WardPrediction(BaseModel):
     ward_id: str
     ward_no: str
@@ -85,6 +253,7 @@ class CitizenReport(BaseModel):
     ai_analysis: AIAnalysisResult
     admin_status: str = "pending"  # pending, approved, rejected
     is_spam: bool = False
+    ward_no: Optional[str] = None  # assigned from coordinates on submit
 
 
 # --- ENDPOINTS ---
@@ -96,42 +265,41 @@ async def root():
         "status": "online",
         "model": "JalDrishti Brain v2",
         "wards_loaded": len(WARD_META),
-        "total_reports": len(REPORTS_DB)
+        "total_reports": REPORTS_DB.count()
     }
 
 
 # ... FLOOD PREDICTION ENDPOINTS ...
 
 @app.post("/predict", response_model=List[WardPrediction])
-async def predict_flood(request: PredictionRequest):
-    """Predict flood severity (PSI) for all wards based on all available data."""
-    input_data = []
-    
-    # Prepare input rows for ALL wards
-    # We map to list for DataFrame creation
-    ward_list = []
-    for ward_id, meta in WARD_META.items():
-        ward_list.append({
-            "ward_id": int(ward_id),
-            "rainfall_intensity": request.rainfall_intensity,
-            "drain_capacity": meta['drain_capacity'],
-            "imperviousness": meta['imperviousness'],
-            "ward_no": meta.get('ward_no', ward_id)
-        })
-        input_data.append([
-            int(ward_id),
-            request.rainfall_intensity,
-            meta['drain_capacity'],
-            meta['imperviousness']
-        ])
+async def predict_flood(request: PredictionRequest, accept: Optional[str] = Header(None)):
+    """
+    Predict flood severity (PSI) for all wards based on all available data.
+    Send `Accept: application/vnd.jaldrishti.columnar+json` or
+    `Accept: application/octet-stream` for the columnar formats.
+    """
+    # Same values as model.predict on the full ward table, via binary search
+    with PREDICT_ALL_WARDS.time():
+        predictions = PSI_CURVES.predict(request.rainfall_intensity)
     
-    # Make Predictions
-    X_pred = pd.DataFrame(input_data, columns=['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness'])
-    predictions = model.predict(X_pred)
+    media_type = negotiate(accept, [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, BINARY_MEDIA_TYPE])
+    build_started = time.perf_counter()
+    if media_type != JSON_MEDIA_TYPE:
+        psi = np.round(predictions, 2)
+        codes = status_codes(psi)
+        if media_type == BINARY_MEDIA_TYPE:
+            content = PREDICT_BINARY_PREFIX + psi.astype('<f4').tobytes() + codes.tobytes()
+        else:
+            content = (
+                f'{PREDICT_COLUMNAR_PREFIX},"psi":{json.dumps(psi.tolist())},'
+                f'"status":{json.dumps(codes.tolist())}}}'
+            )
+        RESPONSE_BUILD_SECONDS.labels(media_type).observe(time.perf_counter() - build_started)
+        return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
     
     # Format Response
     response = []
-    for i, item in enumerate(ward_list):
+    for i, (ward_id, meta) in enumerate(WARD_META.items()):
         psi = round(predictions[i], 2)
         status = "SAFE"
         if psi >= 7: status = "CRITICAL"
@@ -139,19 +307,212 @@ async def predict_flood(request: PredictionRequest):
         elif psi >= 3: status = "MODERATE"
         
         response.append(WardPrediction(
-            ward_id=str(item['ward_id']),
-            ward_no=str(item['ward_no']),
+            ward_id=str(int(ward_id)),
+            ward_no=str(meta.get('ward_no', ward_id)),
             predicted_psi=psi,
             status=status
         ))
     
+    RESPONSE_BUILD_SECONDS.labels(JSON_MEDIA_TYPE).observe(time.perf_counter() - build_started)
     return response
 
 
+MAX_BATCH_SCENARIOS = 10000
+BATCH_BLOCK_SIZE = 64  # scenarios evaluated per vectorized lookup
+
+
+def _batch_rainfalls(request: BatchPredictionRequest):
+    if request.rainfall_intensities is not None:
+        rainfalls = np.asarray(request.rainfall_intensities, dtype=np.float64)
+    elif None not in (request.start, request.stop, request.step):
+        if request.step <= 0 or request.stop < request.start:
+            raise HTTPException(status_code=400, detail="Range needs step > 0 and stop >= start")
+        count = int(np.floor((request.stop - request.start) / request.step + 1e-9)) + 1
+        if count > MAX_BATCH_SCENARIOS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SCENARIOS} scenarios per batch")
+        rainfalls = request.start + request.step * np.arange(count)
+    else:
+        raise HTTPException(status_code=400, detail="Provide rainfall_intensities or start/stop/step")
+
+    if len(rainfalls) > MAX_BATCH_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SCENARIOS} scenarios per batch")
+    return rainfalls
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: BatchPredictionRequest):
+    """
+    Predict PSI for many rainfall scenarios at once (e.g. a 0-200 mm/hr sweep).
+    Streams NDJSON: a header line with the ward order, then one line per scenario
+    with PSI values aligned to that order.
+    """
+    rainfalls = _batch_rainfalls(request)
+
+    def stream():
+        yield json.dumps({
+            "ward_ids": PSI_CURVES.ward_ids,
+            "ward_nos": [str(meta.get('ward_no', ward_id)) for ward_id, meta in WARD_META.items()],
+            "scenarios": len(rainfalls)
+        }) + "\n"
+        # Blocks keep memory flat for long sweeps; each block is one lookup
+        for start in range(0, len(rainfalls), BATCH_BLOCK_SIZE):
+            block = rainfalls[start:start + BATCH_BLOCK_SIZE]
+            with PREDICT_BATCH_BLOCK.time():
+                psi = np.round(PSI_CURVES.predict_many(block), 2)
+            for rainfall, row in zip(block.tolist(), psi.tolist()):
+                yield json.dumps({"rainfall_intensity": rainfall, "psi": row}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.get("/wards")
-async def get_wards():
-    """Get list of all wards and their metadata"""
-    return WARD_META
+async def get_wards(accept: Optional[str] = Header(None)):
+    """Get list of all wards and their metadata (pre-serialized; columnar on request)"""
+    media_type = negotiate(accept, [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE])
+    content = WARDS_COLUMNAR if media_type == COLUMNAR_MEDIA_TYPE else WARDS_JSON
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
+
+@app.get("/wards/locate")
+async def locate_ward_endpoint(lat: float, lng: float):
+    """Find the ward containing a coordinate"""
+    ward = locate_ward(lat, lng)
+    if ward is None:
+        raise HTTPException(status_code=404, detail="No ward contains this location")
+    return ward
+
+
+# Versioned geometry URLs (?v=<etag>) never change content, so clients may cache them forever
+GEOMETRY_IMMUTABLE = "public, max-age=31536000, immutable"
+GEOMETRY_REVALIDATE = "public, max-age=86400"
+GEOMETRY_MEDIA_TYPES = {"topojson": "application/json", "geojson": "application/geo+json"}
+
+
+@app.get("/geometry")
+async def get_geometry_manifest():
+    """Available map layers and zoom levels, with byte sizes and cache-busting versions"""
+    return {"layers": GEOMETRY.manifest()}
+
+
+@app.get("/geometry/{layer}")
+async def get_geometry(
+    layer: str,
+    zoom: int = 11,
+    format: str = "topojson",
+    v: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Simplified, quantized layer geometry for a map zoom level (pre-serialized and pre-gzipped)"""
+    if layer not in GEOMETRY.layers:
+        raise HTTPException(status_code=404, detail=f"Unknown layer '{layer}'")
+    if format not in GEOMETRY_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'topojson' or 'geojson'")
+
+    asset = GEOMETRY.files[(layer, GEOMETRY.pick_zoom(zoom), format)]
+    etag = f'"{asset["etag"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": GEOMETRY_IMMUTABLE if v == asset["etag"] else GEOMETRY_REVALIDATE,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if accept_encoding and "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=asset["gzip"], media_type=GEOMETRY_MEDIA_TYPES[format], headers=headers)
+    return Response(content=asset["content"], media_type=GEOMETRY_MEDIA_TYPES[format], headers=headers)
+
+
+# --- CHOROPLETH ---
+# Ward geometry with the prediction merged into each feature's properties, so
+# the map needs one request per slider position instead of a client-side join.
+# Rendered documents are cached per rainfall bucket (LRU); the ETag is derived
+# from the model, geometry and bucket, so revalidation never renders anything.
+CHOROPLETH_BUCKET = 1.0      # mm/hr, the dashboard slider's step
+CHOROPLETH_CACHE_SIZE = 128  # rendered documents kept (per zoom level and bucket)
+MODEL_VERSION = hashlib.sha256(PSI_CURVES.keys.tobytes() + PSI_CURVES.values.tobytes()).hexdigest()[:12]
+WARD_POSITIONS_BY_NO = {ward_no: i for i, ward_no in enumerate(WARD_NOS)}
+
+_choropleth_templates = {}              # zoom → (feature prefixes, prediction index per feature)
+_choropleth_cache = OrderedDict()       # (zoom, bucket) → {"content", "gzip"}
+
+
+def choropleth_template(zoom: int):
+    """
+    Each ward feature serialized once, cut open inside its properties object
+    so the prediction fields can be appended. Features with no prediction
+    (polygons missing from ward_metadata.json) get an index of -1.
+    """
+    if zoom not in _choropleth_templates:
+        features = json.loads(GEOMETRY.files[("wards", zoom, "geojson")]["content"])["features"]
+        prefixes, positions = [], []
+        for feature in features:
+            props = feature.get("properties") or {}
+            head = json.dumps(
+                {"type": "Feature", "geometry": feature["geometry"], "properties": props},
+                ensure_ascii=False, separators=(",", ":")
+            )
+            prefixes.append(head[:-2] + ("," if props else ""))
+            positions.append(WARD_POSITIONS_BY_NO.get(str(props.get("Ward_No")), -1))
+        _choropleth_templates[zoom] = (prefixes, positions)
+    return _choropleth_templates[zoom]
+
+
+def render_choropleth(zoom: int, rainfall: float) -> bytes:
+    prefixes, positions = choropleth_template(zoom)
+    psi = np.round(PSI_CURVES.predict(rainfall), 2)
+    statuses = [STATUS_LEVELS[code] for code in status_codes(psi)]
+    psi = psi.tolist()
+    features = [
+        f'{prefix}"predicted_psi":{psi[i]},"status":"{statuses[i]}"}}}}' if i >= 0
+        else f'{prefix}"predicted_psi":null,"status":null}}}}'
+        for prefix, i in zip(prefixes, positions)
+    ]
+    return (
+        f'{{"type":"FeatureCollection","rainfall_intensity":{rainfall},"features":['
+        + ",".join(features) + "]}"
+    ).encode("utf-8")
+
+
+@app.get("/choropleth")
+async def get_choropleth(
+    rainfall: float = 50.0,
+    zoom: int = 11,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Ward GeoJSON with predicted_psi/status in every feature's properties.
+    Rainfall is rounded to CHOROPLETH_BUCKET mm/hr before predicting.
+    """
+    if not math.isfinite(rainfall):
+        raise HTTPException(status_code=400, detail="rainfall must be a finite number")
+    level = GEOMETRY.pick_zoom(zoom)
+    bucket = round(max(rainfall, 0.0) / CHOROPLETH_BUCKET) * CHOROPLETH_BUCKET
+    etag = f'"{MODEL_VERSION}-{GEOMETRY.files[("wards", level, "geojson")]["etag"]}-{bucket:g}"'
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = (level, bucket)
+    entry = _choropleth_cache.get(key)
+    if entry is None:
+        CHOROPLETH_MISS.inc()
+        with CHOROPLETH_RENDER_SECONDS.time():
+            content = render_choropleth(level, bucket)
+            entry = {"content": content, "gzip": gzip.compress(content, compresslevel=6)}
+        _choropleth_cache[key] = entry
+        if len(_choropleth_cache) > CHOROPLETH_CACHE_SIZE:
+            _choropleth_cache.popitem(last=False)
+    else:
+        CHOROPLETH_HIT.inc()
+        _choropleth_cache.move_to_end(key)
+
+    if accept_encoding and "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry["gzip"], media_type="application/geo+json", headers=headers)
+    return Response(content=entry["content"], media_type="application/geo+json", headers=headers)
 
 
 @app.get("/predict/{ward_id}")
@@ -160,14 +521,8 @@ async def predict_single_ward(ward_id: str, rainfall: float = 50.0):
         return {"error": f"Ward {ward_id} not found"}
     
     meta = WARD_META[ward_id]
-    X = pd.DataFrame([[
-        int(ward_id),
-        rainfall,
-        meta['drain_capacity'],
-        meta['imperviousness']
-    ]], columns=['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness'])
-    
-    psi = round(model.predict(X)[0], 2)
+    with PREDICT_WARD.time():
+        psi = round(PSI_CURVES.predict_ward(ward_id, rainfall), 2)
     return {
         "ward_id": ward_id,
         "ward_no": meta.get('ward_no'),
@@ -179,9 +534,28 @@ async def predict_single_ward(ward_id: str, rainfall: float = 50.0):
 # --- REPORTING ENDPOINTS ---
 
 @app.get("/reports")
-async def get_reports():
-    """Get all citizen reports"""
-    return REPORTS_DB
+async def get_reports(bbox: Optional[str] = None, ward_no: Optional[str] = None):
+    """Get all citizen reports, optionally within bbox=min_lng,min_lat,max_lng,max_lat or one ward"""
+    try:
+        box = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=REPORTS_DB.list_json(bbox=box, ward_no=ward_no), media_type=JSON_MEDIA_TYPE)
+
+
+@app.get("/reports/heatmap")
+async def get_report_heatmap(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    ward_no: Optional[str] = None,
+    resolution: str = "hour",
+):
+    """Report counts, approvals, average AI confidence and votes per ward per hour (or day)"""
+    try:
+        buckets = REPORTS_DB.heatmap(since=since, until=until, ward_no=ward_no, resolution=resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, "buckets": buckets}
 
 
 @app.post("/reports")
@@ -200,8 +574,17 @@ async def submit_report(report: CitizenReport):
         report.is_spam = True
         report.admin_status = "rejected"
     
-    REPORTS_DB.append(report)
-    return {"message": "Report submitted successfully", "report_id": report.id}
+    ward = locate_ward(report.coordinates.lat, report.coordinates.lng)
+    report.ward_no = ward["ward_no"] if ward else None
+    
+    REPORTS_DB.add(report, lat=report.coordinates.lat, lng=report.coordinates.lng, ward_no=report.ward_no)
+    return {"message": "Report submitted successfully", "report_id": report.id, "ward_no": report.ward_no}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Request latency per route, prediction timings and cache hit counts (Prometheus text format)"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+"""
+Model Size / Latency Sweep for the JalDrishti Brain
+Trains a grid of RandomForest configurations and records, for each one,
+accuracy, pickle size, load time, peak RSS and single-row / all-wards predict
+latency, then picks the smallest or fastest model whose accuracy is within a
+tolerance of the best. Used by `python train_model.py --sweep`.
+"""
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+
+# Measured in a fresh interpreter so earlier fits don't inflate the numbers
+_LOAD_PROBE = """
+import json, resource, sys, time
+import joblib, sklearn.ensemble
+start = time.perf_counter()
+model = joblib.load(sys.argv[1])
+load_s = time.perf_counter() - start
+print(json.dumps({"load_s": load_s, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+SELECT_BY = {
+    "size": "pickle_mb",
+    "latency": "all_wards_ms",
+}
+
+
+def parse_grid(n_estimators, max_depth, min_samples_split):
+    """Comma-separated CLI values → list of config dicts (full cartesian product)."""
+    def ints(text):
+        return [None if v.strip().lower() == "none" else int(v) for v in text.split(",")]
+
+    return [
+        {"n_estimators": n, "max_depth": d, "min_samples_split": m}
+        for n, d, m in itertools.product(ints(n_estimators), ints(max_depth), ints(min_samples_split))
+    ]
+
+
+def _median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def measure(model, X_test, y_test, repeats=20):
+    """Accuracy, on-disk size, load time, peak RSS and predict latency of one fitted model."""
+    verbose = getattr(model, "verbose", 0)
+    model.verbose = 0
+    try:
+        predictions = model.predict(X_test)
+        # One row per ward, like /predict, and a single-ward request
+        all_wards, single = X_test.iloc[:256], X_test.iloc[:1]
+        single_ms = _median_ms(lambda: model.predict(single), repeats)
+        all_wards_ms = _median_ms(lambda: model.predict(all_wards), repeats)
+    finally:
+        model.verbose = verbose
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        pickle_mb = os.path.getsize(path) / 1e6
+        probe = subprocess.run([sys.executable, "-c", _LOAD_PROBE, path],
+                               capture_output=True, text=True, check=True)
+        loaded = json.loads(probe.stdout.strip().splitlines()[-1])
+
+    return {
+        "mae": float(mean_absolute_error(y_test, predictions)),
+        "r2": float(r2_score(y_test, predictions)),
+        "pickle_mb": pickle_mb,
+        "load_s": loaded["load_s"],
+        "peak_rss_mb": loaded["peak_rss_mb"],
+        "single_ms": single_ms,
+        "all_wards_ms": all_wards_ms,
+        "nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+    }
+
+
+def run_sweep(fit, configs, X_test, y_test, tolerance=0.02, select="size"):
+    """
+    Fit and measure every config. `fit(config)` returns a fitted forest.
+
+    The chosen model is the smallest (select="size") or fastest
+    (select="latency") among those whose MAE is within `tolerance`
+    (relative) of the best MAE in the grid. Returns (results, chosen_index,
+    chosen_model); only the chosen model is kept in memory.
+    """
+    rows, kept_index, kept_model = [], None, None
+    for i, config in enumerate(configs):
+        print(f"\n⚙️  [{i + 1}/{len(configs)}] {config}")
+        start = time.perf_counter()
+        model = fit(config)
+        row = dict(config, fit_s=time.perf_counter() - start)
+        row.update(measure(model, X_test, y_test))
+        rows.append(row)
+        print(f"   MAE {row['mae']:.4f}  R² {row['r2']:.4f}  {row['pickle_mb']:.1f} MB  "
+              f"{row['all_wards_ms']:.1f} ms/all-wards")
+
+        # Only the current winner stays in memory
+        if _winner(rows, tolerance, select) == i:
+            kept_index, kept_model = i, model
+
+    results = pd.DataFrame(rows)
+    results["within_tolerance"] = results["mae"] <= results["mae"].min() * (1 + tolerance)
+    chosen = _winner(rows, tolerance, select)
+    if chosen != kept_index:
+        # A later, more accurate config tightened the tolerance band; fits are seeded, so refit
+        kept_model = fit(configs[chosen])
+    return results, chosen, kept_model
+
+
+def _winner(rows, tolerance, select):
+    best_mae = min(row["mae"] for row in rows)
+    eligible = [i for i, row in enumerate(rows) if row["mae"] <= best_mae * (1 + tolerance)]
+    return min(eligible, key=lambda i: (rows[i][SELECT_BY[select]], rows[i]["mae"]))
+
+
+def print_sweep(results, chosen_index):
+    columns = ["n_estimators", "max_depth", "min_samples_split", "mae", "r2", "pickle_mb",
+               "load_s", "peak_rss_mb", "single_ms", "all_wards_ms", "within_tolerance"]
+    table = results[columns].copy()
+    table.insert(0, "", ["→" if i == chosen_index else "" for i in range(len(table))])
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
@@ -0,0 +1,286 @@
+"""
+Compiled PSI Curves for the JalDrishti Brain
+Rainfall intensity is the only input that changes between /predict calls, so
+for a fixed ward the forest output is an exact step function of rainfall.
+This module pulls every rainfall split reachable for each ward out of the
+trees and precomputes a sorted breakpoint/value table per ward, so a
+prediction becomes a binary search instead of a walk through all trees.
+
+Run `python psi_curves.py --verify` to check the tables the API serves (built
+from jaldrishti_brain.npz when it exists) against the pickle's model.predict.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from forest_arrays import FlatForest
+
+FEATURE_COLUMNS = ['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness']
+RAINFALL_FEATURE = 'rainfall_intensity'
+LEAF = -1
+
+
+def sklearn_trees(model):
+    """Yield (children_left, children_right, feature, threshold, leaf_value) per tree."""
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        yield (
+            tree.children_left,
+            tree.children_right,
+            tree.feature,
+            tree.threshold,
+            tree.value[:, 0, 0],
+        )
+
+
+def load_trees(model_path, forest_path):
+    """
+    (trees, feature names, path loaded) the way the API compiles its curves:
+    from the flat-array export when it exists and keeps the exact leaf
+    values, otherwise from the pickle (which imports scikit-learn).
+    """
+    if os.path.exists(forest_path):
+        forest = FlatForest.load(forest_path)
+        if forest.exact:
+            return forest.trees(), forest.feature_names, forest_path
+        print(f"⚠️  {os.path.basename(forest_path)} has rounded leaf values, compiling curves from the pickle")
+    import joblib
+    model = joblib.load(model_path)
+    return sklearn_trees(model), list(model.feature_names_in_), model_path
+
+
+def ward_feature_matrix(ward_meta, feature_names=FEATURE_COLUMNS):
+    """
+    Fixed (non-rainfall) inputs for every ward, in WARD_META order.
+    Cast to float32 exactly like sklearn does before comparing against thresholds.
+    """
+    rows = []
+    for ward_id, meta in ward_meta.items():
+        values = {
+            'ward_id': int(ward_id),
+            'rainfall_intensity': 0.0,
+            'drain_capacity': meta['drain_capacity'],
+            'imperviousness': meta['imperviousness'],
+        }
+        rows.append([values[name] for name in feature_names])
+    return np.asarray(rows, dtype=np.float32)
+
+
+def _reachable_leaves(tree, X, rainfall_idx):
+    """
+    Walk one tree for all wards at once, following both branches of every
+    rainfall split. Returns (ward, upper_bound, leaf_value) for each reachable
+    leaf, where the leaf covers rainfall in (previous bound, upper_bound].
+    """
+    left, right, feature, threshold, leaf_value = tree
+    n_wards = X.shape[0]
+
+    wards = np.arange(n_wards)
+    nodes = np.zeros(n_wards, dtype=np.intp)
+    upper = np.full(n_wards, np.inf)
+
+    out_wards, out_upper, out_values = [], [], []
+    while len(nodes):
+        is_leaf = left[nodes] == LEAF
+        out_wards.append(wards[is_leaf])
+        out_upper.append(upper[is_leaf])
+        out_values.append(leaf_value[nodes[is_leaf]])
+
+        wards, nodes, upper = wards[~is_leaf], nodes[~is_leaf], upper[~is_leaf]
+        on_rain = feature[nodes] == rainfall_idx
+
+        # Fixed features: follow the single branch sklearn would take (x <= t goes left)
+        fw, fn, fu = wards[~on_rain], nodes[~on_rain], upper[~on_rain]
+        go_left = X[fw, feature[fn]] <= threshold[fn]
+        fixed_next = np.where(go_left, left[fn], right[fn])
+
+        # Rainfall splits: keep both branches, tightening the upper bound on the left
+        rw, rn, ru = wards[on_rain], nodes[on_rain], upper[on_rain]
+        rain_upper = np.minimum(ru, threshold[rn])
+
+        wards = np.concatenate([fw, rw, rw])
+        nodes = np.concatenate([fixed_next, left[rn], right[rn]])
+        upper = np.concatenate([fu, rain_upper, ru])
+
+    return np.concatenate(out_wards), np.concatenate(out_upper), np.concatenate(out_values)
+
+
+def _sorted_unique(values):
+    """np.unique for large 1-D arrays; sort + mask beats hashing here."""
+    values = np.sort(values)
+    if len(values):
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+class PsiCurves:
+    """
+    Per-ward breakpoint/value tables.
+
+    All rainfall thresholds of the forest are ranked once (`thresholds`). Each
+    ward's breakpoints are stored as keys `ward * stride + rank` in one sorted
+    array, so a lookup for every ward is a single np.searchsorted call.
+    `values` holds len(breakpoints) + 1 entries per ward: the forest output on
+    each interval (b[k-1], b[k]].
+    """
+
+    def __init__(self, ward_ids, thresholds, keys, values):
+        self.ward_ids = list(ward_ids)
+        self.ward_index = {ward_id: i for i, ward_id in enumerate(self.ward_ids)}
+        self.thresholds = thresholds
+        self.stride = len(thresholds) + 1
+        self.keys = keys
+        self.values = values
+        self._ward_offsets = np.arange(len(self.ward_ids), dtype=np.int64) * self.stride
+
+    @classmethod
+    def from_trees(cls, trees, ward_meta, feature_names=FEATURE_COLUMNS):
+        """
+        Compile the tables from tree arrays (see `sklearn_trees`).
+
+        Leaf values are accumulated tree by tree and divided by the tree count,
+        the same order of float operations as RandomForestRegressor.predict,
+        so the tables are bit-identical to the model.
+        """
+        trees = list(trees)
+        rainfall_idx = list(feature_names).index(RAINFALL_FEATURE)
+        X = ward_feature_matrix(ward_meta, feature_names)
+        n_wards = X.shape[0]
+
+        leaves = [_reachable_leaves(tree, X, rainfall_idx) for tree in trees]
+
+        # Rank every finite bound; +inf (the last leaf of each ward) gets rank len(thresholds)
+        thresholds = _sorted_unique(np.concatenate([u[np.isfinite(u)] for _, u, _ in leaves]))
+        stride = len(thresholds) + 1
+
+        leaf_keys = []
+        for wards, upper, _ in leaves:
+            leaf_keys.append(wards.astype(np.int64) * stride + np.searchsorted(thresholds, upper))
+
+        # Each ward's grid: the union of leaf bounds over all trees (always ends at +inf)
+        grid = _sorted_unique(np.concatenate(leaf_keys))
+        totals = np.zeros(len(grid), dtype=np.float64)
+
+        for (_, _, leaf_values), keys in zip(leaves, leaf_keys):
+            order = np.argsort(keys, kind='stable')
+            keys, leaf_values = keys[order], leaf_values[order]
+            # Leaves tile each ward's rainfall axis, so a leaf covers every grid
+            # point up to and including its own bound.
+            counts = np.diff(np.searchsorted(grid, keys, side='right'), prepend=0)
+            totals += np.repeat(leaf_values, counts)
+        totals /= len(trees)
+
+        # Drop the +inf sentinels from the searchable keys, keep their values
+        finite = (grid % stride) != (stride - 1)
+        curves = cls(ward_meta.keys(), thresholds, grid[finite], totals)
+        assert len(curves.values) == len(curves.keys) + n_wards
+        return curves
+
+    @classmethod
+    def from_model(cls, model, ward_meta):
+        """Compile the tables straight from a fitted RandomForestRegressor."""
+        return cls.from_trees(sklearn_trees(model), ward_meta, list(model.feature_names_in_))
+
+    @property
+    def breakpoint_count(self):
+        return len(self.keys)
+
+    def _positions(self, rainfall, ward_offsets):
+        # sklearn compares float32 inputs, so collapse the query to float32 first
+        x = np.asarray(rainfall, dtype=np.float32).astype(np.float64)
+        rank = np.searchsorted(self.thresholds, x, side='left')
+        if np.ndim(rank):
+            rank = rank[:, None]
+        pos = np.searchsorted(self.keys, ward_offsets + rank, side='left')
+        # Every earlier ward also owns one +inf slot in `values`
+        return pos + ward_offsets // self.stride
+
+    def predict(self, rainfall):
+        """Raw forest output for every ward (WARD_META order) at this rainfall."""
+        return self.values[self._positions(rainfall, self._ward_offsets)]
+
+    def predict_many(self, rainfalls):
+        """Raw forest output as a (scenarios x wards) matrix, one search for all of it."""
+        return self.values[self._positions(np.ravel(rainfalls), self._ward_offsets)]
+
+    def predict_ward(self, ward_id, rainfall):
+        """Raw forest output for a single ward."""
+        offset = np.int64(self.ward_index[ward_id]) * self.stride
+        return self.values[self._positions(rainfall, offset)]
+
+
+def verify(curves, model, ward_meta, samples=2000, seed=0):
+    """
+    Compare compiled curves against model.predict.
+
+    Checks every ward at `samples` random rainfalls plus, for a sample of
+    breakpoints, the float32 values on each side of the split. Returns the
+    number of mismatching predictions (0 means bit-identical).
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    feature_names = list(model.feature_names_in_)
+    rainfall_idx = feature_names.index(RAINFALL_FEATURE)
+    X = ward_feature_matrix(ward_meta, feature_names)
+
+    # Random slider positions, including values past the training range
+    rainfalls = list(rng.uniform(-10, 250, size=samples))
+    # Both sides of sampled split points: the largest float32 <= t and the next one up
+    picked = rng.choice(curves.thresholds, size=min(samples, len(curves.thresholds)), replace=False)
+    below = np.float32(picked)
+    below = np.where(below > picked, np.nextafter(below, np.float32(-np.inf)), below)
+    above = np.nextafter(below, np.float32(np.inf))
+    rainfalls += list(below) + list(above)
+
+    # Serial accumulation keeps model.predict itself deterministic
+    n_jobs, verbose = model.n_jobs, model.verbose
+    model.n_jobs, model.verbose = 1, 0
+    mismatches = 0
+    try:
+        batch = 256
+        for start in range(0, len(rainfalls), batch):
+            chunk = np.asarray(rainfalls[start:start + batch], dtype=np.float32)
+            rows = np.repeat(X[None, :, :], len(chunk), axis=0)
+            rows[:, :, rainfall_idx] = chunk[:, None]
+            frame = pd.DataFrame(rows.reshape(-1, X.shape[1]), columns=feature_names)
+            expected = model.predict(frame).reshape(len(chunk), -1)
+            for i, rainfall in enumerate(chunk):
+                mismatches += int(np.count_nonzero(curves.predict(rainfall) != expected[i]))
+    finally:
+        model.n_jobs, model.verbose = n_jobs, verbose
+
+    return mismatches, len(rainfalls) * X.shape[0]
+
+
+if __name__ == "__main__":
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Compile and verify per-ward PSI curves")
+    parser.add_argument("--verify", action="store_true", help="check the served curves against model.predict")
+    parser.add_argument("--samples", type=int, default=2000, help="random rainfalls / breakpoints to check")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.join(script_dir, "jaldrishti_brain.pkl")
+    with open(os.path.join(script_dir, "ward_metadata.json"), 'r') as f:
+        ward_meta = json.load(f)
+
+    start = time.perf_counter()
+    trees, feature_names, source = load_trees(model_path, os.path.join(script_dir, "jaldrishti_brain.npz"))
+    print(f"📈 Compiling PSI curves from {os.path.basename(source)}...")
+    curves = PsiCurves.from_trees(trees, ward_meta, feature_names)
+    print(f"   {curves.breakpoint_count:,} breakpoints for {len(curves.ward_ids)} wards "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    if args.verify:
+        print("\n🧪 Verifying against model.predict...")
+        model = joblib.load(model_path)
+        mismatches, checked = verify(curves, model, ward_meta, samples=args.samples)
+        if mismatches:
+            print(f"   ❌ {mismatches:,} of {checked:,} predictions differ")
+            raise SystemExit(1)
+        print(f"   ✅ {checked:,} predictions bit-identical")
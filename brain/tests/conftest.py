@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Add parent dir to path so we can import the brain modules. The backend has
+# its own main.py and copies of the shared modules, so run each service's
+# tests in a separate session: python -m pytest brain/tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Empty choropleth cache; returns the list of (zoom, bucket) documents rendered."""
+    rendered = []
+    render = main.render_choropleth
+
+    def counting_render(zoom, rainfall):
+        rendered.append((zoom, rainfall))
+        return render(zoom, rainfall)
+
+    monkeypatch.setattr(main, "render_choropleth", counting_render)
+    monkeypatch.setattr(main, "_choropleth_cache", main.OrderedDict())
+    return rendered
+
+
+client = TestClient(main.app)
+
+
+def test_rainfall_in_one_bucket_is_rendered_once(renders):
+    first = client.get("/choropleth", params={"rainfall": 49.8})
+    second = client.get("/choropleth", params={"rainfall": 50.2})
+    assert first.status_code == second.status_code == 200
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.content == second.content
+    assert len(renders) == 1
+
+    document = json.loads(first.content)
+    assert document["rainfall_intensity"] == 50.0
+    assert {"predicted_psi", "status"} <= set(document["features"][0]["properties"])
+
+    other = client.get("/choropleth", params={"rainfall": 51})
+    assert other.headers["ETag"] != first.headers["ETag"]
+    assert len(renders) == 2
+
+
+def test_negative_rainfall_is_the_zero_bucket(renders):
+    zero = client.get("/choropleth", params={"rainfall": 0})
+    negative = client.get("/choropleth", params={"rainfall": -5})
+    assert negative.headers["ETag"] == zero.headers["ETag"]
+    assert len(renders) == 1
+
+
+def test_matching_etag_is_a_304_without_rendering(renders):
+    etag = client.get("/choropleth", params={"rainfall": 80}).headers["ETag"]
+    revalidated = client.get("/choropleth", params={"rainfall": 80.3}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert len(renders) == 1
+
+    stale = client.get("/choropleth", params={"rainfall": 80}, headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+
+
+def test_gzip_is_the_same_document(renders):
+    plain = client.get("/choropleth", params={"rainfall": 20}, headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/choropleth", params={"rainfall": 20}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.content == plain.content  # the test client decodes it
+    assert gzip.decompress(next(iter(main._choropleth_cache.values()))["gzip"]) == plain.content
+    assert len(renders) == 1
+
+
+@pytest.mark.parametrize("rainfall", ["inf", "-inf", "nan", "1e400"])
+def test_non_finite_rainfall_is_a_400(rainfall, renders):
+    response = client.get("/choropleth", params={"rainfall": rainfall})
+    assert response.status_code == 400
+    assert renders == []
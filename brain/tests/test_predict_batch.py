@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def predict(rainfall):
+    """Plain /predict for one rainfall, as (ward ids, PSI values)."""
+    wards = client.post("/predict", json={"rainfall_intensity": rainfall}).json()
+    return [w["ward_id"] for w in wards], [w["predicted_psi"] for w in wards]
+
+
+def batch(**body):
+    response = client.post("/predict/batch", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    header, *scenarios = [json.loads(line) for line in response.text.splitlines()]
+    return header, scenarios
+
+
+def test_batch_streams_every_scenario_across_blocks():
+    # Three blocks: two full, one partial
+    count = 2 * main.BATCH_BLOCK_SIZE + 3
+    header, scenarios = batch(start=0, stop=count - 1, step=1)
+    assert header["scenarios"] == count == len(scenarios)
+    assert header["ward_ids"] == predict(0.0)[0]
+    assert [s["rainfall_intensity"] for s in scenarios] == list(range(count))
+
+    for index in (0, main.BATCH_BLOCK_SIZE - 1, main.BATCH_BLOCK_SIZE, count - 1):
+        assert scenarios[index]["psi"] == predict(float(index))[1]
+
+
+def test_batch_keeps_the_order_of_an_explicit_list():
+    rainfalls = [90.0, 5.0, 200.0, 5.0]
+    _, scenarios = batch(rainfall_intensities=rainfalls)
+    assert [s["rainfall_intensity"] for s in scenarios] == rainfalls
+    assert scenarios[1]["psi"] == scenarios[3]["psi"]
+
+
+@pytest.mark.parametrize("body", [
+    {"rainfall_intensities": [1.0] * (main.MAX_BATCH_SCENARIOS + 1)},
+    {"start": 0, "stop": main.MAX_BATCH_SCENARIOS, "step": 1},
+    {"start": 10, "stop": 0, "step": 1},
+    {"start": 0, "stop": 10, "step": 0},
+    {},
+])
+def test_batch_rejects_bad_requests(body):
+    response = client.post("/predict/batch", json=body)
+    assert response.status_code == 400
+    assert "application/x-ndjson" not in response.headers["content-type"]
+
+
+def test_batch_cap_is_10000():
+    assert main.MAX_BATCH_SCENARIOS == 10000
@@ -0,0 +1,85 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from forest_arrays import FlatForest, export_forest
+from psi_curves import FEATURE_COLUMNS, PsiCurves, load_trees, verify
+
+# A small forest on data shaped like generate_data.py's, so the tests run in seconds
+
+
+@pytest.fixture(scope="module")
+def ward_meta():
+    rng = np.random.default_rng(0)
+    return {
+        str(ward_id): {"drain_capacity": int(rng.integers(40, 160)), "imperviousness": round(float(rng.uniform(0.3, 0.98)), 3)}
+        for ward_id in rng.choice(1000, 40, replace=False)
+    }
+
+
+@pytest.fixture(scope="module")
+def model(ward_meta):
+    rng = np.random.default_rng(1)
+    rows = []
+    for ward_id, meta in ward_meta.items():
+        for rainfall in rng.uniform(0, 200, 50):
+            rows.append([int(ward_id), rainfall, meta["drain_capacity"], meta["imperviousness"]])
+    X = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    psi = np.clip(X.rainfall_intensity * X.imperviousness / X.drain_capacity * 50 + rng.normal(0, 5, len(X)), 0, 100)
+    return RandomForestRegressor(n_estimators=20, max_depth=10, random_state=0).fit(X, psi)
+
+
+def model_predict(model, ward_meta, rainfall):
+    X = pd.DataFrame(
+        [[int(w), rainfall, m["drain_capacity"], m["imperviousness"]] for w, m in ward_meta.items()],
+        columns=FEATURE_COLUMNS,
+    )
+    return model.predict(X)
+
+
+def test_curves_are_bit_identical_to_the_model(model, ward_meta):
+    curves = PsiCurves.from_model(model, ward_meta)
+    mismatches, checked = verify(curves, model, ward_meta, samples=300)
+    assert checked > 0
+    assert mismatches == 0
+
+
+def test_ward_and_batch_lookups_agree(model, ward_meta):
+    curves = PsiCurves.from_model(model, ward_meta)
+    rainfalls = [0.0, 12.5, 60.0, 199.9, 500.0]
+    grid = curves.predict_many(rainfalls)
+    for row, rainfall in zip(grid, rainfalls):
+        assert np.array_equal(row, model_predict(model, ward_meta, rainfall))
+        assert np.array_equal(row, curves.predict(rainfall))
+    ward_id = list(ward_meta)[7]
+    assert curves.predict_ward(ward_id, 60.0) == grid[2][7]
+
+
+def test_curves_from_the_npz_export_match_the_pickle(model, ward_meta, tmp_path):
+    model_path, forest_path = str(tmp_path / "brain.pkl"), str(tmp_path / "brain.npz")
+    joblib.dump(model, model_path)
+    export_forest(model, forest_path)
+
+    trees, feature_names, source = load_trees(model_path, forest_path)
+    assert source == forest_path
+    curves = PsiCurves.from_trees(trees, ward_meta, feature_names)
+    mismatches, _ = verify(curves, model, ward_meta, samples=300)
+    assert mismatches == 0
+
+
+def test_quantized_export_falls_back_to_the_pickle(model, ward_meta, tmp_path):
+    model_path, forest_path = str(tmp_path / "brain.pkl"), str(tmp_path / "brain.npz")
+    joblib.dump(model, model_path)
+    export_forest(model, forest_path, quantize_bits=8)
+
+    forest = FlatForest.load(forest_path)
+    assert not forest.exact
+    with pytest.raises(ValueError):
+        forest.trees()
+
+    trees, feature_names, source = load_trees(model_path, forest_path)
+    assert source == model_path
+    mismatches, _ = verify(PsiCurves.from_trees(trees, ward_meta, feature_names), model, ward_meta, samples=300)
+    assert mismatches == 0
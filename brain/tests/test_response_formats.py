@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def predict(rainfall, accept=None):
+    headers = {"Accept": accept} if accept else {}
+    return client.post("/predict", json={"rainfall_intensity": rainfall}, headers=headers)
+
+
+def as_columns(wards):
+    """Plain /predict JSON as (ward_id, ward_no, psi, status) columns."""
+    return ([w["ward_id"] for w in wards], [w["ward_no"] for w in wards],
+            [w["predicted_psi"] for w in wards], [w["status"] for w in wards])
+
+
+@pytest.mark.parametrize("rainfall", [0.0, 37.5, 120.0])
+def test_columnar_predict_matches_json(rainfall):
+    ward_ids, ward_nos, psi, status = as_columns(predict(rainfall).json())
+    response = predict(rainfall, main.COLUMNAR_MEDIA_TYPE)
+    assert response.headers["content-type"] == main.COLUMNAR_MEDIA_TYPE
+    assert "Accept" in response.headers["vary"]
+    columns = response.json()
+    assert columns["ward_id"] == ward_ids
+    assert columns["ward_no"] == ward_nos
+    assert columns["psi"] == psi
+    assert [columns["status_levels"][code] for code in columns["status"]] == status
+
+
+@pytest.mark.parametrize("rainfall", [0.0, 37.5, 120.0])
+def test_binary_predict_matches_json(rainfall):
+    ward_ids, _, psi, status = as_columns(predict(rainfall).json())
+    response = predict(rainfall, main.BINARY_MEDIA_TYPE)
+    assert response.headers["content-type"] == main.BINARY_MEDIA_TYPE
+    content = response.content
+    count = int(np.frombuffer(content, "<u4", 1)[0])
+    assert count == len(ward_ids)
+    assert len(content) == 4 + count * (4 + 4 + 1)
+    ids = np.frombuffer(content, "<i4", count, 4)
+    values = np.frombuffer(content, "<f4", count, 4 + 4 * count)
+    codes = np.frombuffer(content, "u1", count, 4 + 8 * count)
+    assert [str(i) for i in ids] == ward_ids
+    assert np.array_equal(values, np.array(psi, dtype=np.float32))
+    assert [main.STATUS_LEVELS[code] for code in codes] == status
+
+
+def test_columnar_wards_match_json():
+    wards = client.get("/wards").json()
+    response = client.get("/wards", headers={"Accept": main.COLUMNAR_MEDIA_TYPE})
+    assert response.headers["content-type"] == main.COLUMNAR_MEDIA_TYPE
+    columns = response.json()
+    assert columns["ward_id"] == list(wards)
+    for field in ("ward_no", "drain_capacity", "imperviousness", "area", "elevation"):
+        assert columns[field] == [meta.get(field) for meta in wards.values()]
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("*/*", main.JSON_MEDIA_TYPE),
+    ("application/*", main.JSON_MEDIA_TYPE),
+    ("text/html, */*;q=0.8", main.JSON_MEDIA_TYPE),
+    (f"application/json;q=0.5, {main.BINARY_MEDIA_TYPE}", main.BINARY_MEDIA_TYPE),
+    (f"{main.COLUMNAR_MEDIA_TYPE};q=0.9, application/json", main.JSON_MEDIA_TYPE),
+])
+def test_highest_q_wins(accept, expected):
+    assert predict(50.0, accept).headers["content-type"] == expected
+
+
+@pytest.mark.parametrize("accept", ["text/html", "application/xml", f"{main.COLUMNAR_MEDIA_TYPE};q=0"])
+def test_unsupported_types_are_406(accept):
+    assert predict(50.0, accept).status_code == 406
+    assert client.get("/wards", headers={"Accept": accept}).status_code == 406
+
+
+def test_wards_dont_offer_binary():
+    assert client.get("/wards", headers={"Accept": main.BINARY_MEDIA_TYPE}).status_code == 406
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from training_shards import SHARD_COLUMNS, ShardWriter, open_shards, sample_rows
+
+ROWS_PER_SHARD = [500, 300, 700]
+
+
+@pytest.fixture
+def shards(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    first = 0
+    for rows in ROWS_PER_SHARD:
+        # ward_id numbers the rows globally, so sampled rows can be traced back
+        ids = np.arange(first, first + rows)
+        writer.write(pd.DataFrame({
+            'ward_id': ids, 'rainfall_intensity': ids * 0.5, 'drain_capacity': 100, 'imperviousness': 0.5,
+            'area': 10000.0, 'elevation': "Low", 'psi_label': ids % 10,
+        }))
+        first += rows
+    writer.close()
+    return open_shards(str(tmp_path))[1]
+
+
+def test_sample_rows_draws_distinct_rows_from_every_shard(shards):
+    rows = sample_rows(shards, 600, np.random.default_rng(0))
+    ids = rows[:, SHARD_COLUMNS.index('ward_id')].astype(int)
+    assert len(rows) == 600
+    assert len(set(ids)) == 600
+    assert np.array_equal(rows[:, SHARD_COLUMNS.index('rainfall_intensity')], ids * 0.5)
+    # Every shard contributes, roughly in proportion to its size
+    edges = np.cumsum([0] + ROWS_PER_SHARD)
+    counts = np.histogram(ids, bins=edges)[0]
+    assert all(abs(count - 600 * rows / sum(ROWS_PER_SHARD)) < 60 for count, rows in zip(counts, ROWS_PER_SHARD))
+
+
+def test_sample_rows_returns_everything_when_asked_for_more(shards):
+    rows = sample_rows(shards, 10_000, np.random.default_rng(0))
+    assert np.array_equal(rows[:, SHARD_COLUMNS.index('ward_id')], np.arange(sum(ROWS_PER_SHARD)))
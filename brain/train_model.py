@@ -2,47 +2,114 @@
 Train the JalDrishti Flood Prediction Model (RandomForest Regressor)
 Uses the enhanced training data generated from all Delhi wards.
 """
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
+from forest_arrays import export_forest, compare, print_comparison
+from model_sweep import parse_grid, print_sweep, run_sweep
+from training_shards import FEATURE_COLUMNS, fit_bootstrap_forest, open_shards, read_shards, sample_rows, split_xy
+
+parser = argparse.ArgumentParser(description="Train the JalDrishti flood prediction model")
+parser.add_argument("--data", default="training_shards" if os.path.isdir("training_shards") else "flood_training_data.csv",
+                    help="shard directory from generate_data.py, or a CSV file")
+parser.add_argument("--stream", action="store_true",
+                    help="out-of-core: fit each tree on a bootstrap sample drawn from the shards")
+parser.add_argument("--max-samples", type=int, default=500_000, help="rows per tree bootstrap in --stream mode")
+parser.add_argument("--eval-rows", type=int, default=200_000, help="held-out rows to evaluate on in --stream mode")
+parser.add_argument("--sweep", action="store_true",
+                    help="train a grid of configurations and keep the smallest/fastest within --tolerance")
+parser.add_argument("--grid-estimators", default="25,50,100,150", help="n_estimators values for --sweep")
+parser.add_argument("--grid-depth", default="10,14,20", help="max_depth values for --sweep")
+parser.add_argument("--grid-min-split", default="10", help="min_samples_split values for --sweep")
+parser.add_argument("--tolerance", type=float, default=0.02, help="allowed relative MAE increase over the best")
+parser.add_argument("--select", choices=["size", "latency"], default="size",
+                    help="pick the smallest pickle or the fastest all-wards predict")
+args = parser.parse_args()
+
+DEFAULT_CONFIG = {
+    "n_estimators": 150,      # More trees for better accuracy
+    "max_depth": 20,          # Limit depth to prevent overfitting
+    "min_samples_split": 10,  # Require at least 10 samples to split
+}
+
 print("🧠 JalDrishti Model Training")
 print("=" * 50)
 
-# 1. Load Data
-print("\n📂 Loading training data...")
-df = pd.read_csv("flood_training_data.csv")
-print(f"   Loaded {len(df):,} samples")
-
-# 2. Features (Inputs) vs Target (Output)
 # Using: ward_id, rainfall_intensity, drain_capacity, imperviousness
 # Note: We exclude 'area' and 'elevation' for simpler model, but they're encoded in capacity/imperviousness
-X = df[['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness']]
-y = df['psi_label']
-
-print(f"\n📊 Feature columns: {list(X.columns)}")
+print(f"\n📊 Feature columns: {FEATURE_COLUMNS}")
 print(f"   Target: psi_label (0-10 scale)")
 
-# 3. Train/Test Split (80/20)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f"\n🔀 Train/Test Split:")
-print(f"   Training samples: {len(X_train):,}")
-print(f"   Test samples: {len(X_test):,}")
-
-# 4. Initialize and Train Random Forest
-# Use more estimators for better accuracy with large dataset
-print("\n⚙️  Training Random Forest Regressor...")
-model = RandomForestRegressor(
-    n_estimators=150,      # More trees for better accuracy
-    max_depth=20,          # Limit depth to prevent overfitting
-    min_samples_split=10,  # Require at least 10 samples to split
-    n_jobs=-1,             # Use all CPU cores
-    random_state=42,
-    verbose=1
-)
-model.fit(X_train, y_train)
+if args.stream:
+    # 1. Open Shards (memory-mapped, nothing loaded yet)
+    print(f"\n📂 Opening training shards: {args.data}")
+    manifest, shards = open_shards(args.data)
+    if len(shards) < 2:
+        raise SystemExit("--stream needs at least 2 shards (one is held out for testing)")
+    print(f"   {manifest['rows']:,} samples in {len(shards)} shards")
+
+    # 2/3. Hold out the last 20% of shards for testing
+    n_test = max(1, len(shards) // 5)
+    train_shards, test_shards = shards[:-n_test], shards[-n_test:]
+    # Only the evaluated rows are read, so memory stays bounded by --eval-rows
+    X_test, y_test = split_xy(sample_rows(test_shards, args.eval_rows, np.random.default_rng(42)))
+    X_test, y_test = pd.DataFrame(X_test, columns=FEATURE_COLUMNS), pd.Series(y_test, name='psi_label')
+    print(f"\n🔀 Train/Test Split (by shard):")
+    print(f"   Training shards: {len(train_shards)} ({sum(len(s) for s in train_shards):,} samples)")
+    print(f"   Test samples: {len(X_test):,}")
+
+    # 4. Fit one tree per bootstrap sample
+    print(f"\n⚙️  Training Random Forest Regressor out-of-core ({args.max_samples:,} rows per tree)...")
+
+    def fit(config):
+        return fit_bootstrap_forest(train_shards, max_samples=args.max_samples, n_jobs=-1,
+                                    random_state=42, **config)
+else:
+    # 1. Load Data
+    print("\n📂 Loading training data...")
+    df = read_shards(args.data) if os.path.isdir(args.data) else pd.read_csv(args.data)
+    print(f"   Loaded {len(df):,} samples")
+
+    # 2. Features (Inputs) vs Target (Output)
+    X = df[FEATURE_COLUMNS]
+    y = df['psi_label']
+
+    # 3. Train/Test Split (80/20)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    print(f"\n🔀 Train/Test Split:")
+    print(f"   Training samples: {len(X_train):,}")
+    print(f"   Test samples: {len(X_test):,}")
+
+    # 4. Initialize and Train Random Forest
+    # Use more estimators for better accuracy with large dataset
+    print("\n⚙️  Training Random Forest Regressor...")
+
+    def fit(config):
+        return RandomForestRegressor(
+            n_jobs=-1,             # Use all CPU cores
+            random_state=42,
+            verbose=1,
+            **config
+        ).fit(X_train, y_train)
+
+if args.sweep:
+    # Train the whole grid and keep the smallest/fastest model within tolerance
+    configs = parse_grid(args.grid_estimators, args.grid_depth, args.grid_min_split)
+    results, chosen, model = run_sweep(fit, configs, X_test, y_test,
+                                       tolerance=args.tolerance, select=args.select)
+    print(f"\n📋 Sweep results (MAE within {args.tolerance:.0%} of best, chosen by {args.select}):")
+    print_sweep(results, chosen)
+    results.to_csv("model_sweep.csv", index=False)
+    print("💾 Sweep table saved: model_sweep.csv")
+else:
+    model = fit(DEFAULT_CONFIG)
 print("   ✅ Training complete!")
 
 # 5. Evaluate Model
@@ -59,7 +126,7 @@ print(f"   R² Score: {r2:.4f}")
 
 # 6. Feature Importance
 print("\n🎯 Feature Importance:")
-importances = dict(zip(X.columns, model.feature_importances_))
+importances = dict(zip(FEATURE_COLUMNS, model.feature_importances_))
 for feature, importance in sorted(importances.items(), key=lambda x: x[1], reverse=True):
     print(f"   {feature}: {importance:.3f}")
 
@@ -67,7 +134,13 @@ for feature, importance in sorted(importances.items(), key=lambda x: x[1], rever
 joblib.dump(model, "jaldrishti_brain.pkl")
 print("\n💾 Model saved: jaldrishti_brain.pkl")
 
-# 8. Quick Sanity Check
+# 8. Export Flat-Array Model (served by main.py without scikit-learn)
+export_forest(model, "jaldrishti_brain.npz")
+print("💾 Flat-array model saved: jaldrishti_brain.npz")
+print("\n📊 Flat-array vs original model:")
+print_comparison(compare(model, "jaldrishti_brain.pkl", "jaldrishti_brain.npz", X_test, y_test))
+
+# 9. Quick Sanity Check
 print("\n🧪 Sanity Check (sample predictions):")
 test_cases = [
     {"ward_id": 558, "rainfall_intensity": 0, "drain_capacity": 94, "imperviousness": 0.939},
@@ -0,0 +1,165 @@
+"""
+Partitioned Training Data for the JalDrishti Brain
+generate_data.py writes simulated events as fixed-size .npy shards plus a
+manifest.json instead of one big CSV. train_model.py reads them back either
+all at once, or out-of-core: every tree is fit on its own bootstrap sample
+gathered from memory-mapped shards, so only one sample per worker is ever
+held in memory no matter how many events were simulated.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SHARD_COLUMNS = ['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness',
+                 'area', 'elevation_code', 'psi_label']
+FEATURE_COLUMNS = ['ward_id', 'rainfall_intensity', 'drain_capacity', 'imperviousness']
+TARGET_COLUMN = 'psi_label'
+ELEVATION_CODES = ["Low", "Moderate", "High-Density", "Sink"]
+MANIFEST_NAME = "manifest.json"
+
+
+class ShardWriter:
+    """Writes training DataFrames (generate_data.TRAINING_COLUMNS) as float32 .npy shards."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.shards = []
+        os.makedirs(output_dir, exist_ok=True)
+        # Stale shards from a bigger run would otherwise be picked up
+        for path in glob.glob(os.path.join(output_dir, "part-*.npy")):
+            os.remove(path)
+
+    def write(self, chunk):
+        codes = {name: i for i, name in enumerate(ELEVATION_CODES)}
+        array = np.empty((len(chunk), len(SHARD_COLUMNS)), dtype=np.float32)
+        for i, column in enumerate(SHARD_COLUMNS):
+            if column == 'elevation_code':
+                array[:, i] = chunk['elevation'].map(codes).to_numpy()
+            else:
+                array[:, i] = chunk[column].to_numpy()
+
+        name = f"part-{len(self.shards):05d}.npy"
+        np.save(os.path.join(self.output_dir, name), array)
+        self.shards.append({"file": name, "rows": len(chunk)})
+
+    def close(self):
+        manifest = {
+            "columns": SHARD_COLUMNS,
+            "elevation_codes": ELEVATION_CODES,
+            "rows": sum(shard["rows"] for shard in self.shards),
+            "shards": self.shards,
+        }
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def open_shards(shard_dir):
+    """Manifest plus a read-only memory map of every shard (nothing is loaded yet)."""
+    with open(os.path.join(shard_dir, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+    shards = [np.load(os.path.join(shard_dir, shard["file"]), mmap_mode='r') for shard in manifest["shards"]]
+    return manifest, shards
+
+
+def to_frame(array):
+    """Shard rows back to a DataFrame with the original column names."""
+    df = pd.DataFrame(np.asarray(array), columns=SHARD_COLUMNS)
+    df['elevation'] = np.asarray(ELEVATION_CODES, dtype=object)[df.pop('elevation_code').astype(int)]
+    return df
+
+
+def read_shards(shard_dir, nrows=None):
+    """Load shards into one DataFrame (optionally only the first `nrows` rows)."""
+    _, shards = open_shards(shard_dir)
+    parts, remaining = [], nrows
+    for shard in shards:
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            shard = shard[:remaining]
+            remaining -= len(shard)
+        parts.append(np.asarray(shard))
+    return to_frame(np.concatenate(parts))
+
+
+def bootstrap_sample(shards, n_rows, rng):
+    """
+    Draw `n_rows` rows with replacement across shards, in proportion to shard
+    size. Indices are sorted per shard so the memory maps are read sequentially.
+    """
+    sizes = np.array([len(shard) for shard in shards])
+    per_shard = rng.multinomial(n_rows, sizes / sizes.sum())
+    parts = [
+        shard[np.sort(rng.integers(0, len(shard), size=count))]
+        for shard, count in zip(shards, per_shard) if count
+    ]
+    return np.concatenate(parts)
+
+
+def sample_rows(shards, n_rows, rng):
+    """
+    `n_rows` distinct rows drawn uniformly across shards (every row if there
+    are fewer). Only the picked rows are read from the memory maps, in order.
+    """
+    offsets = np.cumsum([0] + [len(shard) for shard in shards])
+    total = int(offsets[-1])
+    picked = np.arange(total) if total <= n_rows else np.sort(rng.choice(total, n_rows, replace=False))
+    bounds = np.searchsorted(picked, offsets)
+    parts = [
+        shard[picked[lo:hi] - start]
+        for shard, start, lo, hi in zip(shards, offsets, bounds[:-1], bounds[1:]) if hi > lo
+    ]
+    return np.concatenate(parts)
+
+
+def split_xy(array):
+    """Feature matrix and target from raw shard rows."""
+    feature_idx = [SHARD_COLUMNS.index(column) for column in FEATURE_COLUMNS]
+    return array[:, feature_idx], array[:, SHARD_COLUMNS.index(TARGET_COLUMN)].astype(np.float64)
+
+
+def fit_bootstrap_forest(shards, max_samples, n_estimators=150, max_depth=20,
+                         min_samples_split=10, n_jobs=-1, random_state=42):
+    """
+    Out-of-core RandomForest: each tree is a DecisionTreeRegressor fit on its
+    own `max_samples`-row bootstrap drawn from the shards. The trees are then
+    wrapped in a regular RandomForestRegressor, so predict / joblib.dump /
+    forest_arrays.export_forest work unchanged.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.tree import DecisionTreeRegressor
+
+    seeds = np.random.SeedSequence(random_state).spawn(n_estimators)
+
+    def fit_tree(seed):
+        rng = np.random.default_rng(seed)
+        X, y = split_xy(bootstrap_sample(shards, max_samples, rng))
+        tree = DecisionTreeRegressor(
+            max_depth=max_depth,
+            min_samples_split=min_samples_split,
+            random_state=int(rng.integers(np.iinfo(np.int32).max)),
+        )
+        return tree.fit(X, y)
+
+    # Trees release the GIL while fitting, so threads share the memory maps
+    trees = Parallel(n_jobs=n_jobs, prefer="threads", verbose=1)(delayed(fit_tree)(seed) for seed in seeds)
+
+    model = RandomForestRegressor(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        max_samples=max_samples,
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+    model.estimator_ = DecisionTreeRegressor(max_depth=max_depth, min_samples_split=min_samples_split)
+    model.estimators_ = trees
+    model.n_features_in_ = len(FEATURE_COLUMNS)
+    model.feature_names_in_ = np.asarray(FEATURE_COLUMNS, dtype=object)
+    model.n_outputs_ = 1
+    return model
@@ -0,0 +1,116 @@
+"""
+Ward Spatial Index
+Maps report coordinates to the ward polygon that contains them. Ward
+bounding boxes are bucketed into a uniform grid at startup, so a lookup only
+runs the exact point-in-polygon test on the handful of wards whose boxes
+overlap the point's cell instead of scanning every polygon.
+
+Uses only NumPy; the same module is shipped with both the brain and the
+backend service (backend/tests/test_shared_modules.py fails if the copies
+differ).
+"""
+import json
+
+import numpy as np
+
+
+def parse_bbox(text):
+    """"min_lng,min_lat,max_lng,max_lat" → tuple of floats (ValueError if malformed)."""
+    values = tuple(float(v) for v in text.split(","))
+    if len(values) != 4 or values[0] > values[2] or values[1] > values[3]:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    return values
+
+
+class WardIndex:
+    """
+    Uniform-grid index over ward polygons (GeoJSON Polygon / MultiPolygon,
+    lng/lat order). Holes are handled by the even-odd rule.
+    """
+
+    def __init__(self, features, cells=64):
+        self.properties = []
+        edges = []  # per ward: (x1, y1, x2, y2) arrays over every ring edge
+        boxes = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+
+            rings = [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+            start = np.concatenate([ring for ring in rings])
+            end = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+            edges.append((start[:, 0], start[:, 1], end[:, 0], end[:, 1]))
+            boxes.append((start[:, 0].min(), start[:, 1].min(), start[:, 0].max(), start[:, 1].max()))
+            self.properties.append(feature.get('properties', {}))
+
+        self._edges = edges
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._build_grid(cells)
+
+    @classmethod
+    def from_geojson(cls, path, cells=64):
+        with open(path, 'r') as f:
+            return cls(json.load(f)['features'], cells=cells)
+
+    def __len__(self):
+        return len(self.properties)
+
+    def _build_grid(self, cells):
+        """Bucket every ward's bounding box into the grid cells it overlaps (CSR layout)."""
+        self.cells = cells
+        self.extent = (
+            self.boxes[:, 0].min(), self.boxes[:, 1].min(),
+            self.boxes[:, 2].max(), self.boxes[:, 3].max(),
+        ) if len(self.boxes) else (0.0, 0.0, 1.0, 1.0)
+        min_x, min_y, max_x, max_y = self.extent
+        self.cell_w = (max_x - min_x) / cells or 1.0
+        self.cell_h = (max_y - min_y) / cells or 1.0
+
+        buckets = [[] for _ in range(cells * cells)]
+        for ward, (x0, y0, x1, y1) in enumerate(self.boxes):
+            cx0, cy0 = self._cell(x0, y0)
+            cx1, cy1 = self._cell(x1, y1)
+            for cy in range(cy0, cy1 + 1):
+                for cx in range(cx0, cx1 + 1):
+                    buckets[cy * cells + cx].append(ward)
+
+        self.cell_offsets = np.cumsum([0] + [len(bucket) for bucket in buckets])
+        self.cell_wards = np.asarray([w for bucket in buckets for w in bucket], dtype=np.int32)
+
+    def _cell(self, x, y):
+        min_x, min_y, _, _ = self.extent
+        cx = min(max(int((x - min_x) / self.cell_w), 0), self.cells - 1)
+        cy = min(max(int((y - min_y) / self.cell_h), 0), self.cells - 1)
+        return cx, cy
+
+    def _contains(self, ward, x, y):
+        """Even-odd crossing test against every ring edge of one ward."""
+        x1, y1, x2, y2 = self._edges[ward]
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at_y = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        return bool(np.count_nonzero(crosses & (x < x_at_y)) % 2)
+
+    def candidates(self, lng, lat):
+        """Wards whose bounding box contains the point (via its grid cell)."""
+        min_x, min_y, max_x, max_y = self.extent
+        if not (min_x <= lng <= max_x and min_y <= lat <= max_y):
+            return []
+        cx, cy = self._cell(lng, lat)
+        cell = cy * self.cells + cx
+        wards = self.cell_wards[self.cell_offsets[cell]:self.cell_offsets[cell + 1]]
+        boxes = self.boxes[wards]
+        inside = (boxes[:, 0] <= lng) & (lng <= boxes[:, 2]) & (boxes[:, 1] <= lat) & (lat <= boxes[:, 3])
+        return wards[inside].tolist()
+
+    def locate(self, lng, lat):
+        """Properties of the ward containing (lng, lat), or None."""
+        for ward in self.candidates(lng, lat):
+            if self._contains(ward, lng, lat):
+                return self.properties[ward]
+        return None
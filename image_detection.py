@@ -1,8 +1,40 @@
-import cv2
-import numpy as np
+"""
+Water Logging Detector (texture based)
+Smooth, not-too-bright regions of a street photo are water candidates; large
+connected regions of them count as standing water. The measurement is the
+texture stage of backend/detection_engine.py.
+
+    python image_detection.py photo.jpg                  # one JSON object (used by /api/analyze-image)
+    python image_detection.py photos/ "more/*.png" -o results.jsonl --workers 4
+"""
+import argparse
+import glob
 import os
 import sys
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from detection_engine import TEXTURE_SIZE, TEXTURE_WATER_RATIO, texture_water_ratio  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def detect_water_logging_array(img):
+    """Detector on a BGR image array (any size; it is resized to TEXTURE_SIZE)."""
+    gray = cv2.cvtColor(cv2.resize(img, TEXTURE_SIZE), cv2.COLOR_BGR2GRAY)
+    water_ratio = texture_water_ratio(gray)
+    has_water = water_ratio > TEXTURE_WATER_RATIO
+
+    return {
+        "water_ratio": round(water_ratio, 2),
+        "has_water": bool(has_water),
+        "result": "WATER LOGGING DETECTED" if has_water else "NO WATER LOGGING"
+    }
+
 
 def detect_water_logging(image_path):
     if not os.path.exists(image_path):
@@ -12,55 +44,73 @@ def detect_water_logging(image_path):
     if img is None:
         return {"error": "Unable to read image"}
 
-    img = cv2.resize(img, (640, 420))
+    return detect_water_logging_array(img)
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-    texture = np.abs(laplacian)
-
-    texture_norm = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)
-    texture_norm = texture_norm.astype(np.uint8)
+def timed_detect(image_path):
+    """detect_water_logging plus the path and decode/detect timings in milliseconds."""
+    start = time.perf_counter()
+    img = cv2.imread(image_path) if os.path.exists(image_path) else None
+    decoded = time.perf_counter()
+    if img is None:
+        result = detect_water_logging(image_path)  # the matching error
+    else:
+        result = detect_water_logging_array(img)
+    done = time.perf_counter()
+    result["path"] = image_path
+    result["timings_ms"] = {
+        "decode": round((decoded - start) * 1000, 2),
+        "detect": round((done - decoded) * 1000, 2),
+        "total": round((done - start) * 1000, 2),
+    }
+    return result
 
-    # Smooth areas (low texture)
-    _, smooth_mask = cv2.threshold(texture_norm, 25, 255, cv2.THRESH_BINARY_INV)
-    
-    # Exclude very bright areas (likely sky or reflections)
-    _, bright_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
 
-    water_candidate = cv2.bitwise_and(smooth_mask, bright_mask)
+def expand_paths(patterns):
+    """Image files named by paths, directories (top level) or glob patterns, in order, without repeats."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        paths.extend(path for path in matches
+                     if not os.path.isdir(path) and (path == pattern or path.lower().endswith(IMAGE_EXTENSIONS)))
+    return list(dict.fromkeys(paths))
 
-    kernel = np.ones((7, 7), np.uint8)
-    water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_CLOSE, kernel)
-    water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_OPEN, kernel)
 
-    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
-        water_candidate, connectivity=8
-    )
+def detect_batch(paths, workers=None):
+    """timed_detect over many images on a process pool; yields results in input order."""
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(16, len(paths) // (4 * workers)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(timed_detect, paths, chunksize=chunksize)
 
-    water_mask = np.zeros_like(gray)
 
-    for i in range(1, num_labels):
-        if stats[i, cv2.CC_STAT_AREA] > 5000:
-            water_mask[labels == i] = 255
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Texture-based water logging detector")
+    parser.add_argument("paths", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="write JSON lines here instead of stdout")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
 
-    water_pixels = cv2.countNonZero(water_mask)
-    total_pixels = gray.shape[0] * gray.shape[1]
-    water_ratio = water_pixels / total_pixels
+    # A single image path keeps the original one-object output
+    single = args.paths[0]
+    if len(args.paths) == 1 and not args.output and not os.path.isdir(single) and not glob.has_magic(single):
+        print(json.dumps(detect_water_logging(single)))
+        sys.exit(0)
 
-    has_water = water_ratio > 0.18
-        
-    return {
-        "water_ratio": round(water_ratio, 2),
-        "has_water": bool(has_water),
-        "result": "WATER LOGGING DETECTED" if has_water else "NO WATER LOGGING"
-    }
-
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print(json.dumps({"error": "No image path provided"}))
-        sys.exit(1)
-    
-    image_path = sys.argv[1]
-    result = detect_water_logging(image_path)
-    print(json.dumps(result))
\ No newline at end of file
+    paths = expand_paths(args.paths)
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        for result in detect_batch(paths, args.workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} images in {elapsed:.2f}s ({len(paths) / elapsed if elapsed else 0:.1f} images/s)", file=sys.stderr)
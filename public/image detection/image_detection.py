@@ -32,17 +32,13 @@ def detect_water_logging(image_path):
     water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_CLOSE, kernel)
     water_candidate = cv2.morphologyEx(water_candidate, cv2.MORPH_OPEN, kernel)
 
-    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+    _, _, stats, _ = cv2.connectedComponentsWithStats(
         water_candidate, connectivity=8
     )
 
-    water_mask = np.zeros_like(gray)
-
-    for i in range(1, num_labels):
-        if stats[i, cv2.CC_STAT_AREA] > 5000:
-            water_mask[labels == i] = 255
-
-    water_pixels = cv2.countNonZero(water_mask)
+    # Area filter straight off the stats table (row 0 is the background)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    water_pixels = int(areas[areas > 5000].sum())
     total_pixels = gray.shape[0] * gray.shape[1]
     water_ratio = water_pixels / total_pixels
 
@@ -47,7 +47,12 @@ export default function CommunityPage() {
                     <div key={report.id} className="bg-surface border border-white/10 rounded-xl overflow-hidden hover:border-primary/50 transition-colors">
                         <div className="h-48 bg-black/50 relative flex items-center justify-center overflow-hidden">
                             {report.image_url && !report.image_url.includes("blob") ? (
-                                <img src={report.image_url} alt="Incident Report" className="w-full h-full object-cover" />
+                                <picture className="w-full h-full">
+                                    {report.ai_analysis?.thumbnails?.webp && (
+                                        <source srcSet={report.ai_analysis.thumbnails.webp} type="image/webp" />
+                                    )}
+                                    <img src={report.ai_analysis?.thumbnails?.jpg ?? report.image_url} alt="Incident Report" loading="lazy" className="w-full h-full object-cover" />
+                                </picture>
                             ) : (
                                 <div className="text-slate-600 italic">Image Unavailable</div>
                             )}